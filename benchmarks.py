@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+Замеры производительности FastQC Analyzer на синтетических FASTQ файлах
+Запуск: python benchmarks.py [backends|startup|memory|pipeline|generate] [--reads N] [--length L]
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import fastq
+
+
+LENGTH_PROFILES = ('fixed', 'trimmed', 'uniform')
+QUALITY_PROFILES = ('uniform', 'illumina', 'binned')
+_POOL_SIZE = 4096  # Различных последовательностей и строк качества в пуле генератора
+_WRITE_CHUNK = 8192  # Ридов на одну запись в файл
+
+
+def _read_lengths(rng, profile, length, min_length):
+    """Длины ридов пула: все полные, 30% обрезаны (адаптеры) или равномерно от min_length"""
+    if profile == 'fixed':
+        return [length] * _POOL_SIZE
+    if profile == 'trimmed':
+        return [length if rng.random() < 0.7 else rng.randint(min_length, length) for _ in range(_POOL_SIZE)]
+    if profile == 'uniform':
+        return [rng.randint(min_length, length) for _ in range(_POOL_SIZE)]
+    raise ValueError(f"Неизвестный профиль длин: {profile}")
+
+
+def _quality_values(rng, profile, length):
+    """Значения Phred одного рида по профилю"""
+    if profile == 'uniform':
+        return [rng.randint(2, 40) for _ in range(length)]
+    if profile == 'illumina':
+        # Качество падает к концу рида, изредка - провалы до Q2
+        return [2 if rng.random() < 0.005 else
+                min(41, max(2, round(rng.gauss(38 - 10 * position / length, 3))))
+                for position in range(length)]
+    if profile == 'binned':
+        # Бины NovaSeq: 2, 12, 23, 37; к концу рида низких бинов больше
+        return [rng.choices((2, 12, 23, 37), weights=(1, 2 + 6 * position // length, 8, 85))[0]
+                for position in range(length)]
+    raise ValueError(f"Неизвестный профиль качества: {profile}")
+
+
+def write_synthetic_fastq(path, reads=200000, length=150, seed=1, jitter=0, lengths='fixed', min_length=None,
+                          quality='uniform', phred_offset=33, compress=None, size=None):
+    """
+    Пишет FASTQ файл со случайными ридами длины до length bp с заголовками Illumina
+    jitter - риды по очереди короче на 0..jitter bp; lengths - профиль длин (LENGTH_PROFILES,
+    короче length не более чем до min_length), quality - профиль качества (QUALITY_PROFILES)
+    compress - сжать gzip (по умолчанию - если путь оканчивается на .gz)
+    size - писать до такого объема несжатых данных (байт) вместо reads ридов
+    Возвращает path
+    """
+    rng = random.Random(seed)
+    min_length = min_length if min_length is not None else max(1, length // 3)
+    if compress is None:
+        compress = path.endswith('.gz')
+    # Готовим пул строк заранее, чтобы генерация не была узким местом
+    sequences = [''.join(rng.choices('ACGTN', weights=(30, 20, 20, 29, 1), k=length))
+                 for _ in range(_POOL_SIZE)]
+    qualities = [''.join(chr(phred_offset + value) for value in _quality_values(rng, quality, length))
+                 for _ in range(_POOL_SIZE)]
+    sizes = _read_lengths(rng, lengths, length, min_length)
+
+    # Уровень 1: генератор не должен упираться в сжатие на файлах в десятки GB
+    opener = (lambda: gzip.open(path, 'wb', compresslevel=1)) if compress else (lambda: open(path, 'wb'))
+    def record(i):
+        # Одна дорожка и 24 плитки по кругу: карта плиток заполнена уже в небольшом файле
+        read_size = sizes[i % _POOL_SIZE] - i % (jitter + 1)
+        return (f"@SIM:1:FCX:1:{1101 + i // 100 % 24}:{i % 30000}:{i % 997}\n"
+                f"{sequences[i % _POOL_SIZE][:read_size]}\n+\n{qualities[(i * 7) % _POOL_SIZE][:read_size]}\n")
+
+    written = count = 0
+    with opener() as file:
+        while (count < reads) if size is None else (written < size):
+            end = count + _WRITE_CHUNK if size is not None else min(reads, count + _WRITE_CHUNK)
+            chunk = ''.join(map(record, range(count, end))).encode('ascii')
+            file.write(chunk)
+            written += len(chunk)
+            count = end
+    return path
+
+
+def _time_analysis(path, **options):
+    reader = fastq.FastqReader(path, **options)
+    start = time.perf_counter()
+    report = reader.analyze()
+    return time.perf_counter() - start, report
+
+
+def benchmark_backends(reads=200000, length=150):
+    """Сравнивает чистый Python и векторизованный NumPy на одном файле"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_synthetic_fastq(os.path.join(tmp, 'synthetic.fastq'), reads, length)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"Синтетический файл: {reads:,} ридов x {length} bp, {size_mb:.1f} MB")
+
+        backends = ['python'] + (['numpy'] if fastq.np is not None else [])
+        results = {}
+        for backend in backends:
+            elapsed, report = _time_analysis(path, backend=backend)
+            results[backend] = (elapsed, report)
+            print(f"  {backend:>6}: {elapsed:8.2f} s  {size_mb / elapsed:8.1f} MB/s  "
+                  f"{reads / elapsed:12,.0f} reads/s")
+
+        if 'numpy' in results:
+            python_report, numpy_report = results['python'][1], results['numpy'][1]
+            assert python_report['quality'].average_qualities() == numpy_report['quality'].average_qualities()
+            assert python_report['content'].percentages('A') == numpy_report['content'].percentages('A')
+            print(f"  Ускорение NumPy: x{results['python'][0] / results['numpy'][0]:.1f}")
+        else:
+            print("  NumPy не установлен, замер векторизованного режима пропущен")
+    return results
+
+
+STARTUP_LIMIT_MS = 100  # Бюджет на "import fastq" для библиотечного использования
+HEAVY_MODULES = ('numpy', 'matplotlib', 'tkinter', 'PIL')
+
+_STARTUP_PROBE = """
+import sys, time
+start = time.perf_counter()
+import fastq
+elapsed = (time.perf_counter() - start) * 1000
+# Модуль, подключенный через LazyLoader, еще не выполнен
+loaded = [name for name in %r
+          if name in sys.modules and type(sys.modules[name]).__name__ == 'module']
+print(elapsed, ','.join(loaded))
+"""
+
+
+def benchmark_startup(runs=7):
+    """Время "import fastq" в чистом интерпретаторе и список тяжелых модулей, попавших в импорт"""
+    directory = os.path.dirname(os.path.abspath(fastq.__file__))
+    timings, loaded = [], set()
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', _STARTUP_PROBE % (HEAVY_MODULES,)],
+                                         cwd=directory, text=True)
+        elapsed, modules = output.split(' ', 1)
+        timings.append(float(elapsed))
+        loaded.update(filter(None, modules.strip().split(',')))
+
+    median = statistics.median(timings)
+    print(f"import fastq: медиана {median:.1f} ms, минимум {min(timings):.1f} ms "
+          f"(бюджет {STARTUP_LIMIT_MS} ms)")
+    if loaded:
+        print(f"  При импорте загружены тяжелые модули: {', '.join(sorted(loaded))}")
+    ok = median <= STARTUP_LIMIT_MS and not loaded
+    print("  OK" if ok else "  ПРЕВЫШЕНИЕ")
+    return ok
+
+
+MEMORY_GROWTH_LIMIT_MB = 4  # Допустимый рост пикового RSS при увеличении файла
+# До ~80 тысяч ридов пиковый RSS растет из-за разогрева (буферы блоков, пачки), а не утечки:
+# меньший базовый размер прятал бы настоящий рост в этом разогреве
+MEMORY_BASE_READS = 100000
+
+_MEMORY_PROBE = """
+import resource, sys
+import fastq
+fastq.FastqReader(sys.argv[1]).analyze()
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+# Linux отдает килобайты, macOS - байты
+print(peak / 1024 if sys.platform != 'darwin' else peak / 1024 / 1024)
+"""
+
+
+def benchmark_memory(reads=MEMORY_BASE_READS, length=150, factors=(1, 4, 8)):
+    """
+    Регрессионная проверка памяти: пиковый RSS анализа не должен расти вместе с файлом
+    Каждый размер анализируется в отдельном процессе (Linux/macOS); базовый размер
+    не меньше MEMORY_BASE_READS, рост считается от него
+    """
+    reads = max(reads, MEMORY_BASE_READS)
+    directory = os.path.dirname(os.path.abspath(fastq.__file__))
+    peaks = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for factor in factors:
+            path = write_synthetic_fastq(os.path.join(tmp, f'memory_{factor}.fastq'),
+                                         reads * factor, length, jitter=50)
+            output = subprocess.check_output([sys.executable, '-c', _MEMORY_PROBE, path],
+                                             cwd=directory, text=True)
+            peaks.append(float(output))
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            os.remove(path)
+            print(f"  {reads * factor:>12,} ридов ({size_mb:8.1f} MB): пиковый RSS {peaks[-1]:7.1f} MB")
+
+    growth = max(peaks) - peaks[0]
+    ok = growth <= MEMORY_GROWTH_LIMIT_MB
+    print(f"Рост пикового RSS: {growth:.1f} MB (допустимо {MEMORY_GROWTH_LIMIT_MB} MB) - "
+          + ("OK" if ok else "ПРЕВЫШЕНИЕ"))
+    return ok
+
+
+PIPELINE_METHODS = ('analyze', 'parallel', 'preview', 'save_plots')
+PIPELINE_STAGES = ('io', 'parse', 'accumulate', 'render', 'workers')
+
+_PIPELINE_PROBE = """
+import json, resource, sys, tempfile, time
+import fastq
+path, method, backend, workers = sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4])
+reader = fastq.FastqReader(path, backend=backend, workers=workers if method == 'parallel' else 1)
+report = reader.analyze() if method == 'save_plots' else None
+with tempfile.TemporaryDirectory() as output, fastq.StageTimings() as timings:
+    if method == 'preview':
+        report = reader.preview()
+    elif method == 'save_plots':
+        reader.save_plots(output, report, formats=('png', 'svg', 'pdf'), pdf_report=True)
+    else:
+        report = reader.analyze()
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({'reads': report.sequence_count, 'timings': timings.to_dict(),
+                  'peak_rss_mb': peak / 1024 if sys.platform != 'darwin' else peak / 1024 / 1024}))
+"""
+
+
+def benchmark_pipeline(path=None, methods=PIPELINE_METHODS, backend='auto', workers=None, reads=200000,
+                       length=150, **generator):
+    """
+    Замер методов FastqReader: скорость (MB/s, reads/s), пиковый RSS и время по стадиям
+    (StageTimings). Каждый метод выполняется в отдельном процессе, чтобы RSS не смешивался
+    path - готовый FASTQ файл; без него пишется синтетический (параметры write_synthetic_fastq)
+    save_plots замеряется после analyze, в RSS входят оба. Возвращает результаты по методам
+    """
+    directory = os.path.dirname(os.path.abspath(fastq.__file__))
+    workers = workers or os.cpu_count() or 1
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        if path is None:
+            suffix = '.fastq.gz' if generator.get('compress') else '.fastq'
+            path = write_synthetic_fastq(os.path.join(tmp, 'synthetic' + suffix), reads, length, **generator)
+        path = os.path.abspath(path)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"Файл {os.path.basename(path)}: {size_mb:.1f} MB, режим {backend}, процессов для parallel {workers}")
+        print(f"  {'метод':<11}{'время, s':>9}{'MB/s':>9}{'reads/s':>12}{'RSS, MB':>9}"
+              + ''.join(f"{stage:>11}" for stage in PIPELINE_STAGES))
+        for method in methods:
+            output = subprocess.check_output([sys.executable, '-c', _PIPELINE_PROBE, path, method, backend,
+                                              str(workers)], cwd=directory, text=True)
+            result = json.loads(output)
+            results[method] = result
+            elapsed = result['timings']['elapsed']
+            stages = result['timings']['stages']
+            # Для графиков скорость по объему файла не имеет смысла
+            rate = f"{size_mb / elapsed:9.1f}{result['reads'] / elapsed:12,.0f}" if method != 'save_plots' else \
+                f"{'-':>9}{'-':>12}"
+            print(f"  {method:<11}{elapsed:9.2f}{rate}{result['peak_rss_mb']:9.1f}"
+                  + ''.join(f"{stages.get(stage, 0):11.3f}" for stage in PIPELINE_STAGES))
+    return results
+
+
+def parse_size(text):
+    """Объем вида 500M, 20G или число байт"""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+    text = text.strip().upper().rstrip('B')
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замеры производительности FastQC Analyzer")
+    parser.add_argument('suite', nargs='?', choices=('backends', 'startup', 'memory', 'pipeline', 'generate'),
+                        default='backends',
+                        help="что замерять; generate - только записать синтетический файл в --output")
+    parser.add_argument('--reads', type=int, default=200000, help="количество ридов в синтетическом файле")
+    parser.add_argument('--length', type=int, default=150, help="длина рида (bp)")
+    parser.add_argument('--size', type=parse_size, metavar='SIZE',
+                        help="объем синтетического файла без сжатия вместо --reads, например 500M или 20G")
+    parser.add_argument('--lengths', choices=LENGTH_PROFILES, default='fixed', help="распределение длин ридов")
+    parser.add_argument('--min-length', type=int, help="минимальная длина для trimmed/uniform (по умолчанию length/3)")
+    parser.add_argument('--quality', choices=QUALITY_PROFILES, default='uniform', help="профиль качества")
+    parser.add_argument('--phred', type=int, choices=(33, 64), default=33, help="кодировка качества")
+    parser.add_argument('--gzip', action='store_true', help="сжать синтетический файл gzip")
+    parser.add_argument('--seed', type=int, default=1, help="зерно генератора")
+    parser.add_argument('--output', metavar='PATH', help="куда записать файл для generate")
+    parser.add_argument('--input', metavar='PATH', help="замерять pipeline на готовом файле")
+    parser.add_argument('--methods', nargs='+', choices=PIPELINE_METHODS, default=list(PIPELINE_METHODS),
+                        help="методы FastqReader для pipeline")
+    parser.add_argument('--backend', choices=('auto', 'numpy', 'python'), default='auto', help="режим вычислений")
+    parser.add_argument('-w', '--workers', type=int, help="процессов для parallel (по умолчанию все ядра)")
+    parser.add_argument('--json', metavar='FILE', help="сохранить результаты pipeline в JSON")
+    args = parser.parse_args()
+    generator = dict(seed=args.seed, lengths=args.lengths, min_length=args.min_length, quality=args.quality,
+                     phred_offset=args.phred, compress=args.gzip, size=args.size)
+    if args.suite == 'startup':
+        sys.exit(0 if benchmark_startup() else 1)
+    if args.suite == 'memory':
+        sys.exit(0 if benchmark_memory(args.reads, args.length) else 1)
+    if args.suite == 'generate':
+        if not args.output:
+            parser.error("для generate нужен --output")
+        generator['compress'] = args.gzip or None
+        start = time.perf_counter()
+        write_synthetic_fastq(args.output, args.reads, args.length, **generator)
+        print(f"{args.output}: {os.path.getsize(args.output) / 1024 / 1024:.1f} MB "
+              f"за {time.perf_counter() - start:.1f} s")
+        sys.exit(0)
+    if args.suite == 'pipeline':
+        results = benchmark_pipeline(args.input, args.methods, args.backend, args.workers, args.reads, args.length,
+                                     **generator)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as file:
+                json.dump(results, file, indent=2)
+        sys.exit(0)
+    benchmark_backends(args.reads, args.length)
@@ -1,535 +1,3987 @@
-# -*- coding: utf-8 -*-
-import subprocess
-import sys
-import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
-from PIL import Image, ImageTk, ImageDraw
-import matplotlib.pyplot as plt
-from collections import defaultdict
-import os
-
-print("УСТАНАВЛИВАЕМ MATPLOTLIB...")
-subprocess.check_call([sys.executable, "-m", "pip", "install", "matplotlib"])
-
-print("ЗАПУСКАЕМ FASTQ АНАЛИЗАТОР...")
-import matplotlib.pyplot as plt
-from collections import defaultdict
-
-
-class FastqReader:
-    """
-    Класс для чтения и анализа FASTQ файлов с оптимизацией памяти
-    Использует генераторы для работы с большими файлами
-    """
-
-    def __init__(self, filename):
-        self.filename = filename
-        self._sequence_count = None
-        self._total_length = None
-
-    def _read_fastq_chunks(self):
-        """ГЕНЕРАТОР: читает FASTQ файл по одному риду за раз"""
-        with open(self.filename, 'r', encoding='utf-8') as file:
-            while True:
-                # Читаем 4 строки одного рида
-                lines = [file.readline().strip() for _ in range(4)]
-                if not lines[0]:  # Конец файла
-                    break
-                yield lines
-
-    def calculate_statistics(self):
-        """Рассчитывает статистику используя генератор (память O(1))"""
-        count = 0
-        total_length = 0
-
-        for chunk in self._read_fastq_chunks():
-            count += 1
-            sequence_line = chunk[1]  # Вторая строка - последовательность
-            total_length += len(sequence_line)
-
-        self._sequence_count = count
-        self._total_length = total_length
-        return count, total_length
-
-    def get_sequence_count(self):
-        """Возвращает количество последовательностей в файле"""
-        if self._sequence_count is None:
-            self.calculate_statistics()
-        return self._sequence_count
-
-    def get_average_length(self):
-        """Возвращает среднюю длину последовательностей"""
-        if self._sequence_count is None:
-            self.calculate_statistics()
-        if self._sequence_count == 0:
-            return 0
-        return self._total_length / self._sequence_count
-
-    def plot_per_base_quality(self, output="quality.png"):
-        """Строит график качества по позициям (Per Base Sequence Quality)"""
-        quality_sums = defaultdict(int)
-        quality_counts = defaultdict(int)
-        max_position = 0
-
-        for chunk in self._read_fastq_chunks():
-            quality_line = chunk[3]  # Четвертая строка - качество
-            for i, char in enumerate(quality_line):
-                score = ord(char) - 33  # Конвертируем в числовое качество
-                quality_sums[i] += score
-                quality_counts[i] += 1
-                max_position = max(max_position, i)
-
-        # Рассчитываем среднее качество для каждой позиции
-        positions = range(1, max_position + 2)
-        avg_qualities = [quality_sums[i] / quality_counts[i] for i in range(max_position + 1)]
-
-        # Создаем график в монохромной гамме
-        plt.figure(figsize=(10, 6), facecolor='#FFFFFF')
-        ax = plt.gca()
-        ax.set_facecolor('#FAFAFA')
-
-        plt.plot(positions, avg_qualities, linewidth=3, color='#424242', marker='o',
-                 markersize=5, markerfacecolor='#212121', markeredgecolor='#212121',
-                 markeredgewidth=1)
-
-        plt.title('Качество последовательностей по позициям', fontfamily='Georgia',
-                  color='#212121', fontsize=14, pad=20, style='italic')
-        plt.xlabel('Позиция в риде (bp)', fontfamily='Georgia', color='#424242', fontsize=11)
-        plt.ylabel('Phred Quality Score', fontfamily='Georgia', color='#424242', fontsize=11)
-
-        # Настраиваем цвета осей и сетки
-        ax.tick_params(colors='#616161', which='both')
-        ax.spines['bottom'].set_color('#BDBDBD')
-        ax.spines['top'].set_color('#BDBDBD')
-        ax.spines['right'].set_color('#BDBDBD')
-        ax.spines['left'].set_color('#BDBDBD')
-        ax.grid(True, alpha=0.4, color='#E0E0E0', linestyle='--')
-
-        plt.tight_layout()
-        plt.savefig(output, dpi=150, facecolor='#FFFFFF', edgecolor='none', bbox_inches='tight')
-        plt.close()
-        return output
-
-    def plot_per_base_content(self, output="content.png"):
-        """Строит график содержания нуклеотидов по позициям (Per Base Sequence Content)"""
-        base_counts = {'A': defaultdict(int), 'C': defaultdict(int),
-                       'G': defaultdict(int), 'T': defaultdict(int)}
-        total_counts = defaultdict(int)
-        max_position = 0
-
-        for chunk in self._read_fastq_chunks():
-            sequence_line = chunk[1]  # Вторая строка - последовательность
-            for i, base in enumerate(sequence_line):
-                base_upper = base.upper()
-                if base_upper in base_counts:
-                    base_counts[base_upper][i] += 1
-                    total_counts[i] += 1
-                    max_position = max(max_position, i)
-
-        positions = range(1, max_position + 2)
-        plt.figure(figsize=(10, 6), facecolor='#FFFFFF')
-        ax = plt.gca()
-        ax.set_facecolor('#FAFAFA')
-
-        # Монохромная палитра для нуклеотидов
-        colors = ['#212121', '#424242', '#616161', '#757575', '#9E9E9E', '#BDBDBD']
-
-        # Строим линии для каждого нуклеотида
-        for (base, counts), color in zip(base_counts.items(), colors):
-            percentages = [counts[i] / total_counts[i] * 100 if total_counts[i] > 0 else 0
-                           for i in range(max_position + 1)]
-            plt.plot(positions, percentages, label=base, linewidth=2.5, color=color)
-
-        plt.title('Содержание нуклеотидов по позициям', fontfamily='Georgia',
-                  color='#212121', fontsize=14, pad=20, style='italic')
-        plt.xlabel('Позиция в риде (bp)', fontfamily='Georgia', color='#424242', fontsize=11)
-        plt.ylabel('Процент (%)', fontfamily='Georgia', color='#424242', fontsize=11)
-
-        # Легенда с монохромными цветами
-        legend = plt.legend(prop={'family': 'Georgia', 'size': 10})
-        for text in legend.get_texts():
-            text.set_color('#424242')
-
-        # Настраиваем цвета осей и сетки
-        ax.tick_params(colors='#616161', which='both')
-        ax.spines['bottom'].set_color('#BDBDBD')
-        ax.spines['top'].set_color('#BDBDBD')
-        ax.spines['right'].set_color('#BDBDBD')
-        ax.spines['left'].set_color('#BDBDBD')
-        ax.grid(True, alpha=0.4, color='#E0E0E0', linestyle='--')
-
-        plt.tight_layout()
-        plt.savefig(output, dpi=150, facecolor='#FFFFFF', edgecolor='none', bbox_inches='tight')
-        plt.close()
-        return output
-
-    def plot_sequence_length_distribution(self, output="length.png"):
-        """Строит гистограмму распределения длин последовательностей"""
-        lengths = []
-
-        for chunk in self._read_fastq_chunks():
-            sequence_line = chunk[1]  # Вторая строка - последовательность
-            lengths.append(len(sequence_line))
-
-        plt.figure(figsize=(10, 6), facecolor='#FFFFFF')
-        ax = plt.gca()
-        ax.set_facecolor('#FAFAFA')
-
-        # Монохромные цвета для гистограммы
-        plt.hist(lengths, bins=20, edgecolor='#424242', alpha=0.8, color='#757575')
-
-        plt.title('Распределение длин последовательностей', fontfamily='Georgia',
-                  color='#212121', fontsize=14, pad=20, style='italic')
-        plt.xlabel('Длина последовательности (bp)', fontfamily='Georgia', color='#424242', fontsize=11)
-        plt.ylabel('Частота', fontfamily='Georgia', color='#424242', fontsize=11)
-
-        # Настраиваем цвета осей и сетки
-        ax.tick_params(colors='#616161', which='both')
-        ax.spines['bottom'].set_color('#BDBDBD')
-        ax.spines['top'].set_color('#BDBDBD')
-        ax.spines['right'].set_color('#BDBDBD')
-        ax.spines['left'].set_color('#BDBDBD')
-        ax.grid(True, alpha=0.4, color='#E0E0E0', linestyle='--')
-
-        plt.tight_layout()
-        plt.savefig(output, dpi=150, facecolor='#FFFFFF', edgecolor='none', bbox_inches='tight')
-        plt.close()
-        return output
-
-
-class RoundedButton(tk.Canvas):
-    """Кастомная скругленная кнопка на основе Canvas"""
-
-    def __init__(self, parent, text, command, width=150, height=45,
-                 corner_radius=20, bg_color='#E0E0E0', hover_color='#BDBDBD',
-                 text_color='#212121', font=('Georgia', 10, 'bold')):
-        super().__init__(parent, width=width, height=height,
-                         highlightthickness=0, bg=parent.cget('bg'))
-
-        self.command = command
-        self.bg_color = bg_color
-        self.hover_color = hover_color
-        self.text_color = text_color
-        self.font = font
-        self.corner_radius = corner_radius
-        self.width = width
-        self.height = height
-        self.text = text
-
-        self.bind("<Button-1>", self._on_click)
-        self.bind("<Enter>", self._on_enter)
-        self.bind("<Leave>", self._on_leave)
-
-        self.draw_button(bg_color)
-
-    def draw_button(self, color):
-        """Рисует скругленную кнопку"""
-        self.delete("all")
-
-        # Рисуем скругленный прямоугольник с увеличенным радиусом
-        self.create_rounded_rect(2, 2, self.width - 2, self.height - 2,
-                                 self.corner_radius, fill=color, outline='#BDBDBD', width=1)
-
-        # Добавляем текст
-        self.create_text(self.width // 2, self.height // 2,
-                         text=self.text, fill=self.text_color, font=self.font)
-
-    def create_rounded_rect(self, x1, y1, x2, y2, radius, **kwargs):
-        """Создает скругленный прямоугольник"""
-        points = [x1 + radius, y1,
-                  x2 - radius, y1,
-                  x2, y1,
-                  x2, y1 + radius,
-                  x2, y2 - radius,
-                  x2, y2,
-                  x2 - radius, y2,
-                  x1 + radius, y2,
-                  x1, y2,
-                  x1, y2 - radius,
-                  x1, y1 + radius,
-                  x1, y1]
-
-        return self.create_polygon(points, smooth=True, **kwargs)
-
-    def _on_click(self, event):
-        self.command()
-
-    def _on_enter(self, event):
-        self.draw_button(self.hover_color)
-
-    def _on_leave(self, event):
-        self.draw_button(self.bg_color)
-
-
-class FastQCAnalyzerGUI:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("FastQC Analyzer")
-        self.root.geometry("900x650")
-        self.root.configure(bg='#FFFFFF')
-
-        # Установка шрифта Georgia с курсивом для заголовков
-        self.style = ttk.Style()
-        self.style.configure('TLabel', font=('Georgia', 11), background='#FFFFFF', foreground='#212121')
-        self.style.configure('TButton', font=('Georgia', 10), borderwidth=0, focuscolor='none')
-        self.style.configure('Title.TLabel', font=('Georgia', 16, 'bold', 'italic'))
-        self.style.configure('Italic.TLabel', font=('Georgia', 11, 'italic'))
-
-        self.filename = None
-        self.analyzer = None
-
-        self.setup_ui()
-
-    def setup_ui(self):
-        # Главный фрейм
-        main_frame = tk.Frame(self.root, bg='#FFFFFF')
-        main_frame.pack(fill='both', expand=True, padx=25, pady=25)
-
-        # Заголовок
-        title_label = ttk.Label(main_frame, text="FastQC Analyzer", style='Title.TLabel')
-        title_label.pack(pady=(0, 25))
-
-        # Фрейм для выбора файла
-        file_frame = tk.Frame(main_frame, bg='#FAFAFA', bd=1, relief='solid',
-                              highlightbackground='#E0E0E0', highlightthickness=1)
-        file_frame.pack(fill='x', pady=12, padx=10, ipady=12)
-
-        ttk.Label(file_frame, text="Выберите FASTQ файл:", style='Italic.TLabel').pack(side='left', padx=15)
-
-        # Скругленная кнопка выбора файла с увеличенным радиусом
-        self.select_btn = RoundedButton(
-            file_frame, "Выбрать файл", self.select_file,
-            width=150, height=45, corner_radius=20,
-            bg_color='#F5F5F5', hover_color='#E0E0E0', text_color='#212121'
-        )
-        self.select_btn.pack(side='left', padx=15)
-
-        # Метка с именем файла
-        self.file_label = ttk.Label(file_frame, text="Файл не выбран", foreground='#616161', style='Italic.TLabel')
-        self.file_label.pack(side='left', padx=15, fill='x', expand=True)
-
-        # Фрейм статистики
-        stats_frame = tk.Frame(main_frame, bg='#FAFAFA', bd=1, relief='solid',
-                               highlightbackground='#E0E0E0', highlightthickness=1)
-        stats_frame.pack(fill='x', pady=12, padx=10, ipady=12)
-
-        ttk.Label(stats_frame, text="Статистика файла:", style='Title.TLabel').pack(anchor='w', padx=15, pady=8)
-
-        self.stats_text = tk.Text(stats_frame, height=6, width=80, font=('Georgia', 10),
-                                  bg='#FFFFFF', fg='#212121', relief='flat', wrap='word',
-                                  borderwidth=1, highlightthickness=1, highlightcolor='#E0E0E0',
-                                  selectbackground='#E0E0E0')
-        self.stats_text.pack(padx=15, pady=10, fill='x')
-        self.stats_text.insert('1.0', "Статистика будет отображена здесь после выбора файла...")
-        self.stats_text.config(state='disabled')
-
-        # Фрейм для кнопок графиков
-        plots_frame = tk.Frame(main_frame, bg='#FAFAFA', bd=1, relief='solid',
-                               highlightbackground='#E0E0E0', highlightthickness=1)
-        plots_frame.pack(fill='x', pady=12, padx=10, ipady=12)
-
-        ttk.Label(plots_frame, text="Генерация графиков:", style='Title.TLabel').pack(anchor='w', padx=15, pady=8)
-
-        buttons_frame = tk.Frame(plots_frame, bg='#FAFAFA')
-        buttons_frame.pack(padx=15, pady=12, fill='x')
-
-        # Монохромная палитра для кнопок
-        button_colors = [
-            ('#F5F5F5', '#E0E0E0'),  # Светло-серый -> Серый
-            ('#EEEEEE', '#E0E0E0'),  # Очень светло-серый -> Серый
-            ('#FAFAFA', '#E0E0E0'),  # Бежево-белый -> Серый
-            ('#E0E0E0', '#BDBDBD')  # Серый -> Темно-серый
-        ]
-
-        # Скругленные кнопки для генерации графиков с увеличенным радиусом
-        self.quality_btn = RoundedButton(
-            buttons_frame, "Качество", self.plot_quality,
-            width=150, height=45, corner_radius=20,
-            bg_color=button_colors[0][0], hover_color=button_colors[0][1], text_color='#212121'
-        )
-        self.quality_btn.pack(side='left', padx=8, pady=6)
-
-        self.content_btn = RoundedButton(
-            buttons_frame, "Нуклеотиды", self.plot_content,
-            width=150, height=45, corner_radius=20,
-            bg_color=button_colors[1][0], hover_color=button_colors[1][1], text_color='#212121'
-        )
-        self.content_btn.pack(side='left', padx=8, pady=6)
-
-        self.length_btn = RoundedButton(
-            buttons_frame, "Длины", self.plot_length,
-            width=150, height=45, corner_radius=20,
-            bg_color=button_colors[2][0], hover_color=button_colors[2][1], text_color='#212121'
-        )
-        self.length_btn.pack(side='left', padx=8, pady=6)
-
-        self.all_plots_btn = RoundedButton(
-            buttons_frame, "Все графики", self.plot_all,
-            width=150, height=45, corner_radius=20,
-            bg_color=button_colors[3][0], hover_color=button_colors[3][1], text_color='#212121'
-        )
-        self.all_plots_btn.pack(side='left', padx=8, pady=6)
-
-        # Область для вывода изображений
-        self.image_frame = tk.Frame(main_frame, bg='#FFFFFF')
-        self.image_frame.pack(fill='both', expand=True, pady=15)
-
-        self.image_label = ttk.Label(self.image_frame, text="Графики будут отображены здесь",
-                                     background='#FFFFFF', foreground='#757575', style='Italic.TLabel')
-        self.image_label.pack(expand=True)
-
-        # Блокировка кнопок до выбора файла
-        self.set_buttons_state('disabled')
-
-    def set_buttons_state(self, state):
-        """Устанавливает состояние кнопок"""
-        for btn in [self.quality_btn, self.content_btn, self.length_btn, self.all_plots_btn]:
-            if state == 'disabled':
-                # Визуально делаем кнопки светлыми когда отключены
-                btn.bg_color = '#FAFAFA'
-                btn.hover_color = '#FAFAFA'
-                btn.draw_button('#FAFAFA')
-            else:
-                # Возвращаем оригинальные цвета
-                if btn == self.quality_btn:
-                    btn.bg_color = '#F5F5F5'
-                    btn.hover_color = '#E0E0E0'
-                elif btn == self.content_btn:
-                    btn.bg_color = '#EEEEEE'
-                    btn.hover_color = '#E0E0E0'
-                elif btn == self.length_btn:
-                    btn.bg_color = '#FAFAFA'
-                    btn.hover_color = '#E0E0E0'
-                elif btn == self.all_plots_btn:
-                    btn.bg_color = '#E0E0E0'
-                    btn.hover_color = '#BDBDBD'
-                btn.draw_button(btn.bg_color)
-
-    def select_file(self):
-        """Выбор файла через диалоговое окно"""
-        filename = filedialog.askopenfilename(
-            title="Выберите FASTQ файл",
-            filetypes=[("FASTQ files", "*.fastq *.fq"), ("All files", "*.*")]
-        )
-
-        if filename:
-            self.filename = filename
-            self.file_label.config(text=os.path.basename(filename))
-            self.analyze_file()
-
-    def analyze_file(self):
-        """Анализ выбранного файла"""
-        try:
-            self.analyzer = FastqReader(self.filename)
-            count = self.analyzer.get_sequence_count()
-            avg_len = self.analyzer.get_average_length()
-            total_bp = count * avg_len
-
-            stats_text = f"""Количество последовательностей: {count:,}
-Средняя длина: {avg_len:.2f} bp
-Общий объем данных: {total_bp:,.0f} bp
-Размер файла: {os.path.getsize(self.filename) / 1024 / 1024:.2f} MB"""
-
-            self.stats_text.config(state='normal')
-            self.stats_text.delete('1.0', 'end')
-            self.stats_text.insert('1.0', stats_text)
-            self.stats_text.config(state='disabled')
-
-            self.set_buttons_state('normal')
-
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Ошибка при анализе файла: {str(e)}")
-
-    def plot_quality(self):
-        """Генерация графика качества"""
-        if self.analyzer:
-            try:
-                output_file = self.analyzer.plot_per_base_quality()
-                self.display_image(output_file)
-            except Exception as e:
-                messagebox.showerror("Ошибка", f"Ошибка при создании графика: {str(e)}")
-
-    def plot_content(self):
-        """Генерация графика содержания нуклеотидов"""
-        if self.analyzer:
-            try:
-                output_file = self.analyzer.plot_per_base_content()
-                self.display_image(output_file)
-            except Exception as e:
-                messagebox.showerror("Ошибка", f"Ошибка при создании графика: {str(e)}")
-
-    def plot_length(self):
-        """Генерация графика распределения длин"""
-        if self.analyzer:
-            try:
-                output_file = self.analyzer.plot_sequence_length_distribution()
-                self.display_image(output_file)
-            except Exception as e:
-                messagebox.showerror("Ошибка", f"Ошибка при создании графика: {str(e)}")
-
-    def plot_all(self):
-        """Генерация всех графиков"""
-        if self.analyzer:
-            try:
-                quality_file = self.analyzer.plot_per_base_quality()
-                content_file = self.analyzer.plot_per_base_content()
-                length_file = self.analyzer.plot_sequence_length_distribution()
-
-                # Показываем последний созданный график
-                self.display_image(length_file)
-                messagebox.showinfo("Успех", "Все графики созданы успешно!")
-
-            except Exception as e:
-                messagebox.showerror("Ошибка", f"Ошибка при создании графиков: {str(e)}")
-
-    def display_image(self, image_path):
-        """Отображение изображения в интерфейсе"""
-        try:
-            image = Image.open(image_path)
-            # Масштабируем изображение под размер окна
-            width, height = image.size
-            max_width = 800
-            max_height = 400
-
-            if width > max_width or height > max_height:
-                ratio = min(max_width / width, max_height / height)
-                new_size = (int(width * ratio), int(height * ratio))
-                image = image.resize(new_size, Image.Resampling.LANCZOS)
-
-            photo = ImageTk.PhotoImage(image)
-
-            # Очищаем предыдущее изображение
-            for widget in self.image_frame.winfo_children():
-                widget.destroy()
-
-            # Создаем новую метку с изображением
-            img_label = tk.Label(self.image_frame, image=photo, bg='#FFFFFF')
-            img_label.image = photo  # Сохраняем ссылку
-            img_label.pack(expand=True)
-
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось загрузить изображение: {str(e)}")
-
-
-def create_test_fastq():
-    """Создает тестовый FASTQ файл для демонстрации"""
-    print("СОЗДАЕМ ТЕСТОВЫЙ ФАЙЛ...")
-    test_data = ""
-    for i in range(100):
-        test_data += f"@read{i}\n"
-        test_data += "ATCGATCGATCGATCGATCG\n"  # 20 bp
-        test_data += "+\n"
-        test_data += "IIIIIIIIIIIIIIIIIIII\n"  # Качество 40
-    return test_data
-
-
-if __name__ == "__main__":
-    # Создаем тестовый файл если нужно
-    test_data = create_test_fastq()
-    with open("test.fastq", "w", encoding='utf-8') as f:
-        f.write(test_data)
-
-    # Запускаем GUI
-    root = tk.Tk()
-    app = FastQCAnalyzerGUI(root)
-    root.mainloop()
\ No newline at end of file
+# -*- coding: utf-8 -*-
+import argparse
+import base64
+from array import array
+from bisect import bisect_right
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+import contextlib
+import copy
+from functools import lru_cache
+import glob
+import gzip
+import hashlib
+import importlib.util
+import io
+import json
+import math
+import multiprocessing
+import os
+import queue
+import re
+import struct
+import sys
+import time
+import zlib
+
+
+def _lazy_import(name):
+    """
+    Находит модуль, но выполняет его только при первом обращении к атрибуту
+    Возвращает None, если модуль не установлен
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return None
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+# NumPy необязателен: без него работает чистый Python
+np = _lazy_import('numpy')
+
+
+def _zeros(length, vectorized):
+    """Массив счетчиков нужной длины: numpy.int64 или обычный список"""
+    if vectorized:
+        return np.zeros(length, dtype=np.int64)
+    return [0] * length
+
+
+def _grow(values, length):
+    """Удлиняет массив счетчиков нулями до длины length"""
+    missing = length - len(values)
+    if missing <= 0:
+        return values
+    if np is not None and isinstance(values, np.ndarray):
+        return np.concatenate([values, np.zeros(missing, dtype=values.dtype)])
+    values.extend([0] * missing)
+    return values
+
+
+def _add_into(values, other):
+    """Поэлементно прибавляет other к values (с расширением), возвращает values"""
+    values = _grow(values, len(other))
+    if np is not None and isinstance(values, np.ndarray):
+        values[:len(other)] += np.asarray(other, dtype=values.dtype)
+        return values
+    for i, value in enumerate(other):
+        values[i] += int(value)
+    return values
+
+
+def _from_list(values, vectorized):
+    """Обратное к _as_list: массив счетчиков из списка"""
+    if vectorized:
+        return np.array(values, dtype=np.int64)
+    return list(values)
+
+
+def _as_list(values):
+    return values.tolist() if np is not None and isinstance(values, np.ndarray) else list(values)
+
+
+# Код байта -> нуклеотид для режима чистого Python
+_BASE_NAMES = {code: chr(code) for code in b'ACGT'}
+
+@lru_cache(maxsize=None)
+def _base_index():
+    """Таблица перевода байта нуклеотида в индекс: A, C, G, T -> 0..3, N -> 4, остальное -> 5"""
+    table = np.full(256, 5, dtype=np.intp)
+    for index, base in enumerate(b'ACGTN'):
+        table[base] = index
+        table[base + 32] = index  # строчные буквы
+    return table
+
+
+_MASK64 = (1 << 64) - 1
+
+
+def _mix64(value):
+    """Перемешивание битов 64-битного числа (финализатор splitmix64)"""
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+def _mix64_numpy(values):
+    values = values ^ (values >> np.uint64(30))
+    values *= np.uint64(0xBF58476D1CE4E5B9)
+    values ^= values >> np.uint64(27)
+    values *= np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+@lru_cache(maxsize=None)
+def _hash_multipliers(count):
+    """Нечетные псевдослучайные 64-битные множители позиций для хэша префикса рида"""
+    return tuple(_mix64((i + 1) * 0x9E3779B97F4A7C15 & _MASK64) | 1 for i in range(count))
+
+
+class FastqFormatError(ValueError):
+    """Нарушена структура FASTQ файла (заголовок '@', строка '+', длины, обрезанная запись)"""
+
+
+class PairedReadsError(FastqFormatError):
+    """Файлы пары R1/R2 рассинхронизированы: разные ID ридов или разное число ридов"""
+
+
+class AnalysisCancelled(Exception):
+    """Анализ прерван по запросу (см. параметр cancel у FastqReader.analyze)"""
+
+
+_timings = None  # Активный StageTimings этого процесса или None (замеры выключены)
+_NO_STAGE = contextlib.nullcontext()
+
+
+def _stage(stage, detail=None):
+    """Контекст замера стадии; без активного StageTimings ничего не делает"""
+    if _timings is None:
+        return _NO_STAGE
+    return _timings.stage(stage if detail is None else f"{stage}.{detail}")
+
+
+class StageTimings:
+    """
+    Необязательные замеры времени по стадиям анализа:
+    'io' - чтение и распаковка блоков, 'parse' - разбор записей,
+    'accumulate.<метрика>' - накопление метрик, 'render.<график>' - отрисовка,
+    'workers' - ожидание пула процессов (стадии внутри процессов пула не разбиваются)
+    Пока замер активен (with StageTimings() as timings: ...), его пишут все
+    FastqReader, FastqSample и PlotRenderer этого процесса; вне with замеров нет
+    """
+
+    def __init__(self):
+        self.seconds = Counter()
+        self.calls = Counter()
+        self.counters = Counter()  # 'bytes' - прочитано байт FASTQ, 'reads' - разобрано ридов
+        self.elapsed = 0.0
+        self._previous = None
+        self._start = None
+
+    def __enter__(self):
+        global _timings
+        self._previous, _timings = _timings, self
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        global _timings
+        self.elapsed += time.perf_counter() - self._start
+        _timings = self._previous
+        return False
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Добавляет время выполнения блока with к стадии name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+            self.calls[name] += 1
+
+    def count(self, name, value):
+        self.counters[name] += value
+
+    def totals(self):
+        """Время по стадиям верхнего уровня (io, parse, accumulate, render, workers)"""
+        totals = Counter()
+        for name, seconds in self.seconds.items():
+            totals[name.split('.', 1)[0]] += seconds
+        return totals
+
+    def to_dict(self):
+        """Замеры для JSON: общее время, стадии верхнего уровня, подробности и счетчики"""
+        return {
+            'elapsed': round(self.elapsed, 6),
+            'stages': {name: round(seconds, 6) for name, seconds in sorted(self.totals().items())},
+            'details': {name: {'seconds': round(seconds, 6), 'calls': self.calls[name]}
+                        for name, seconds in sorted(self.seconds.items())},
+            'counters': dict(self.counters),
+        }
+
+
+class RecordBatch:
+    """
+    Пачка ридов, которую получают все метрики одного прохода
+    В векторизованном режиме хранит один буфер блока и границы строк,
+    а общие для всех метрик uint8-массивы и списки строк строит лениво
+    """
+
+    first_record = 0  # Номер первого рида пачки в потоке
+    offset = 0  # Смещение начала пачки в потоке
+
+    def __init__(self, headers, sequences, qualities, vectorized=False):
+        self.vectorized = vectorized
+        self._cache = {'headers': headers, 'sequences': sequences, 'qualities': qualities}
+        self._count = len(sequences)
+
+    @classmethod
+    def from_buffer(cls, buffer, starts, ends):
+        """
+        Пачка поверх байтового буфера без копирования строк
+        starts/ends - массивы начала и конца (без перевода строки) всех 4 строк каждого рида
+        """
+        batch = cls.__new__(cls)
+        batch.vectorized = True
+        batch._cache = {}
+        batch._count = len(starts) // 4
+        batch._buffer = buffer
+        batch._array = np.frombuffer(buffer, dtype=np.uint8)
+        batch._starts = starts
+        batch._ends = ends
+        return batch
+
+    def __len__(self):
+        return self._count
+
+    def records(self):
+        return zip(self.headers, self.sequences, self.qualities)
+
+    def record_offsets(self):
+        """Смещения начала каждого рида в потоке (парсер с track_offsets=True)"""
+        if hasattr(self, '_starts'):
+            return (self._starts[0::4] + self.offset).tolist()
+        offsets, position = [], self.offset
+        for size in self._record_sizes:
+            offsets.append(position)
+            position += size
+        return offsets
+
+    def _cached(self, key, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def _lines(self, line):
+        # Список bytes для строки line (0 - заголовок, 1 - последовательность, 3 - качество)
+        buffer = self._buffer
+        return [buffer[start:end] for start, end in
+                zip(self._starts[line::4].tolist(), self._ends[line::4].tolist())]
+
+    @property
+    def headers(self):
+        return self._cached('headers', lambda: self._lines(0))
+
+    @property
+    def sequences(self):
+        return self._cached('sequences', lambda: self._lines(1))
+
+    @property
+    def qualities(self):
+        return self._cached('qualities', lambda: self._lines(3))
+
+    def _codes(self, line):
+        if not hasattr(self, '_array'):
+            lines = self.sequences if line == 1 else self.qualities
+            return np.frombuffer(b''.join(lines), dtype=np.uint8)
+        # Собираем символы строки line всех ридов одним обращением по индексам
+        starts = self._starts[line::4]
+        length = self.uniform_length
+        if length:
+            index = starts[:, None] + np.arange(length, dtype=starts.dtype)
+            return self._array[index.ravel()]
+        lengths = self._ends[line::4] - starts
+        return self._array[np.repeat(starts, lengths) + self.sequence_positions]
+
+    def _lengths(self, line):
+        if hasattr(self, '_array'):
+            return self._ends[line::4] - self._starts[line::4]
+        lines = self.sequences if line == 1 else self.qualities
+        return np.fromiter(map(len, lines), dtype=np.intp, count=len(lines))
+
+    @staticmethod
+    def _positions(lengths):
+        # Номер позиции внутри рида для каждого символа склеенной пачки
+        if len(lengths) and (lengths == lengths[0]).all():
+            return np.tile(np.arange(int(lengths[0]), dtype=np.intp), len(lengths))
+        starts = np.cumsum(lengths) - lengths
+        return np.arange(int(lengths.sum()), dtype=np.intp) - np.repeat(starts, lengths)
+
+    @property
+    def uniform_length(self):
+        """Общая длина всех ридов пачки или 0, если длины различаются"""
+        def build():
+            sequence_lengths, quality_lengths = self.sequence_lengths, self.quality_lengths
+            if not len(sequence_lengths):
+                return 0
+            length = int(sequence_lengths[0])
+            if (sequence_lengths == length).all() and (quality_lengths == length).all():
+                return length
+            return 0
+        return self._cached('uniform_length', build)
+
+    @property
+    def header_bounds(self):
+        """uint8-массив, в котором лежат заголовки пачки, и массивы их начал и концов в нем"""
+        def build():
+            if hasattr(self, '_array'):
+                return self._array, self._starts[0::4], self._ends[0::4]
+            lengths = np.fromiter(map(len, self.headers), dtype=np.intp, count=len(self))
+            ends = np.cumsum(lengths)
+            return np.frombuffer(b''.join(self.headers), dtype=np.uint8), ends - lengths, ends
+        return self._cached('header_bounds', build)
+
+    @property
+    def sequence_lengths(self):
+        return self._cached('sequence_lengths', lambda: self._lengths(1))
+
+    @property
+    def quality_lengths(self):
+        return self._cached('quality_lengths', lambda: self._lengths(3))
+
+    @property
+    def sequence_codes(self):
+        return self._cached('sequence_codes', lambda: self._codes(1))
+
+    @property
+    def quality_codes(self):
+        return self._cached('quality_codes', lambda: self._codes(3))
+
+    @property
+    def sequence_positions(self):
+        return self._cached('sequence_positions', lambda: self._positions(self.sequence_lengths))
+
+    @property
+    def base_indices(self):
+        """Индекс нуклеотида (_base_index) каждого символа последовательностей пачки"""
+        return self._cached('base_indices', lambda: _base_index()[self.sequence_codes])
+
+    @property
+    def quality_positions(self):
+        if hasattr(self, '_array'):
+            # Парсер уже проверил, что длины качества и последовательности совпадают
+            return self.sequence_positions
+        return self._cached('quality_positions', lambda: self._positions(self.quality_lengths))
+
+
+class FastqParser:
+    """
+    Блочный парсер FASTQ: читает файл большими двоичными блоками,
+    режет их по границам записей и проверяет структуру каждого рида
+    Данные не декодируются: все строки остаются bytes (ASCII)
+    """
+
+    BLOCK_SIZE = 4 * 1024 * 1024  # Байт за одно чтение
+
+    def __init__(self, stream, vectorized=False, block_size=BLOCK_SIZE, offset=0, track_offsets=False):
+        """
+        offset - позиция потока в файле (для смещений ридов при чтении диапазона)
+        track_offsets - запоминать смещения ридов для RecordBatch.record_offsets
+        """
+        self.stream = stream
+        self.vectorized = vectorized
+        self.block_size = block_size
+        self.offset = offset
+        self.track_offsets = track_offsets
+        self.records_parsed = 0
+
+    def _error(self, record, message):
+        return FastqFormatError(f"Рид №{self.records_parsed + record + 1}: {message}")
+
+    def batches(self):
+        """ГЕНЕРАТОР: выдает RecordBatch для каждого прочитанного блока"""
+        leftover = b''
+        while True:
+            with _stage('io'):
+                block = self.stream.read(self.block_size)
+            if not block:
+                break
+            data = leftover + block if leftover else block
+            with _stage('parse'):
+                batch, leftover = self._split(data)
+            if _timings is not None:
+                _timings.count('bytes', len(block))
+                _timings.count('reads', len(batch) if batch is not None else 0)
+            if batch is not None:
+                yield batch
+
+        # Остаток без завершающего перевода строки или с лишними пустыми строками
+        leftover = leftover.rstrip()
+        if leftover:
+            with _stage('parse'):
+                batch, rest = self._split(leftover + b'\n')
+            if rest:
+                lines = rest.count(b'\n')
+                raise FastqFormatError(
+                    f"Рид №{self.records_parsed + 1}: файл обрезан, неполная запись из {lines} строк")
+            if _timings is not None:
+                _timings.count('reads', len(batch))
+            yield batch
+
+    def _split(self, data):
+        """Возвращает пачку полных записей из data и необработанный остаток"""
+        # Пустые строки в конце данных не считаем записями: они либо конец файла,
+        # либо станут ошибкой, когда за ними придут новые данные
+        end = len(data)
+        while end and data[end - 1] in (10, 13):
+            end -= 1
+        first_record = self.records_parsed
+        if self.vectorized:
+            batch, rest = self._split_numpy(data, end)
+        else:
+            batch, rest = self._split_python(data, end)
+        if batch is not None:
+            batch.first_record = first_record
+            batch.offset = self.offset
+            self.offset += len(data) - len(rest)
+        return batch, rest
+
+    def _split_python(self, data, end):
+        lines = data.split(b'\n')
+        terminated = len(lines) - 1
+        if end < len(data):
+            terminated = min(terminated, data.count(b'\n', 0, end) + 1)
+        complete = terminated // 4 * 4
+        if not complete:
+            return None, data
+        rest = b'\n'.join(lines[complete:])
+        lines = lines[:complete]
+        record_sizes = None
+        if self.track_offsets:
+            record_sizes = [len(header) + len(sequence) + len(plus) + len(quality) + 4
+                            for header, sequence, plus, quality in zip(*[iter(lines)] * 4)]
+        if b'\r' in data:
+            lines = [line.rstrip(b'\r') for line in lines]
+
+        headers, sequences, qualities = lines[0::4], lines[1::4], lines[3::4]
+        for i, (header, plus) in enumerate(zip(headers, lines[2::4])):
+            if header[:1] != b'@':
+                raise self._error(i, f"ожидался '@' в начале заголовка, получено {header[:20]!r}")
+            if plus[:1] != b'+':
+                raise self._error(i, f"ожидалась строка '+', получено {plus[:20]!r}")
+            if len(sequences[i]) != len(qualities[i]):
+                raise self._error(i, f"длина качества {len(qualities[i])} не совпадает "
+                                     f"с длиной последовательности {len(sequences[i])}")
+        self.records_parsed += len(headers)
+        batch = RecordBatch(headers, sequences, qualities)
+        batch._record_sizes = record_sizes
+        return batch, rest
+
+    def _split_numpy(self, data, end):
+        array = np.frombuffer(data, dtype=np.uint8)
+        newlines = np.flatnonzero(array == 10)
+        if end < len(data):
+            newlines = newlines[:np.searchsorted(newlines, end) + 1]
+        complete = len(newlines) // 4 * 4
+        if not complete:
+            return None, data
+        cut = int(newlines[complete - 1]) + 1
+
+        ends = newlines[:complete]
+        starts = np.empty(complete, dtype=ends.dtype)
+        starts[0] = 0
+        starts[1:] = ends[:-1] + 1
+        # Убираем '\r' у строк с переводом строки в стиле Windows
+        ends = ends - (array[np.maximum(ends - 1, 0)] == 13) * (ends > starts)
+
+        bad = np.flatnonzero((array[starts[0::4]] != ord('@')) | (ends[0::4] == starts[0::4]))
+        if len(bad):
+            start = int(starts[4 * bad[0]])
+            raise self._error(int(bad[0]), "ожидался '@' в начале заголовка, "
+                                           f"получено {data[start:start + 20]!r}")
+        bad = np.flatnonzero((array[starts[2::4]] != ord('+')) | (ends[2::4] == starts[2::4]))
+        if len(bad):
+            start = int(starts[4 * bad[0] + 2])
+            raise self._error(int(bad[0]), "ожидалась строка '+', "
+                                           f"получено {data[start:start + 20]!r}")
+        sequence_lengths = ends[1::4] - starts[1::4]
+        quality_lengths = ends[3::4] - starts[3::4]
+        bad = np.flatnonzero(sequence_lengths != quality_lengths)
+        if len(bad):
+            i = int(bad[0])
+            raise self._error(i, f"длина качества {int(quality_lengths[i])} не совпадает "
+                                 f"с длиной последовательности {int(sequence_lengths[i])}")
+
+        self.records_parsed += complete // 4
+        return RecordBatch.from_buffer(data, starts, ends), data[cut:]
+
+
+class BasicStatistics:
+    """Метрика: количество ридов и суммарная длина последовательностей"""
+
+    name = 'basic'
+
+    def __init__(self, vectorized=False):
+        self.count = 0
+        self.total_length = 0
+
+    def update(self, header, sequence, quality):
+        self.count += 1
+        self.total_length += len(sequence)
+
+    def update_batch(self, batch):
+        self.count += len(batch)
+        if batch.vectorized:
+            self.total_length += int(batch.sequence_lengths.sum())
+        else:
+            self.total_length += sum(map(len, batch.sequences))
+
+    def merge(self, other):
+        self.count += other.count
+        self.total_length += other.total_length
+
+    def to_dict(self):
+        return {'count': self.count, 'total_length': self.total_length}
+
+    @classmethod
+    def from_dict(cls, data, vectorized=False):
+        metric = cls(vectorized)
+        metric.count = data['count']
+        metric.total_length = data['total_length']
+        return metric
+
+
+class PerBaseQuality:
+    """
+    Метрика: распределение оценок качества на каждой позиции
+    Матрица позиции x QUALITY_BINS счетчиков символов '!'..'~', поэтому память не зависит
+    от числа ридов, а среднее, квантили и интервалы по ней считаются точно.
+    Счетчики ведутся по символам, кодировка (phred_offset 33 или 64) учитывается
+    только в результатах, так что один и тот же отчет можно читать в любой из них
+    """
+
+    name = 'quality'
+    QUALITY_BINS = 94  # Печатные символы качества: коды 33..126
+
+    def __init__(self, vectorized=False):
+        self.vectorized = vectorized
+        self.histogram = self._matrix(0)
+        self.phred_offset = 33
+
+    def _matrix(self, length):
+        if self.vectorized:
+            return np.zeros((length, self.QUALITY_BINS), dtype=np.int64)
+        return [[0] * self.QUALITY_BINS for _ in range(length)]
+
+    def _grow(self, length):
+        """Добавляет строки позиций до длины length"""
+        missing = length - len(self.histogram)
+        if missing <= 0:
+            return
+        if self.vectorized:
+            self.histogram = np.concatenate([self.histogram, self._matrix(missing)])
+        else:
+            self.histogram.extend(self._matrix(missing))
+
+    def update(self, header, sequence, quality):
+        if quality and (min(quality) < 33 or max(quality) > 126):
+            raise FastqFormatError(f"символ качества вне диапазона '!'..'~' в строке {quality[:20]!r}")
+        # Расширяем матрицу под самый длинный рид
+        self._grow(len(quality))
+        histogram = self.histogram
+        for i, code in enumerate(quality):
+            histogram[i][code - 33] += 1
+
+    def update_batch(self, batch):
+        if not batch.vectorized:
+            for record in batch.records():
+                self.update(*record)
+            return
+        codes = batch.quality_codes
+        if not len(codes):
+            return
+        if codes.min() < 33 or codes.max() > 126:
+            raise FastqFormatError("символ качества вне диапазона '!'..'~'")
+        length = batch.uniform_length or int(batch.quality_lengths.max())
+        # Одна гистограмма по (позиция, символ) вместо цикла по символам
+        index = batch.quality_positions * self.QUALITY_BINS + codes - 33
+        counts = np.bincount(index, minlength=length * self.QUALITY_BINS)
+        self._grow(length)
+        self.histogram[:length] += counts.reshape(length, self.QUALITY_BINS)
+
+    def merge(self, other):
+        self._grow(len(other.histogram))
+        if self.vectorized:
+            self.histogram[:len(other.histogram)] += np.asarray(other.histogram, dtype=np.int64)
+            return
+        for row, other_row in zip(self.histogram, other.histogram):
+            for i, count in enumerate(_as_list(other_row)):
+                row[i] += count
+
+    def to_dict(self):
+        return {'histogram': [_as_list(row) for row in self.histogram]}
+
+    @classmethod
+    def from_dict(cls, data, vectorized=False):
+        metric = cls(vectorized)
+        if any(len(row) != cls.QUALITY_BINS for row in data['histogram']):
+            raise ValueError(f"Ожидалось {cls.QUALITY_BINS} счетчиков качества на позицию")
+        if vectorized:
+            metric.histogram = np.array(data['histogram'], dtype=np.int64).reshape(-1, cls.QUALITY_BINS)
+        else:
+            metric.histogram = [list(row) for row in data['histogram']]
+        return metric
+
+    def scores(self):
+        """Оценка Phred для каждого столбца матрицы при текущем phred_offset"""
+        return range(33 - self.phred_offset, 33 - self.phred_offset + self.QUALITY_BINS)
+
+    def detect_phred_offset(self):
+        """
+        Кодировка по диапазону символов качества. Phred+64 - только при явных признаках:
+        есть символы выше 'K' (в Phred+33 выше Q42 не бывает) и нет ниже ';' (минимум Phred+64).
+        Иначе 33 - в том числе для качественных файлов Phred+33 без символов ниже '@'
+        """
+        totals = [sum(column) for column in zip(*self._rows()[0])]
+        used = [i for i, count in enumerate(totals) if count]
+        if used and used[0] + 33 >= ord(';') and used[-1] + 33 > ord('K'):
+            return 64
+        return 33
+
+    def _rows(self):
+        # Строки матрицы и число оценок в каждой
+        rows = [_as_list(row) for row in self.histogram]
+        return rows, [sum(row) for row in rows]
+
+    @property
+    def quality_counts(self):
+        """Количество оценок на каждой позиции"""
+        return self._rows()[1]
+
+    @property
+    def quality_sums(self):
+        """Сумма оценок Phred на каждой позиции"""
+        scores = self.scores()
+        return [sum(map(int.__mul__, row, scores)) for row in self._rows()[0]]
+
+    @property
+    def quality_squares(self):
+        """Сумма квадратов оценок Phred на каждой позиции"""
+        scores = self.scores()
+        return [sum(count * score * score for count, score in zip(row, scores)) for row in self._rows()[0]]
+
+    def average_qualities(self):
+        """Среднее качество для каждой позиции"""
+        return [total / count if count else 0
+                for total, count in zip(self.quality_sums, self.quality_counts)]
+
+    def confidence_intervals(self, z=1.96):
+        """Полуширина доверительного интервала среднего качества на каждой позиции"""
+        intervals = []
+        for total, squares, count in zip(self.quality_sums, self.quality_squares, self.quality_counts):
+            if count < 2:
+                intervals.append(0)
+                continue
+            mean = total / count
+            variance = max(squares / count - mean * mean, 0) * count / (count - 1)
+            intervals.append(z * math.sqrt(variance / count))
+        return intervals
+
+    def percentiles(self, fractions=(0.1, 0.25, 0.5, 0.75, 0.9)):
+        """
+        Квантили качества на каждой позиции: для каждой позиции список значений по fractions
+        Квантиль - наименьшая оценка, до которой включительно набирается доля fraction оценок
+        (как в FastQC); позиции без оценок дают None
+        """
+        scores = list(self.scores())
+        result = []
+        for row, total in zip(*self._rows()):
+            if not total:
+                result.append([None] * len(fractions))
+                continue
+            values, seen, i = [], 0, 0
+            for fraction in fractions:
+                while seen + row[i] < fraction * total:
+                    seen += row[i]
+                    i += 1
+                values.append(scores[i])
+            result.append(values)
+        return result
+
+
+class PerSequenceQuality:
+    """Метрика: распределение ридов по среднему качеству рида (округленному до целого)"""
+
+    name = 'read_quality'
+
+    def __init__(self, vectorized=False):
+        self.vectorized = vectorized
+        self.histogram = _zeros(PerBaseQuality.QUALITY_BINS, vectorized)  # По символам, как у PerBaseQuality
+        self.phred_offset = 33
+
+    def update(self, header, sequence, quality):
+        if quality:
+            total, count = sum(quality) - 33 * len(quality), len(quality)
+            # Округление половины вверх в целых числах, как в векторизованном режиме
+            self.histogram[min(max((2 * total + count) // (2 * count), 0), PerBaseQuality.QUALITY_BINS - 1)] += 1
+
+    def update_batch(self, batch):
+        if not batch.vectorized:
+            for record in batch.records():
+                self.update(*record)
+            return
+        if not len(batch):
+            return
+        codes, lengths = batch.quality_codes, batch.quality_lengths
+        length = batch.uniform_length
+        if length:
+            totals = codes.reshape(-1, length).sum(axis=1, dtype=np.int64)
+        else:
+            reads = np.repeat(np.arange(len(batch)), lengths)
+            totals = np.bincount(reads, weights=codes, minlength=len(batch)).astype(np.int64)
+        called = lengths > 0
+        totals, lengths = totals[called] - 33 * lengths[called], lengths[called]
+        means = np.clip((2 * totals + lengths) // (2 * lengths), 0, PerBaseQuality.QUALITY_BINS - 1)
+        self.histogram = _add_into(self.histogram, np.bincount(means, minlength=PerBaseQuality.QUALITY_BINS))
+
+    def merge(self, other):
+        self.histogram = _add_into(self.histogram, other.histogram)
+
+    def to_dict(self):
+        return {'histogram': _as_list(self.histogram)}
+
+    @classmethod
+    def from_dict(cls, data, vectorized=False):
+        metric = cls(vectorized)
+        metric.histogram = _from_list(data['histogram'], vectorized)
+        return metric
+
+    def distribution(self):
+        """Средние качества ридов (Phred, при текущем phred_offset) от меньшего к большему и число ридов"""
+        counts = _as_list(self.histogram)
+        used = [i for i, count in enumerate(counts) if count]
+        if not used:
+            return [], []
+        shift = self.phred_offset - 33
+        return ([i - shift for i in range(used[0], used[-1] + 1)], counts[used[0]:used[-1] + 1])
+
+    def mode(self):
+        """Самое частое среднее качество рида"""
+        scores, counts = self.distribution()
+        return scores[counts.index(max(counts))] if counts else 0
+
+
+_TILE_KEY_BASE = 1000000  # Ключ плитки: lane * _TILE_KEY_BASE + tile
+_TILE_DIGITS = 6  # Длиннее номера дорожки и плитки не бывают, иначе заголовок не Illumina
+_TILE_PREFIX_ROUNDS = 8  # Сколько плиток в пачке ищется сравнением начала заголовка
+
+
+def _tile_key(header):
+    """
+    Ключ (дорожка, плитка) из заголовка Illumina или -1
+    Casava 1.8+: @instrument:run:flowcell:lane:tile:x:y [read:filtered:control:index] (5 и более ':'),
+    старый формат: @instrument:lane:tile:x:y#index/read (ровно 4 ':')
+    """
+    colons = header.count(b':')
+    if colons >= 5:
+        lane, tile = header.split(b':', 5)[3:5]
+    elif colons == 4:
+        lane, tile = header.split(b':', 3)[1:3]
+    else:
+        return -1
+    if not (0 < len(lane) <= _TILE_DIGITS and 0 < len(tile) <= _TILE_DIGITS
+            and lane.isdigit() and tile.isdigit()):
+        return -1
+    return int(lane) * _TILE_KEY_BASE + int(tile)
+
+
+def _parse_numbers(codes, starts, ends):
+    """Десятичные числа из codes[starts:ends] (numpy), -1 для пустых, длинных и нецифровых полей"""
+    lengths = ends - starts
+    valid = (lengths > 0) & (lengths <= _TILE_DIGITS)
+    values = np.zeros(len(starts), dtype=np.int64)
+    for k in range(_TILE_DIGITS):
+        active = valid & (lengths > k)
+        if not active.any():
+            break
+        digits = codes[np.where(active, starts + k, 0)].astype(np.int64) - 48
+        valid &= ~active | ((digits >= 0) & (digits <= 9))
+        values = np.where(active, values * 10 + digits, values)
+    return np.where(valid, values, -1)
+
+
+def _scan_tile_keys(codes, starts, ends):
+    """Ключи плиток заголовков codes[starts:ends] разбором всех ':' буфера"""
+    count = len(starts)
+    # Все ':' буфера за один проход; оставляем те, что попали в заголовки,
+    # и находим номер заголовка и порядковый номер внутри него
+    colons = np.flatnonzero(codes == 58)
+    owners = np.maximum(np.searchsorted(starts, colons, side='right') - 1, 0)
+    inside = (colons >= starts[owners]) & (colons < ends[owners])
+    colons, owners = colons[inside], owners[inside]
+    ranks = np.arange(len(colons)) - np.searchsorted(owners, np.arange(count))[owners]
+    positions = np.full((5, count), -1, dtype=np.int64)
+    selected = ranks < 5
+    positions[ranks[selected], owners[selected]] = colons[selected]
+    totals = np.bincount(owners, minlength=count)
+    new = totals >= 5
+    # Поля дорожки и плитки: между 2-4 двоеточиями (Casava 1.8+) или 0-2 (старый формат)
+    lane_start = np.where(new, positions[2], positions[0]) + 1
+    lane_end = np.where(new, positions[3], positions[1])
+    tile_end = np.where(new, positions[4], positions[2])
+    valid = new | (totals == 4)
+    lanes = _parse_numbers(codes, np.where(valid, lane_start, 0), np.where(valid, lane_end, 0))
+    tiles = _parse_numbers(codes, np.where(valid, lane_end + 1, 0), np.where(valid, tile_end, 0))
+    return np.where((lanes >= 0) & (tiles >= 0), lanes * _TILE_KEY_BASE + tiles, -1)
+
+
+def _tile_keys(batch):
+    """Ключи плиток всех ридов пачки (numpy.int64), то же, что _tile_key для каждого заголовка"""
+    codes, starts, ends = batch.header_bounds
+    keys = np.full(len(starts), -1, dtype=np.int64)
+    pending = np.arange(len(starts))
+    # Риды Illumina идут подряд по плиткам: разбираем первый еще не разобранный заголовок,
+    # и все заголовки с тем же началом до ':' после номера плитки получают его ключ
+    for _ in range(_TILE_PREFIX_ROUNDS):
+        if not len(pending):
+            return keys
+        header = codes[starts[pending[0]]:ends[pending[0]]].tobytes()
+        key = _tile_key(header)
+        fields = header.split(b':', 5)
+        if key < 0 or len(fields) < 6:
+            break
+        size = len(header) - len(fields[5])
+        heads = starts[pending]
+        window = codes[np.minimum(heads[:, None] + np.arange(size), len(codes) - 1)]
+        same = (ends[pending] - heads >= size) & (window == np.frombuffer(header, np.uint8, size)).all(axis=1)
+        keys[pending[same]] = key
+        pending = pending[~same]
+    if len(pending):
+        keys[pending] = _scan_tile_keys(codes, starts[pending], ends[pending])
+    return keys
+
+
+class PerTileQuality:
+    """
+    Метрика: сумма и количество оценок качества по плиткам проточной ячейки и позициям
+    Дорожка и плитка берутся из заголовков Illumina; риды с другими заголовками
+    только подсчитываются в skipped. Счетчики - две матрицы плитки x позиции,
+    строка плитки заводится при первой встрече ее ключа
+    """
+
+    name = 'tile'
+
+    def __init__(self, vectorized=False):
+        self.vectorized = vectorized
+        self.tiles = []  # Ключи плиток в порядке строк матриц
+        self.rows = {}  # Ключ плитки -> строка
+        self.width = 0
+        self.quality_sums = self._matrix(0, 0)
+        self.quality_counts = self._matrix(0, 0)
+        self.skipped = 0
+        self.phred_offset = 33  # Суммы ведутся по символам от '!', см. PerBaseQuality
+
+    def _matrix(self, rows, width):
+        if self.vectorized:
+            return np.zeros((rows, width), dtype=np.int64)
+        return [[0] * width for _ in range(rows)]
+
+    def _resize(self, width):
+        """
+        Расширяет матрицы до width позиций; матрицы NumPy заодно получают строки плиток,
+        встреченных с прошлого вызова (одно копирование на пачку, а не на плитку)
+        """
+        width = max(width, self.width)
+        if self.vectorized:
+            rows = len(self.tiles)
+            for name in ('quality_sums', 'quality_counts'):
+                matrix = getattr(self, name)
+                if matrix.shape != (rows, width):
+                    grown = np.zeros((rows, width), dtype=np.int64)
+                    grown[:matrix.shape[0], :matrix.shape[1]] = matrix
+                    setattr(self, name, grown)
+        elif width > self.width:
+            # Все строки - только при удлинении ридов, а не на каждый рид
+            for matrix in (self.quality_sums, self.quality_counts):
+                for row in matrix:
+                    _grow(row, width)
+        self.width = width
+
+    def _row(self, key):
+        row = self.rows.get(key)
+        if row is None:
+            row = self.rows[key] = len(self.tiles)
+            self.tiles.append(key)
+            if not self.vectorized:
+                self.quality_sums.append([0] * self.width)
+                self.quality_counts.append([0] * self.width)
+        return row
+
+    def update(self, header, sequence, quality):
+        key = _tile_key(header)
+        if key < 0:
+            self.skipped += 1
+            return
+        row = self._row(key)
+        if self.vectorized or len(quality) > self.width:
+            self._resize(len(quality))
+        sums, counts = self.quality_sums[row], self.quality_counts[row]
+        for i, code in enumerate(quality):
+            sums[i] += code - 33
+            counts[i] += 1
+
+    def update_batch(self, batch):
+        if not batch.vectorized:
+            for record in batch.records():
+                self.update(*record)
+            return
+        if not len(batch):
+            return
+        keys, first, inverse = np.unique(_tile_keys(batch), return_index=True, return_inverse=True)
+        # Новые плитки заводятся в порядке появления в файле, как при разборе по одному риду
+        rows = np.full(len(keys), -1, dtype=np.intp)
+        for i in np.argsort(first, kind='stable').tolist():
+            if keys[i] >= 0:
+                rows[i] = self._row(int(keys[i]))
+        read_rows = rows[inverse.ravel()]
+        valid = read_rows >= 0
+        self.skipped += len(batch) - int(valid.sum())
+        if not valid.any():
+            return
+        length = batch.uniform_length
+        self._resize(length or int(batch.quality_lengths.max()))
+        if length:
+            # Риды Illumina идут группами по плиткам: суммируем матрицу риды x позиции
+            # по отрезкам одной плитки и раскладываем немногие отрезки по строкам
+            codes = batch.quality_codes.reshape(-1, length)[valid]
+            read_rows = read_rows[valid]
+            bounds = np.flatnonzero(np.diff(read_rows)) + 1
+            starts = np.concatenate([[0], bounds])
+            sizes = np.diff(np.concatenate([starts, [len(read_rows)]]))
+            sums = np.add.reduceat(codes, starts, axis=0, dtype=np.int64) - 33 * sizes[:, None]
+            np.add.at(self.quality_sums[:, :length], read_rows[starts], sums)
+            np.add.at(self.quality_counts[:, :length], read_rows[starts], sizes[:, None])
+            return
+        char_rows = np.repeat(read_rows, batch.quality_lengths)
+        mask = char_rows >= 0
+        index = char_rows[mask] * self.width + batch.quality_positions[mask]
+        size = len(self.tiles) * self.width
+        counts = np.bincount(index, minlength=size)
+        sums = np.bincount(index, weights=batch.quality_codes[mask], minlength=size).astype(np.int64)
+        self.quality_sums += (sums - 33 * counts).reshape(-1, self.width)
+        self.quality_counts += counts.reshape(-1, self.width)
+
+    def merge(self, other):
+        for key in other.tiles:
+            self._row(key)
+        self._resize(other.width)
+        for key, other_sums, other_counts in zip(other.tiles, other.quality_sums, other.quality_counts):
+            row = self.rows[key]
+            self.quality_sums[row] = _add_into(self.quality_sums[row], other_sums)
+            self.quality_counts[row] = _add_into(self.quality_counts[row], other_counts)
+        self.skipped += other.skipped
+
+    def to_dict(self):
+        return {'tiles': list(self.tiles), 'skipped': self.skipped,
+                'quality_sums': [_as_list(row) for row in self.quality_sums],
+                'quality_counts': [_as_list(row) for row in self.quality_counts]}
+
+    @classmethod
+    def from_dict(cls, data, vectorized=False):
+        metric = cls(vectorized)
+        for key in data['tiles']:
+            metric._row(key)
+        metric._resize(max(map(len, data['quality_sums']), default=0))
+        for row, (sums, counts) in enumerate(zip(data['quality_sums'], data['quality_counts'])):
+            metric.quality_sums[row] = _add_into(metric.quality_sums[row], sums)
+            metric.quality_counts[row] = _add_into(metric.quality_counts[row], counts)
+        metric.skipped = data['skipped']
+        return metric
+
+    def mean_qualities(self, by='tile'):
+        """
+        Подписи строк ('дорожка:плитка' или 'дорожка') по возрастанию и среднее качество
+        каждой строки по позициям (None, если на позиции нет оценок)
+        """
+        groups = {}
+        for key, sums, counts in zip(self.tiles, self.quality_sums, self.quality_counts):
+            lane, tile = divmod(key, _TILE_KEY_BASE)
+            group = groups.setdefault((lane, tile) if by == 'tile' else (lane,), [[0] * self.width, [0] * self.width])
+            group[0] = [a + b for a, b in zip(group[0], _as_list(sums))]
+            group[1] = [a + b for a, b in zip(group[1], _as_list(counts))]
+        labels, means = [], []
+        shift = self.phred_offset - 33
+        for label in sorted(groups):
+            sums, counts = groups[label]
+            labels.append(':'.join(map(str, label)))
+            means.append([total / count - shift if count else None for total, count in zip(sums, counts)])
+        return labels, means
+
+    def deviations(self, by='tile'):
+        """
+        Отклонение среднего качества каждой плитки (или дорожки) от среднего по всем ридам
+        на той же позиции, как на графике Per Tile Sequence Quality в FastQC
+        """
+        labels, means = self.mean_qualities(by)
+        totals, counts = [0] * self.width, [0] * self.width
+        for sums, row_counts in zip(self.quality_sums, self.quality_counts):
+            totals = [a + b for a, b in zip(totals, _as_list(sums))]
+            counts = [a + b for a, b in zip(counts, _as_list(row_counts))]
+        overall = [total / count - (self.phred_offset - 33) if count else None
+                   for total, count in zip(totals, counts)]
+        return labels, [[mean - average if mean is not None else None for mean, average in zip(row, overall)]
+                        for row in means]
+
+
+class PerBaseContent:
+    """
+    Метрика: количество нуклеотидов A/C/G/T по позициям
+    Неопределенные N и прочие символы считаются отдельно и не входят в total_counts
+    """
+
+    name = 'content'
+    bases = 'ACGT'
+
+    def __init__(self, vectorized=False):
+        self.vectorized = vectorized
+        self.base_counts = {base: _zeros(0, vectorized) for base in self.bases}
+        self.total_counts = _zeros(0, vectorized)
+        self.n_counts = _zeros(0, vectorized)
+        self.other_counts = _zeros(0, vectorized)
+
+    def _grow(self, length):
+        for base in self.bases:
+            self.base_counts[base] = _grow(self.base_counts[base], length)
+        self.total_counts = _grow(self.total_counts, length)
+        self.n_counts = _grow(self.n_counts, length)
+        self.other_counts = _grow(self.other_counts, length)
+
+    def update(self, header, sequence, quality):
+        self._grow(len(sequence))
+        base_counts = self.base_counts
+        for i, code in enumerate(sequence.upper()):
+            base = _BASE_NAMES.get(code)
+            if base is not None:
+                base_counts[base][i] += 1
+                self.total_counts[i] += 1
+            elif code == 78:  # N
+                self.n_counts[i] += 1
+            else:
+                self.other_counts[i] += 1
+
+    def update_batch(self, batch):
+        if not batch.vectorized:
+            for record in batch.records():
+                self.update(*record)
+            return
+        if not len(batch):
+            return
+        length = int(batch.sequence_lengths.max())
+        # Одна общая гистограмма по (нуклеотид, позиция) вместо цикла по символам
+        index = batch.base_indices * length + batch.sequence_positions
+        counts = np.bincount(index, minlength=6 * length).reshape(6, length)
+        for row, base in enumerate(self.bases):
+            self.base_counts[base] = _add_into(self.base_counts[base], counts[row])
+        self.total_counts = _add_into(self.total_counts, counts[:4].sum(axis=0))
+        self.n_counts = _add_into(self.n_counts, counts[4])
+        self.other_counts = _add_into(self.other_counts, counts[5])
+
+    def merge(self, other):
+        for base in self.bases:
+            self.base_counts[base] = _add_into(self.base_counts[base], other.base_counts[base])
+        self.total_counts = _add_into(self.total_counts, other.total_counts)
+        self.n_counts = _add_into(self.n_counts, other.n_counts)
+        self.other_counts = _add_into(self.other_counts, other.other_counts)
+
+    def to_dict(self):
+        return {'base_counts': {base: _as_list(counts) for base, counts in self.base_counts.items()},
+                'total_counts': _as_list(self.total_counts),
+                'n_counts': _as_list(self.n_counts),
+                'other_counts': _as_list(self.other_counts)}
+
+    @classmethod
+    def from_dict(cls, data, vectorized=False):
+        metric = cls(vectorized)
+        metric.base_counts = {base: _from_list(data['base_counts'][base], vectorized)
+                              for base in cls.bases}
+        metric.total_counts = _from_list(data['total_counts'], vectorized)
+        metric.n_counts = _from_list(data['n_counts'], vectorized)
+        metric.other_counts = _from_list(data['other_counts'], vectorized)
+        return metric
+
+    def max_position(self):
+        """Последняя позиция, на которой встретился хотя бы один нуклеотид"""
+        total_counts = _as_list(self.total_counts)
+        for i in range(len(total_counts) - 1, -1, -1):
+            if total_counts[i]:
+                return i
+        return -1
+
+    def percentages(self, base):
+        """Процент нуклеотида base на каждой позиции"""
+        return [count / total * 100 if total > 0 else 0
+                for count, total in zip(_as_list(self.base_counts[base]),
+                                        _as_list(self.total_counts)[:self.max_position() + 1])]
+
+    def confidence_intervals(self, base, z=1.96):
+        """Полуширина доверительного интервала процента нуклеотида (биномиальная оценка)"""
+        intervals = []
+        for percent, total in zip(self.percentages(base), _as_list(self.total_counts)):
+            share = percent / 100
+            intervals.append(z * math.sqrt(share * (1 - share) / total) * 100 if total else 0)
+        return intervals
+
+    def n_percentages(self):
+        """Процент N среди всех символов на каждой позиции (до последней позиции с символами)"""
+        calls = [acgt + n + other for acgt, n, other in zip(
+            _as_list(self.total_counts), _as_list(self.n_counts), _as_list(self.other_counts))]
+        while calls and not calls[-1]:
+            calls.pop()
+        return [n / total * 100 if total else 0 for n, total in zip(_as_list(self.n_counts), calls)]
+
+
+class PerSequenceGC:
+    """Метрика: гистограмма GC-состава ридов (целый процент G+C среди A/C/G/T рида -> число ридов)"""
+
+    name = 'gc'
+
+    def __init__(self, vectorized=False):
+        self.vectorized = vectorized
+        self.histogram = _zeros(101, vectorized)
+
+    def update(self, header, sequence, quality):
+        sequence = sequence.upper()
+        gc = sequence.count(b'G') + sequence.count(b'C')
+        called = gc + sequence.count(b'A') + sequence.count(b'T')
+        if called:
+            # Округление половины вверх в целых числах, как в векторизованном режиме
+            self.histogram[(200 * gc + called) // (2 * called)] += 1
+
+    def update_batch(self, batch):
+        if not batch.vectorized:
+            for record in batch.records():
+                self.update(*record)
+            return
+        if not len(batch):
+            return
+        indices = batch.base_indices
+        gc = (indices == 1) | (indices == 2)
+        called = indices < 4
+        length = batch.uniform_length
+        if length:
+            gc = gc.reshape(-1, length).sum(axis=1)
+            called = called.reshape(-1, length).sum(axis=1)
+        else:
+            reads = np.repeat(np.arange(len(batch)), batch.sequence_lengths)
+            gc = np.bincount(reads, weights=gc, minlength=len(batch)).astype(np.int64)
+            called = np.bincount(reads, weights=called, minlength=len(batch)).astype(np.int64)
+        gc, called = gc[called > 0], called[called > 0]
+        percents = (200 * gc + called) // (2 * called)
+        self.histogram = _add_into(self.histogram, np.bincount(percents, minlength=101))
+
+    def merge(self, other):
+        self.histogram = _add_into(self.histogram, other.histogram)
+
+    def to_dict(self):
+        return {'histogram': _as_list(self.histogram)}
+
+    @classmethod
+    def from_dict(cls, data, vectorized=False):
+        metric = cls(vectorized)
+        metric.histogram = _from_list(data['histogram'], vectorized)
+        return metric
+
+    def mean(self):
+        """Средний GC-состав ридов, %"""
+        counts = _as_list(self.histogram)
+        total = sum(counts)
+        return sum(percent * count for percent, count in enumerate(counts)) / total if total else 0
+
+    def normal_fit(self):
+        """Теоретическое нормальное распределение с тем же средним и дисперсией (ридов на процент)"""
+        counts = _as_list(self.histogram)
+        total = sum(counts)
+        if not total:
+            return [0] * len(counts)
+        mean = self.mean()
+        variance = sum(count * (percent - mean) ** 2 for percent, count in enumerate(counts)) / total
+        if not variance:
+            return counts
+        scale = total / math.sqrt(2 * math.pi * variance)
+        return [scale * math.exp(-(percent - mean) ** 2 / (2 * variance)) for percent in range(len(counts))]
+
+
+class SequenceLengthDistribution:
+    """
+    Метрика: точная гистограмма длин последовательностей (длина -> количество)
+    Память зависит только от числа различных длин, а не от числа ридов
+    """
+
+    name = 'length'
+
+    def __init__(self, vectorized=False):
+        self.histogram = Counter()
+
+    def update(self, header, sequence, quality):
+        self.histogram[len(sequence)] += 1
+
+    def update_batch(self, batch):
+        if batch.vectorized:
+            lengths, counts = np.unique(batch.sequence_lengths, return_counts=True)
+            self.histogram.update(dict(zip(lengths.tolist(), counts.tolist())))
+        else:
+            self.histogram.update(map(len, batch.sequences))
+
+    def merge(self, other):
+        self.histogram.update(other.histogram)
+
+    def bins(self):
+        """Различные длины по возрастанию и число ридов каждой длины"""
+        items = sorted(self.histogram.items())
+        return [length for length, _ in items], [count for _, count in items]
+
+    def to_dict(self):
+        lengths, counts = self.bins()
+        return {'lengths': lengths, 'counts': counts}
+
+    @classmethod
+    def from_dict(cls, data, vectorized=False):
+        metric = cls(vectorized)
+        metric.histogram = Counter(dict(zip(data['lengths'], data['counts'])))
+        return metric
+
+
+# Начала адаптеров и типичных артефактов для подписи перепредставленных последовательностей
+_CONTAMINANTS = {
+    'Illumina Universal Adapter': 'AGATCGGAAGAG',
+    'Illumina Small RNA 3\' Adapter': 'TGGAATTCTCGG',
+    'Nextera Transposase Sequence': 'CTGTCTCTTATA',
+    'SOLID Small RNA Adapter': 'CGCCTTGGCCGT',
+    'Poly-A': 'AAAAAAAAAAAA',
+    'Poly-G': 'GGGGGGGGGGGG',
+}
+
+
+class SequenceDuplication:
+    """
+    Метрика: уровни дублирования и перепредставленные последовательности с ограниченной памятью
+    Рид представлен 64-битным хэшем первых PREFIX_LENGTH нуклеотидов.
+    Уровни дублирования считаются по точным счетчикам хэш-выборки различных
+    последовательностей: хранятся только хэши ниже порога, а при переполнении порог
+    снижается вдвое. Выборка равномерна по различным последовательностям и объединяется
+    между частями файла. Частые последовательности ищутся count-min sketch'ем
+    и набором из TOP_SEQUENCES кандидатов с наибольшими оценками
+    """
+
+    name = 'duplication'
+    PREFIX_LENGTH = 50  # Длинные риды сравниваются по началу, как в FastQC
+    MEMORY_LIMIT = 16 * 1024 * 1024  # Поровну на sketch и на выборку
+    SKETCH_DEPTH = 4
+    SAMPLE_ENTRY_BYTES = 128  # Примерный расход памяти на один хэш выборки
+    TOP_SEQUENCES = 50
+    OVERREPRESENTED_SHARE = 0.001  # Порог перепредставленности: 0.1% ридов
+    LEVELS = (1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 50, 100, 500, 1000, 5000, 10000)
+
+    def __init__(self, vectorized=False, memory_limit=None):
+        """memory_limit - байт на sketch и выборку (по умолчанию MEMORY_LIMIT)"""
+        self.vectorized = vectorized
+        limit = memory_limit or self.MEMORY_LIMIT
+        # Ширина sketch - степень двойки: номер ячейки берется из старших бит произведения
+        self.width_bits = max(10, int(math.log2(limit / 2 / (self.SKETCH_DEPTH * 8))))
+        self.sample_size = max(1024, int(limit / 2 / self.SAMPLE_ENTRY_BYTES))
+        width = 1 << self.width_bits
+        if vectorized:
+            self.sketch = np.zeros((self.SKETCH_DEPTH, width), dtype=np.int64)
+        else:
+            # Строки - массивы 64-битных целых: 8 байт на ячейку вместо объектов int в списке
+            self.sketch = [array('q', bytes(8 * width)) for _ in range(self.SKETCH_DEPTH)]
+        self.sample = {}  # Хэш -> число ридов
+        self.sample_level = 0  # В выборке хэши меньше 2**(64 - sample_level)
+        self.candidates = {}  # Хэш -> начало последовательности
+        self.count = 0
+
+    def _row_multipliers(self):
+        return _hash_multipliers(self.PREFIX_LENGTH + self.SKETCH_DEPTH)[self.PREFIX_LENGTH:]
+
+    def _hashes(self, batch):
+        """Хэши начал всех ридов пачки (numpy.uint64)"""
+        multipliers = np.array(_hash_multipliers(self.PREFIX_LENGTH), dtype=np.uint64)
+        length = batch.uniform_length
+        if length:
+            prefix = min(length, self.PREFIX_LENGTH)
+            codes = batch.sequence_codes.reshape(-1, length)[:, :prefix].astype(np.uint64)
+            return _mix64_numpy((codes * multipliers[:prefix]).sum(axis=1, dtype=np.uint64))
+        # Разные длины: суммы по ридам через накопленную сумму (переполнение uint64 - по модулю 2**64)
+        positions = batch.sequence_positions
+        mask = positions < self.PREFIX_LENGTH
+        products = batch.sequence_codes[mask].astype(np.uint64) * multipliers[positions[mask]]
+        totals = np.zeros(len(products) + 1, dtype=np.uint64)
+        np.cumsum(products, dtype=np.uint64, out=totals[1:])
+        ends = np.cumsum(np.minimum(batch.sequence_lengths, self.PREFIX_LENGTH))
+        return _mix64_numpy(totals[ends] - totals[ends - np.minimum(batch.sequence_lengths, self.PREFIX_LENGTH)])
+
+    def _hash(self, sequence):
+        multipliers = _hash_multipliers(self.PREFIX_LENGTH)
+        return _mix64(sum(map(int.__mul__, sequence[:self.PREFIX_LENGTH], multipliers)) & _MASK64)
+
+    def _cells(self, hashes):
+        # Ячейка строки r: старшие width_bits бит произведения хэша на множитель строки
+        shift = 64 - self.width_bits
+        if self.vectorized:
+            hashes = np.asarray(hashes, dtype=np.uint64)
+            return np.stack([(hashes * np.uint64(multiplier)) >> np.uint64(shift)
+                             for multiplier in self._row_multipliers()]).astype(np.intp)
+        return [[((value * multiplier) & _MASK64) >> shift for value in hashes]
+                for multiplier in self._row_multipliers()]
+
+    def _estimates(self, hashes):
+        """Оценки count-min числа ридов для хэшей (никогда не меньше истинного)"""
+        cells = self._cells(hashes)
+        if self.vectorized:
+            return self.sketch[np.arange(self.SKETCH_DEPTH)[:, None], cells].min(axis=0).tolist()
+        return [min(values) for values in zip(*(
+            [row[cell] for cell in row_cells] for row, row_cells in zip(self.sketch, cells)))]
+
+    def _add(self, hashes, counts, sequences):
+        """Учитывает различные хэши пачки с их числом ридов и последовательностями"""
+        cells = self._cells(hashes)
+        limit = _MASK64 >> self.sample_level
+        if self.vectorized:
+            for row, row_cells in zip(self.sketch, cells):
+                np.add.at(row, row_cells, counts)
+            estimates = self.sketch[np.arange(self.SKETCH_DEPTH)[:, None], cells].min(axis=0)
+            best = np.argsort(-estimates, kind='stable')[:self.TOP_SEQUENCES].tolist()
+            sampled = hashes <= np.uint64(limit)
+            sampled = zip(hashes[sampled].tolist(), counts[sampled].tolist())
+            self.count += int(counts.sum())
+            hashes = hashes.tolist()
+        else:
+            for row, row_cells in zip(self.sketch, cells):
+                for cell, count in zip(row_cells, counts):
+                    row[cell] += count
+            estimates = self._estimates(hashes)
+            best = sorted(range(len(hashes)), key=estimates.__getitem__, reverse=True)[:self.TOP_SEQUENCES]
+            sampled = ((value, count) for value, count in zip(hashes, counts) if value <= limit)
+            self.count += sum(counts)
+
+        for value, count in sampled:
+            self.sample[value] = self.sample.get(value, 0) + count
+        self._shrink_sample()
+
+        # Кандидаты в частые: лучшие по оценке хэши пачки вместе с прежними кандидатами
+        for i in best:
+            if hashes[i] not in self.candidates:
+                self.candidates[hashes[i]] = sequences(i)
+        self._shrink_candidates()
+
+    def _shrink_sample(self):
+        while len(self.sample) > self.sample_size:
+            self.sample_level += 1
+            limit = _MASK64 >> self.sample_level
+            self.sample = {value: count for value, count in self.sample.items() if value <= limit}
+
+    def _shrink_candidates(self):
+        if len(self.candidates) <= self.TOP_SEQUENCES:
+            return
+        hashes = list(self.candidates)
+        estimates = dict(zip(hashes, self._estimates(hashes)))
+        keep = sorted(hashes, key=estimates.__getitem__, reverse=True)[:self.TOP_SEQUENCES]
+        self.candidates = {value: self.candidates[value] for value in keep}
+
+    def update(self, header, sequence, quality):
+        self._add([self._hash(sequence)], [1], lambda i: sequence[:self.PREFIX_LENGTH].decode('ascii', 'replace'))
+
+    def update_batch(self, batch):
+        if not len(batch):
+            return
+        if batch.vectorized:
+            hashes, first, counts = np.unique(self._hashes(batch), return_index=True, return_counts=True)
+            if not self.vectorized:
+                hashes, counts = hashes.tolist(), counts.tolist()
+        else:
+            counter = Counter()
+            first = {}
+            for i, sequence in enumerate(batch.sequences):
+                value = self._hash(sequence)
+                counter[value] += 1
+                first.setdefault(value, i)
+            hashes = sorted(counter)  # Тот же порядок, что у np.unique
+            counts = [counter[value] for value in hashes]
+            first = [first[value] for value in hashes]
+        sequences = batch.sequences
+        self._add(hashes, counts, lambda i: sequences[first[i]][:self.PREFIX_LENGTH].decode('ascii', 'replace'))
+
+    def merge(self, other):
+        if other.width_bits != self.width_bits:
+            raise ValueError("Нельзя объединить метрики дублирования с разным размером sketch")
+        if self.vectorized:
+            self.sketch += np.asarray(other.sketch, dtype=np.int64)
+        else:
+            for row, other_row in zip(self.sketch, other.sketch):
+                for cell, value in enumerate(_as_list(other_row)):
+                    row[cell] += value
+        self.count += other.count
+        self.sample_level = max(self.sample_level, other.sample_level)
+        limit = _MASK64 >> self.sample_level
+        sample = {value: count for value, count in self.sample.items() if value <= limit}
+        for value, count in other.sample.items():
+            if value <= limit:
+                sample[value] = sample.get(value, 0) + count
+        self.sample = sample
+        self._shrink_sample()
+        for value, sequence in other.candidates.items():
+            self.candidates.setdefault(value, sequence)
+        self._shrink_candidates()
+
+    def to_dict(self):
+        return {'width_bits': self.width_bits, 'sample_size': self.sample_size, 'count': self.count,
+                'sketch': [_as_list(row) for row in self.sketch],
+                'sample_level': self.sample_level,
+                'sample_hashes': list(self.sample), 'sample_counts': list(self.sample.values()),
+                'candidate_hashes': list(self.candidates), 'candidate_sequences': list(self.candidates.values())}
+
+    @classmethod
+    def from_dict(cls, data, vectorized=False):
+        metric = cls(vectorized, 1024 * 1024)  # Маленький sketch, ниже заменяется сохраненным
+        metric.width_bits = data['width_bits']
+        metric.sample_size = data['sample_size']
+        metric.count = data['count']
+        if vectorized:
+            metric.sketch = np.array(data['sketch'], dtype=np.int64)
+        else:
+            metric.sketch = [array('q', _as_list(row)) for row in data['sketch']]
+        if len(metric.sketch) != cls.SKETCH_DEPTH or any(len(row) != 1 << metric.width_bits for row in metric.sketch):
+            raise ValueError("Размер sketch не совпадает с width_bits")
+        metric.sample_level = data['sample_level']
+        metric.sample = dict(zip(data['sample_hashes'], data['sample_counts']))
+        metric.candidates = dict(zip(data['candidate_hashes'], data['candidate_sequences']))
+        return metric
+
+    def deduplicated_percent(self):
+        """Процент ридов, который останется после удаления дубликатов (по выборке)"""
+        total = sum(self.sample.values())
+        return len(self.sample) / total * 100 if total else 100
+
+    def estimated_distinct(self):
+        """Оценка числа различных последовательностей во всех данных"""
+        return len(self.sample) << self.sample_level
+
+    def duplication_levels(self):
+        """
+        Подписи уровней дублирования и доли (%) ридов и различных последовательностей на каждом
+        Уровень - сколько раз встречается последовательность: 1..9, затем >10 (10-49), >50, ...
+        """
+        reads = [0] * len(self.LEVELS)
+        distinct = [0] * len(self.LEVELS)
+        for count in self.sample.values():
+            level = bisect_right(self.LEVELS, count) - 1
+            reads[level] += count
+            distinct[level] += 1
+        total_reads, total_distinct = sum(reads) or 1, sum(distinct) or 1
+        labels = [str(level) if level < 10 else f'>{level}' for level in self.LEVELS]
+        return (labels, [value / total_reads * 100 for value in reads],
+                [value / total_distinct * 100 for value in distinct])
+
+    def overrepresented(self, share=None):
+        """
+        Последовательности, на которые приходится не меньше share ридов (по умолчанию 0.1%)
+        Список словарей sequence, count, percent, source по убыванию числа ридов;
+        count - оценка count-min (сверху, с погрешностью порядка count / ширина sketch)
+        """
+        share = self.OVERREPRESENTED_SHARE if share is None else share
+        hashes = list(self.candidates)
+        rows = []
+        for value, count in zip(hashes, self._estimates(hashes) if hashes else []):
+            if self.count and count >= share * self.count:
+                sequence = self.candidates[value]
+                source = next((name for name, motif in _CONTAMINANTS.items() if motif in sequence),
+                              'Нет совпадений')
+                rows.append({'sequence': sequence, 'count': count,
+                             'percent': count / self.count * 100, 'source': source})
+        return sorted(rows, key=lambda row: row['count'], reverse=True)
+
+
+DEFAULT_METRICS = (BasicStatistics, PerBaseQuality, PerSequenceQuality, PerTileQuality, PerBaseContent,
+                   PerSequenceGC, SequenceLengthDistribution, SequenceDuplication)
+PHRED_OFFSETS = (33, 64)  # Sanger/Illumina 1.8+ и Illumina 1.3-1.7
+
+
+def _new_metrics(metric_classes, vectorized, memory_limit=None):
+    """
+    Экземпляры метрик; memory_limit (байт) получают метрики с ограниченной памятью
+    (с атрибутом MEMORY_LIMIT), None - их собственный MEMORY_LIMIT
+    """
+    return [metric(vectorized, memory_limit) if memory_limit and hasattr(metric, 'MEMORY_LIMIT')
+            else metric(vectorized) for metric in metric_classes]
+
+
+class FastqReport:
+    """
+    Результаты анализа FASTQ файла, собранные за один проход
+    Хранит состояние всех зарегистрированных метрик
+    estimate - None для точного отчета или описание выборки, по которой построена оценка:
+    {'method': 'stride' | 'head' | 'partial', 'sampled_reads': ..., 'estimated_reads': ...}
+    ('partial' - промежуточный снимок анализа, см. FastqReader.snapshot_report)
+    """
+
+    def __init__(self, metrics, estimate=None):
+        self.metrics = {metric.name: metric for metric in metrics}
+        self.estimate = estimate
+        self.phred_offset = 33
+
+    def __getitem__(self, name):
+        return self.metrics[name]
+
+    def __contains__(self, name):
+        return name in self.metrics
+
+    def update(self, header, sequence, quality):
+        """Передает один рид всем метрикам"""
+        for metric in self.metrics.values():
+            metric.update(header, sequence, quality)
+
+    def update_batch(self, batch):
+        """Передает пачку ридов всем метрикам"""
+        for metric in self.metrics.values():
+            with _stage('accumulate', metric.name):
+                metric.update_batch(batch)
+
+    def merge(self, other):
+        """Объединяет с отчетом по другой части данных"""
+        for name, metric in other.metrics.items():
+            self.metrics[name].merge(metric)
+
+    def copy(self):
+        """Независимая копия отчета со всеми счетчиками метрик"""
+        return copy.deepcopy(self)
+
+    def set_phred_offset(self, phred_offset):
+        """
+        Кодировка качества для результатов всех метрик: 33, 64 или 'auto'
+        ('auto' - по диапазону символов качества, см. PerBaseQuality.detect_phred_offset).
+        Возвращает сам отчет
+        """
+        if phred_offset == 'auto':
+            phred_offset = self.metrics['quality'].detect_phred_offset() if 'quality' in self.metrics else 33
+        if phred_offset not in PHRED_OFFSETS:
+            raise ValueError(f"Неизвестная кодировка качества: {phred_offset}")
+        self.phred_offset = phred_offset
+        for metric in self.metrics.values():
+            if hasattr(metric, 'phred_offset'):
+                metric.phred_offset = phred_offset
+        return self
+
+    @property
+    def sequence_count(self):
+        return self.metrics['basic'].count
+
+    @property
+    def total_length(self):
+        return self.metrics['basic'].total_length
+
+    @property
+    def average_length(self):
+        return self.total_length / self.sequence_count if self.sequence_count else 0
+
+    @property
+    def estimated_count(self):
+        """Число ридов во всем файле: точное или оцененное по выборке"""
+        if self.estimate is None:
+            return self.sequence_count
+        return self.estimate['estimated_reads']
+
+    def to_dict(self):
+        """Полное состояние всех метрик в виде словаря для JSON"""
+        return {name: metric.to_dict() for name, metric in self.metrics.items()}
+
+    @classmethod
+    def from_dict(cls, data, metric_classes=DEFAULT_METRICS, vectorized=False):
+        """Восстанавливает отчет из to_dict() для заданного набора метрик"""
+        return cls(metric.from_dict(data[metric.name], vectorized) for metric in metric_classes)
+
+    def save(self, path, summary=None):
+        """
+        Сохраняет полное состояние метрик для сравнения образцов без исходных FASTQ
+        .json - компактный JSON, sketch дубликатов в нем - сжатые zlib счетчики в base64;
+        .npz - счетчики как массивы NumPy без сжатия (их можно читать через mmap,
+        см. read_report_arrays), кроме sketch, и JSON остального в члене __meta__
+        summary - сводка образца, которая хранится вместе с метриками. Возвращает path
+        """
+        document = {'version': REPORT_FORMAT_VERSION, 'summary': summary, 'phred_offset': self.phred_offset,
+                    'estimate': self.estimate, 'metrics': self.to_dict()}
+        if path.lower().endswith('.npz'):
+            if np is None:
+                raise ImportError("Для сохранения отчета в .npz требуется установленный NumPy")
+            import zipfile
+
+            arrays = {}
+            document['metrics'] = _split_arrays(document['metrics'], '', arrays)
+            arrays[_NPZ_META] = np.frombuffer(json.dumps(document, separators=(',', ':')).encode('utf-8'),
+                                              dtype=np.uint8)
+            # Тот же формат, что у np.savez, но sketch дубликатов (большая часть файла, при
+            # сравнении образцов не нужен) сжимается, а остальные члены - нет, чтобы читать их через mmap
+            with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+                for name, values in arrays.items():
+                    buffer = io.BytesIO()
+                    np.lib.format.write_array(buffer, values, allow_pickle=False)
+                    compressed = name in _PACKED_FIELDS
+                    archive.writestr(name + '.npy', buffer.getvalue(), compresslevel=1 if compressed else None,
+                                     compress_type=zipfile.ZIP_DEFLATED if compressed else zipfile.ZIP_STORED)
+        else:
+            for name in _PACKED_FIELDS:
+                metric, key = name.split('/')
+                if metric in document['metrics']:
+                    fields = document['metrics'][metric]
+                    fields[key] = _pack_counts(fields[key])
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump(document, file, separators=(',', ':'))
+        return path
+
+    @classmethod
+    def load(cls, path, metric_classes=DEFAULT_METRICS, vectorized=False):
+        """Отчет, сохраненный save() (.json или .npz), или stats.json пакетного режима"""
+        if path.lower().endswith('.npz'):
+            document, arrays = read_report_arrays(path)
+            metrics = _join_arrays(document['metrics'], arrays)
+        else:
+            with open(path, encoding='utf-8') as file:
+                document = json.load(file)
+            metrics = document['metrics']
+            for name in _PACKED_FIELDS:
+                metric, key = name.split('/')
+                if isinstance(metrics.get(metric, {}).get(key), dict):
+                    metrics[metric][key] = _unpack_counts(metrics[metric][key])
+        report = cls.from_dict(metrics, metric_classes, vectorized)
+        report.estimate = document.get('estimate')
+        summary = document.get('summary') or {}
+        return report.set_phred_offset(document.get('phred_offset', summary.get('phred_offset', 33)))
+
+
+REPORT_FORMAT_VERSION = 1  # Менять при несовместимом изменении FastqReport.save
+_NPZ_META = '__meta__'
+# Большие счетчики, которые не нужны для сравнения образцов: в .npz сжимаются, в JSON - zlib + base64
+_PACKED_FIELDS = ('duplication/sketch',)
+
+
+def _pack_counts(rows):
+    """Матрица неотрицательных счетчиков -> словарь для JSON: zlib + base64 в самом узком типе"""
+    bits = max((max(row, default=0) for row in rows), default=0).bit_length()
+    typecode = next((code for code in 'BHIQ' if array(code).itemsize * 8 >= bits), 'Q')
+    values = array(typecode, (value for row in rows for value in row))
+    if sys.byteorder == 'big':
+        values.byteswap()  # В файле всегда little-endian
+    return {'encoding': 'zlib+base64', 'type': typecode, 'shape': [len(rows), len(rows[0]) if rows else 0],
+            'data': base64.b64encode(zlib.compress(values.tobytes(), 1)).decode('ascii')}
+
+
+def _unpack_counts(packed):
+    """Обратное к _pack_counts: список строк матрицы"""
+    if packed.get('encoding') != 'zlib+base64':
+        raise ValueError(f"Неизвестная упаковка счетчиков: {packed.get('encoding')}")
+    values = array(packed['type'])
+    values.frombytes(zlib.decompress(base64.b64decode(packed['data'])))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    rows, width = packed['shape']
+    values = values.tolist()
+    return [values[row * width:(row + 1) * width] for row in range(rows)]
+
+
+def _is_numeric(values):
+    """Список целых или прямоугольный список списков целых - такое хранится массивом"""
+    if all(type(value) is int for value in values):
+        return True
+    if not all(type(row) is list for row in values) or len({len(row) for row in values}) != 1:
+        return False
+    return all(type(value) is int for row in values for value in row)
+
+
+def _split_arrays(data, prefix, arrays, fields=None):
+    """
+    Переносит числовые списки словаря to_dict() в arrays под именами 'метрика/поле'
+    и возвращает остаток (скаляры, строки) для JSON
+    fields - переносить только эти массивы, остальные и упакованные счетчики пропустить
+    """
+    rest = {}
+    for key, value in data.items():
+        name = f"{prefix}/{key}" if prefix else key
+        if fields is not None and name not in fields and (isinstance(value, list) or name in _PACKED_FIELDS):
+            continue
+        if isinstance(value, dict) and name not in _PACKED_FIELDS:
+            rest[key] = _split_arrays(value, name, arrays, fields)
+        elif isinstance(value, list) and _is_numeric(value):
+            try:
+                values = np.array(value, dtype=np.int64)
+            except OverflowError:
+                values = np.array(value, dtype=np.uint64)  # 64-битные хэши
+            # Счетчики хранятся в самом узком беззнаковом типе, который их вмещает
+            if values.size and values.dtype == np.int64 and values.min() >= 0:
+                values = values.astype(np.min_scalar_type(int(values.max())))
+            arrays[name] = values
+        else:
+            rest[key] = value
+    return rest
+
+
+def _join_arrays(rest, arrays):
+    """Обратное к _split_arrays: словарь to_dict() со списками вместо массивов"""
+    data = copy.deepcopy(rest)
+    for name, values in arrays.items():
+        *path, key = name.split('/')
+        target = data
+        for part in path:
+            target = target.setdefault(part, {})
+        target[key] = values.tolist()
+    return data
+
+
+def _npz_arrays(path, fields=None):
+    """
+    Члены .npz как массивы поверх mmap файла: в память попадают только страницы,
+    к которым обращаются. Сжатые члены (np.savez_compressed) читаются целиком
+    fields - только эти члены (и __meta__)
+    """
+    import mmap
+    import zipfile
+
+    arrays = {}
+    with open(path, 'rb') as file, zipfile.ZipFile(file) as archive:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        for info in archive.infolist():
+            name = info.filename[:-4] if info.filename.endswith('.npy') else info.filename
+            if fields is not None and name not in fields and name != _NPZ_META:
+                continue
+            if info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member)
+                continue
+            # Данные члена идут за локальным заголовком zip: 30 байт, имя и дополнительное поле
+            name_length, extra_length = struct.unpack_from('<HH', buffer, info.header_offset + 26)
+            start = info.header_offset + 30 + name_length + extra_length
+            header = io.BytesIO(buffer[start:start + min(info.file_size, 1 << 16)])
+            version = np.lib.format.read_magic(header)
+            shape, fortran_order, dtype = (np.lib.format.read_array_header_1_0(header) if version == (1, 0)
+                                           else np.lib.format.read_array_header_2_0(header))
+            values = np.frombuffer(buffer, dtype, count=math.prod(shape), offset=start + header.tell())
+            arrays[name] = values.reshape(shape, order='F' if fortran_order else 'C')
+    return arrays
+
+
+def read_report_arrays(path, fields=None):
+    """
+    Сохраненный отчет без восстановления метрик: (документ, массивы)
+    документ - словарь FastqReport.save без числовых списков (summary, phred_offset, скаляры метрик),
+    массивы - {'метрика/поле': numpy массив}; у .npz это представления поверх mmap файла,
+    у .json (в том числе stats.json) - массивы из разобранного JSON
+    fields - какие массивы нужны (None - все); остальные не читаются и не разбираются
+    """
+    if np is None:
+        raise ImportError("Для чтения массивов отчета требуется установленный NumPy")
+    if path.lower().endswith('.npz'):
+        arrays = _npz_arrays(path, fields)
+        document = json.loads(bytes(arrays.pop(_NPZ_META)).decode('utf-8'))
+    else:
+        with open(path, encoding='utf-8') as file:
+            document = json.load(file)
+        arrays = {}
+        document['metrics'] = _split_arrays(document['metrics'], '', arrays, fields)
+    return document, arrays
+
+
+class ReportCollection:
+    """
+    Сводка по многим сохраненным отчетам (report.npz, stats.json) без исходных FASTQ
+    Из .npz читаются только нужные для сводки массивы (матрица качества, гистограммы)
+    и только через mmap, поэтому сотни образцов загружаются за секунды
+    """
+
+    FIELDS = ('quality/histogram', 'gc/histogram', 'duplication/sample_counts')  # Массивы для сводки
+
+    def __init__(self, paths):
+        self.paths = list(paths)
+        self.documents, self.arrays = [], []
+        for path in self.paths:
+            document, arrays = read_report_arrays(path, self.FIELDS)
+            self.documents.append(document)
+            self.arrays.append(arrays)
+        self.names = [self._name(path, document) for path, document in zip(self.paths, self.documents)]
+
+    def __len__(self):
+        return len(self.paths)
+
+    @staticmethod
+    def _name(path, document):
+        # Имя из сводки образца, иначе по файлу (results/<образец>/report.npz - по папке)
+        summary = document.get('summary') or {}
+        if summary.get('sample'):
+            return summary['sample']
+        stem = os.path.splitext(os.path.basename(path))[0]
+        if stem in ('report', 'stats'):
+            stem = os.path.basename(os.path.dirname(os.path.abspath(path)))
+        return stem
+
+    def _quality(self, index):
+        # Матрица позиция x символ качества и оценки Phred ее столбцов
+        histogram = self.arrays[index]['quality/histogram']
+        offset = self.documents[index].get('phred_offset', 33)
+        return histogram, np.arange(33 - offset, 33 - offset + PerBaseQuality.QUALITY_BINS, dtype=np.float64)
+
+    def sequence_counts(self):
+        """Число ридов каждого образца (для отчета по выборке - оценка)"""
+        return [(document.get('estimate') or {}).get('estimated_reads', document['metrics']['basic']['count'])
+                for document in self.documents]
+
+    def mean_qualities(self):
+        """Матрица образец x позиция среднего качества (NaN - на позиции нет оценок)"""
+        width = max((len(arrays['quality/histogram']) for arrays in self.arrays), default=0)
+        means = np.full((len(self), width), np.nan)
+        for i in range(len(self)):
+            histogram, scores = self._quality(i)
+            totals = histogram.sum(axis=1, dtype=np.float64)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means[i, :len(totals)] = histogram @ scores / totals
+        return means
+
+    def gc_percentages(self):
+        """Матрица образец x GC-состав (0-100%): доля ридов образца, %"""
+        percentages = np.zeros((len(self), 101))
+        for i, arrays in enumerate(self.arrays):
+            counts = arrays['gc/histogram'].astype(np.float64)
+            if counts.sum():
+                percentages[i, :len(counts)] = counts * 100 / counts.sum()
+        return percentages
+
+    def table(self):
+        """Строки сводки: образец, риды, средняя длина, среднее качество, GC и % после дедупликации"""
+        rows = []
+        for i, (name, reads) in enumerate(zip(self.names, self.sequence_counts())):
+            document, arrays = self.documents[i], self.arrays[i]
+            basic = document['metrics']['basic']
+            histogram, scores = self._quality(i)
+            quality_total = histogram.sum(dtype=np.float64)
+            gc = arrays['gc/histogram'].astype(np.float64)
+            sample_counts = arrays['duplication/sample_counts']
+            rows.append({
+                'sample': name,
+                'sequence_count': reads,
+                'average_length': basic['total_length'] / basic['count'] if basic['count'] else 0,
+                'mean_quality': float(histogram.sum(axis=0) @ scores / quality_total) if quality_total else 0,
+                'gc_percent': float(gc @ np.arange(len(gc)) / gc.sum()) if gc.sum() else 0,
+                'deduplicated_percent': (len(sample_counts) / sample_counts.sum(dtype=np.float64) * 100
+                                         if sample_counts.size else 100),
+            })
+        return rows
+
+
+def default_cache_dir():
+    """Папка для кэша отчетов и индексов: $FASTQC_ANALYZER_CACHE или ~/.cache/fastqc_analyzer"""
+    return os.environ.get('FASTQC_ANALYZER_CACHE') or os.path.join(
+        os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'fastqc_analyzer')
+
+
+class ReportCache:
+    """
+    Постоянный кэш отчетов на диске
+    Ключ - абсолютный путь, размер и время изменения файла (и, по желанию, хэш
+    выборки содержимого) плюс набор метрик. Запись - сжатый zlib JSON отчета.
+    При превышении max_bytes удаляются давно не использованные записи (LRU по mtime).
+    Размер кэша после записи оценивается без обхода папки: обход делается, только когда
+    оценка превышает max_bytes, и раз в RESCAN_WRITES записей (в ту же папку могут
+    писать другие процессы)
+    """
+
+    MAGIC = b'FQRC'
+    VERSION = 4  # Менять при несовместимом изменении формата метрик
+    HASH_BLOCK = 1024 * 1024  # Байт с начала, середины и конца файла для content_hash
+    RESCAN_WRITES = 64
+    EVICT_TO = 0.75  # При переполнении кэш освобождается до этой доли max_bytes - запас на новые записи
+
+    def __init__(self, directory=None, max_bytes=256 * 1024 * 1024, content_hash=False):
+        self.directory = directory if directory is not None else default_cache_dir()
+        self.max_bytes = max_bytes
+        self.content_hash = content_hash
+        self._total = None  # Оценка размера записей в байтах (None - папка еще не обходилась)
+        self._writes = 0  # Записей с последнего обхода
+
+    def _content_digest(self, filename, size):
+        digest = hashlib.sha1()
+        with open(filename, 'rb') as file:
+            for offset in sorted({0, max(0, size // 2 - self.HASH_BLOCK // 2), max(0, size - self.HASH_BLOCK)}):
+                file.seek(offset)
+                digest.update(file.read(self.HASH_BLOCK))
+        return digest.hexdigest()
+
+    def key(self, filename, metric_classes, memory_limit=None):
+        """Ключ записи для файла в его текущем состоянии (и лимите памяти метрик, если он задан)"""
+        stat = os.stat(filename)
+        parts = [self.VERSION, os.path.abspath(filename), stat.st_size, stat.st_mtime_ns,
+                 sorted(metric.name for metric in metric_classes)]
+        if memory_limit:
+            parts.append(memory_limit)
+        if self.content_hash:
+            parts.append(self._content_digest(filename, stat.st_size))
+        return hashlib.sha1(json.dumps(parts).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.fqrc')
+
+    def load(self, key):
+        """Словарь отчета или None, если записи нет или она повреждена"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                payload = file.read()
+            if not payload.startswith(self.MAGIC):
+                raise ValueError("неизвестный формат записи кэша")
+            data = json.loads(zlib.decompress(payload[len(self.MAGIC):]))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, zlib.error):
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)  # Отмечаем использование для LRU
+        except OSError:
+            pass
+        return data
+
+    def store(self, key, data):
+        """Сохраняет словарь отчета и при необходимости освобождает место"""
+        os.makedirs(self.directory, exist_ok=True)
+        payload = self.MAGIC + zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'), 6)
+        path = self._path(key)
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as file:
+            file.write(payload)
+        os.replace(temporary, path)
+        self._writes += 1
+        if self._total is not None:
+            self._total += len(payload) - replaced
+        if self._total is None or self._total > self.max_bytes or self._writes >= self.RESCAN_WRITES:
+            self.evict()
+
+    def evict(self):
+        """
+        Если кэш больше max_bytes, удаляет самые давно использованные записи,
+        пока он не уменьшится до EVICT_TO * max_bytes
+        """
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        self._writes = 0
+        entries = []
+        for name in names:
+            if name.endswith('.fqrc'):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * self.EVICT_TO if total > self.max_bytes else total
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            self._remove(path)
+            total -= size
+        self._total = total
+
+    def clear(self):
+        """Удаляет все записи кэша"""
+        self._total = 0
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith('.fqrc'):
+                self._remove(os.path.join(self.directory, name))
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def detect_compression(filename):
+    """Определяет формат файла по магическим байтам: None, 'gzip' или 'bgzf'"""
+    with open(filename, 'rb') as file:
+        header = file.read(18)
+    if not header.startswith(GZIP_MAGIC):
+        return None
+    # BGZF - это gzip с дополнительным полем 'BC', в котором лежит размер блока
+    if len(header) >= 18 and header[3] & 4 and header[12:14] == b'BC':
+        return 'bgzf'
+    return 'gzip'
+
+
+def _inflate_bgzf_block(block):
+    """Распаковывает один BGZF блок и проверяет его CRC32 и длину"""
+    extra_length = int.from_bytes(block[10:12], 'little')
+    data = zlib.decompress(block[12 + extra_length:-8], -15)
+    crc, size = struct.unpack('<II', block[-8:])
+    if size != len(data) or crc != zlib.crc32(data):
+        raise FastqFormatError("Поврежденный BGZF блок: не совпадает CRC32 или длина")
+    return data
+
+
+class BgzfReader:
+    """
+    Файловый объект для чтения BGZF (блочный gzip, как у bgzip/samtools)
+    Блоки независимы, поэтому распаковываются параллельно в пуле потоков:
+    zlib отпускает GIL на время распаковки
+    """
+
+    def __init__(self, filename, threads=1, read_ahead=4):
+        self.file = open(filename, 'rb')
+        self.pool = ThreadPoolExecutor(max_workers=max(1, threads))
+        self.pending = deque()
+        self.limit = max(1, threads) * read_ahead  # Блоков в очереди распаковки
+        self.buffer = b''  # Непрочитанный хвост последнего отданного блока
+        self.eof = False
+        self.offset = 0  # Сколько байт файла уже поставлено в очередь распаковки
+        self.block = (0, 0, 0)  # Начало и конец в файле и распакованный размер последнего отданного блока
+
+    def _read_block(self):
+        header = self.file.read(18)
+        if not header:
+            return None
+        if len(header) < 18 or not header.startswith(GZIP_MAGIC) or header[12:14] != b'BC':
+            raise FastqFormatError("Поврежденный BGZF файл: неверный заголовок блока")
+        block_size = int.from_bytes(header[16:18], 'little') + 1
+        rest = self.file.read(block_size - 18)
+        if len(rest) != block_size - 18:
+            raise FastqFormatError("BGZF файл обрезан: неполный блок в конце")
+        return header + rest
+
+    def _fill(self):
+        while not self.eof and len(self.pending) < self.limit:
+            block = self._read_block()
+            if block is None:
+                self.eof = True
+                break
+            start, self.offset = self.offset, self.offset + len(block)
+            self.pending.append((self.pool.submit(_inflate_bgzf_block, block), start, self.offset))
+
+    def read(self, size=-1):
+        chunks = [self.buffer]
+        available = len(self.buffer)
+        while size < 0 or available < size:
+            self._fill()
+            if not self.pending:
+                break
+            future, start, end = self.pending.popleft()
+            data = future.result()
+            self.block = (start, end, len(data))
+            chunks.append(data)
+            available += len(data)
+        data = b''.join(chunks)
+        if size < 0:
+            size = len(data)
+        self.buffer = data[size:]
+        return data[:size]
+
+    def tell(self):
+        """
+        Позиция в сжатом файле, до которой данные уже отданы: блоки в очереди распаковки
+        не учитываются, непрочитанная часть последнего блока - пропорционально ее доле
+        """
+        start, end, length = self.block
+        if not length:
+            return end
+        return end - round((end - start) * len(self.buffer) / length)
+
+    def close(self):
+        for future, _, _ in self.pending:
+            future.cancel()
+        self.pool.shutdown(wait=True)
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _raw_position(stream):
+    """Сколько байт исходного (возможно сжатого) файла уже прочитано"""
+    if isinstance(stream, BgzfReader):
+        return stream.tell()  # Без блоков, которые только стоят в очереди распаковки
+    raw = getattr(stream, 'fileobj', None) or getattr(stream, 'file', None) or stream
+    return raw.tell()
+
+
+class _PrefixedStream:
+    """
+    Несматываемый поток (stdin, pipe) с заранее прочитанным началом
+    Позволяет заглянуть в первые байты для определения сжатия без seek и считает
+    прочитанные байты (tell), как у обычного файла. Исходный поток не закрывает
+    """
+
+    def __init__(self, stream, prefix=b''):
+        self.stream = stream
+        self.prefix = prefix
+        self.position = 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data = self.prefix + self.stream.read()
+        else:
+            # Короткие чтения pipe добираются до полного блока: пачки ридов те же, что у файла
+            chunks = [self.prefix[:size]]
+            filled = len(chunks[0])
+            while filled < size:
+                chunk = self.stream.read(size - filled)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                filled += len(chunk)
+            data = b''.join(chunks)
+        self.prefix = self.prefix[len(data):]
+        self.position += len(data)
+        return data
+
+    def tell(self):
+        return self.position
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_stream(stream):
+    """
+    Открывает несматываемый двоичный поток FASTQ (stdin, pipe) для одного прохода
+    gzip и BGZF распознаются по первым байтам и распаковываются на лету
+    """
+    head = b''
+    while len(head) < len(GZIP_MAGIC):
+        data = stream.read(len(GZIP_MAGIC) - len(head))
+        if not data:
+            break
+        head += data
+    source = _PrefixedStream(stream, head)
+    if head == GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=source, mode='rb')
+    return source
+
+
+def open_fastq(filename, threads=1):
+    """Открывает FASTQ для двоичного чтения, прозрачно распаковывая gzip и BGZF"""
+    compression = detect_compression(filename)
+    if compression == 'bgzf':
+        return BgzfReader(filename, threads)
+    if compression == 'gzip':
+        return gzip.open(filename, 'rb')
+    return open(filename, 'rb')
+
+
+class FastqIndex:
+    """
+    Индекс несжатого FASTQ файла: смещение каждого K-го рида, число ридов и статистика длин
+    Хранится рядом с файлом (<файл>.fqi) или в папке кэша, если рядом писать нельзя.
+    Позволяет мгновенно узнать число ридов и перейти к риду N без чтения всего файла
+    """
+
+    MAGIC = b'FQI1'
+    INTERVAL = 1024  # Каждый K-й рид получает контрольную точку
+    EXTENSION = '.fqi'
+
+    def __init__(self, interval=None):
+        self.interval = interval or self.INTERVAL
+        self.records = array('Q')  # Номера ридов контрольных точек
+        self.offsets = array('Q')  # Их смещения в файле
+        self.count = 0
+        self.total_length = 0
+        self.min_length = 0
+        self.max_length = 0
+        self.file_size = 0
+        self.mtime_ns = 0
+
+    def add_batch(self, batch, first_record=None):
+        """Добавляет контрольные точки пачки (парсер с track_offsets=True)"""
+        first = batch.first_record if first_record is None else first_record
+        skip = -first % self.interval
+        if skip >= len(batch):
+            return
+        offsets = batch.record_offsets()
+        for i in range(skip, len(batch), self.interval):
+            self.records.append(first + i)
+            self.offsets.append(offsets[i])
+
+    def extend(self, records, offsets, shift):
+        """Добавляет контрольные точки диапазона, пронумерованные с нуля, сдвигая номера на shift"""
+        self.records.extend(record + shift for record in records)
+        self.offsets.extend(offsets)
+
+    def finish(self, filename, report):
+        """Заполняет итоговую статистику по отчету полного прохода"""
+        stat = os.stat(filename)
+        self.file_size, self.mtime_ns = stat.st_size, stat.st_mtime_ns
+        self.count, self.total_length = report.sequence_count, report.total_length
+        lengths, _ = report['length'].bins() if 'length' in report else ([], [])
+        self.min_length = lengths[0] if lengths else 0
+        self.max_length = lengths[-1] if lengths else 0
+
+    @property
+    def average_length(self):
+        return self.total_length / self.count if self.count else 0
+
+    def is_fresh(self, filename):
+        """Индекс соответствует текущему размеру и времени изменения файла"""
+        stat = os.stat(filename)
+        return stat.st_size == self.file_size and stat.st_mtime_ns == self.mtime_ns
+
+    def locate(self, record):
+        """Ближайшая контрольная точка не дальше рида record: (номер, смещение)"""
+        if not 0 <= record < self.count:
+            raise IndexError(f"Рид №{record} вне файла из {self.count} ридов")
+        position = bisect_right(self.records, record) - 1
+        if position < 0:
+            return 0, 0
+        return self.records[position], self.offsets[position]
+
+    def record_ranges(self, parts):
+        """Делит файл на parts диапазонов байт точно по границам записей"""
+        if not self.count:
+            return [(0, self.file_size)] if self.file_size else []
+        bounds = sorted({self.locate(self.count * i // parts)[1] for i in range(parts)} | {self.file_size})
+        return [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+    @staticmethod
+    def paths(filename, directory=None):
+        """Где искать индекс: рядом с файлом, затем в папке кэша"""
+        key = hashlib.sha1(os.path.abspath(filename).encode('utf-8')).hexdigest()
+        return [filename + FastqIndex.EXTENSION,
+                os.path.join(directory or default_cache_dir(), key + FastqIndex.EXTENSION)]
+
+    def to_bytes(self):
+        header = json.dumps({
+            'interval': self.interval, 'count': self.count, 'total_length': self.total_length,
+            'min_length': self.min_length, 'max_length': self.max_length,
+            'file_size': self.file_size, 'mtime_ns': self.mtime_ns, 'checkpoints': len(self.records),
+        }).encode('utf-8')
+        records, offsets = array('Q', self.records), array('Q', self.offsets)
+        if sys.byteorder == 'big':  # На диске всегда little-endian
+            records.byteswap()
+            offsets.byteswap()
+        return (self.MAGIC + struct.pack('<I', len(header)) + header
+                + zlib.compress(records.tobytes() + offsets.tobytes(), 6))
+
+    @classmethod
+    def from_bytes(cls, payload):
+        if not payload.startswith(cls.MAGIC):
+            raise ValueError("неизвестный формат индекса")
+        size = struct.unpack_from('<I', payload, len(cls.MAGIC))[0]
+        start = len(cls.MAGIC) + 4
+        header = json.loads(payload[start:start + size])
+        index = cls(header['interval'])
+        for name in ('count', 'total_length', 'min_length', 'max_length', 'file_size', 'mtime_ns'):
+            setattr(index, name, header[name])
+        values = array('Q', zlib.decompress(payload[start + size:]))
+        if sys.byteorder == 'big':
+            values.byteswap()
+        checkpoints = header['checkpoints']
+        if len(values) != 2 * checkpoints:
+            raise ValueError("индекс поврежден")
+        index.records, index.offsets = values[:checkpoints], values[checkpoints:]
+        return index
+
+    def save(self, filename, directory=None):
+        """Пишет индекс рядом с файлом, а если там нельзя - в папку кэша; возвращает путь"""
+        for path in self.paths(filename, directory):
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                temporary = f"{path}.{os.getpid()}.tmp"
+                with open(temporary, 'wb') as file:
+                    file.write(self.to_bytes())
+                os.replace(temporary, path)
+                return path
+            except OSError:
+                continue
+        return None
+
+    @classmethod
+    def load(cls, filename, directory=None):
+        """Актуальный индекс файла или None"""
+        for path in cls.paths(filename, directory):
+            try:
+                with open(path, 'rb') as file:
+                    index = cls.from_bytes(file.read())
+            except (OSError, ValueError, KeyError, zlib.error):
+                continue
+            if index.is_fresh(filename):
+                return index
+        return None
+
+
+class _RangeReader:
+    """Файловый объект, отдающий не больше length байт начиная с текущей позиции"""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+
+def find_record_start(file, offset, window=64 * 1024):
+    """
+    Возвращает смещение первой FASTQ записи, начинающейся не раньше offset
+    Строка качества тоже может начинаться с '@', поэтому кандидат принимается,
+    только если через строку от него идет '+', длины последовательности и качества
+    совпадают, а следующая запись снова начинается с '@' (или файл закончился)
+    """
+    if offset <= 0:
+        return 0
+    while True:
+        file.seek(offset - 1)
+        data = file.read(window)
+        at_eof = len(data) < window
+        end = offset - 1 + len(data)
+        if at_eof and not data.endswith(b'\n'):
+            data += b'\n'
+        position = data.find(b'\n')
+        while position != -1:
+            start = position + 1
+            lines = data[start:].split(b'\n', 4)
+            if len(lines) < 5 or not (lines[4] or at_eof):
+                break  # Запись не помещается в окно
+            header, sequence, plus, quality, following = lines
+            if (header[:1] == b'@' and plus[:1] == b'+'
+                    and len(sequence.rstrip(b'\r')) == len(quality.rstrip(b'\r'))
+                    and following[:1] in (b'@', b'', b'\r', b'\n')):
+                return offset - 1 + start
+            position = data.find(b'\n', start)
+        if at_eof:
+            # До конца файла полных записей нет: хвост достается предыдущему диапазону
+            return end
+        window *= 2  # Риды длиннее окна: читаем больше
+
+
+def _analyze_range(filename, start, end, metrics, vectorized, index_interval=None, memory_limit=None):
+    """
+    Считает метрики по байтам [start, end) файла (выполняется в процессе пула)
+    С index_interval также возвращает контрольные точки индекса с нумерацией ридов от 0
+    """
+    report = FastqReport(_new_metrics(metrics, vectorized, memory_limit))
+    index = FastqIndex(index_interval) if index_interval else None
+    with open(filename, 'rb') as file:
+        file.seek(start)
+        parser = FastqParser(_RangeReader(file, end - start), vectorized,
+                             offset=start, track_offsets=index is not None)
+        try:
+            for batch in parser.batches():
+                report.update_batch(batch)
+                if index is not None:
+                    index.add_batch(batch)
+        except FastqFormatError as error:
+            raise FastqFormatError(f"{error} (фрагмент файла с байта {start})") from None
+    if index is None:
+        return report, [], []
+    return report, index.records.tolist(), index.offsets.tolist()
+
+
+def _plot_title(title, report):
+    # Оценка по выборке помечается в заголовке графика
+    if report.estimate is None:
+        return title
+    sampled = f"{report.estimate['sampled_reads']:,}".replace(',', ' ')
+    return f"{title}\n(оценка по {sampled} ридам)"
+
+
+def _render_plot(name, data, fmt, dpi):
+    # Задача пула процессов: своя фигура-шаблон в каждом процессе
+    return _default_renderer()._render(name, data, fmt, dpi)
+
+
+class PlotRenderer:
+    """
+    Отрисовка графиков отчета в едином монохромном стиле
+    Каждый график описан парой методов: _data_<имя> собирает из отчета небольшой
+    словарь чисел и подписей, _draw_<имя> рисует его на готовых осях. Оформление
+    задается один раз шаблоном STYLE, а фигура Agg переиспользуется всеми графиками.
+    Готовые изображения кэшируются по этому словарю: в памяти (LRU) и, если задан
+    cache (ReportCache), на диске - одинаковые данные повторно не рисуются
+    """
+
+    VERSION = 1  # Менять при изменении внешнего вида графиков
+    FORMATS = ('png', 'svg', 'pdf')
+    FIGSIZE = (10, 6)
+    DPI = 150
+    MEMORY_BYTES = 64 * 1024 * 1024  # Предел кэша изображений в памяти
+    # Графики в порядке страниц отчета и их файлы по умолчанию
+    PLOTS = {
+        'quality': 'quality', 'tile': 'tile', 'read_quality': 'read_quality', 'content': 'content',
+        'length': 'length', 'gc': 'gc', 'n_content': 'n_content', 'duplication': 'duplication',
+        'overrepresented': 'overrepresented',
+    }
+    # Сводные графики по многим образцам (ReportCollection)
+    COMPARISON_PLOTS = {'samples_quality': 'samples_quality', 'samples_gc': 'samples_gc',
+                        'samples_reads': 'samples_reads'}
+    STYLE = {
+        'axes.facecolor': '#FAFAFA',
+        'axes.edgecolor': '#BDBDBD',
+        'axes.grid': True,
+        'grid.color': '#E0E0E0',
+        'grid.alpha': 0.4,
+        'grid.linestyle': '--',
+        'xtick.color': '#616161',
+        'ytick.color': '#616161',
+    }
+
+    def __init__(self, cache=None, memory_bytes=MEMORY_BYTES):
+        self.cache = cache
+        self.memory_bytes = memory_bytes
+        self._images = OrderedDict()
+        self._image_bytes = 0
+        self._figure = None
+
+    def available(self, report):
+        """Графики, для которых в отчете есть данные (плитки - только у Illumina)"""
+        return [name for name in self.PLOTS if name != 'tile' or report['tile'].tiles]
+
+    def plot_data(self, name, report, **options):
+        """Данные графика name: все, от чего зависит картинка"""
+        if name not in self.PLOTS:
+            raise ValueError(f"Неизвестный график: {name}")
+        return getattr(self, f'_data_{name}')(report, **options)
+
+    def render(self, name, report, fmt='png', **options):
+        """Изображение графика в формате fmt (png, svg или pdf) как bytes"""
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Неизвестный формат графика: {fmt}")
+        return self._cached(name, self.plot_data(name, report, **options), fmt, self.DPI)
+
+    def render_rgba(self, name, report, max_size=(800, 400), **options):
+        """
+        График сразу в размере окна: (ширина, высота, пиксели RGBA) без файла и сжатия PNG
+        Разрешение подбирается так, чтобы картинка поместилась в max_size
+        """
+        data = self.plot_data(name, report, **options)
+        width, height = data.get('figsize', self.FIGSIZE)
+        dpi = min(max_size[0] / width, max_size[1] / height, self.DPI)
+        image = self._cached(name, data, 'rgba', dpi)
+        width, height = struct.unpack_from('<II', image)
+        return width, height, image[8:]
+
+    def save(self, name, report, output, **options):
+        """Сохраняет график в файл output, формат - по расширению (по умолчанию png)"""
+        fmt = os.path.splitext(output)[1][1:].lower() or 'png'
+        with open(output, 'wb') as file:
+            file.write(self.render(name, report, fmt, **options))
+        return output
+
+    def save_all(self, report, output_dir, names=None, formats=('png',), pdf_report=False, workers=1):
+        """
+        Сохраняет графики отчета в output_dir (<график>.<формат>), а с pdf_report -
+        еще и все графики одним многостраничным report.pdf
+        workers > 1 - рисовать в пуле процессов. Возвращает список записанных файлов
+        """
+        names = list(names) if names is not None else self.available(report)
+        for fmt in formats:
+            if fmt not in self.FORMATS:
+                raise ValueError(f"Неизвестный формат графика: {fmt}")
+        plots = {name: self.plot_data(name, report) for name in names}
+        jobs = [(name, fmt) for name in names for fmt in formats]
+        images = {job: self._lookup(self._key(job[0], plots[job[0]], job[1], self.DPI)) for job in jobs}
+        missing = [job for job in jobs if images[job] is None]
+        if workers > 1 and len(missing) > 1:
+            with _stage('workers', 'render'), ProcessPoolExecutor(max_workers=min(workers, len(missing))) as pool:
+                futures = {pool.submit(_render_plot, name, plots[name], fmt, self.DPI): (name, fmt)
+                           for name, fmt in missing}
+                for future in as_completed(futures):
+                    name, fmt = futures[future]
+                    images[name, fmt] = future.result()
+                    self._remember(self._key(name, plots[name], fmt, self.DPI), images[name, fmt])
+        else:
+            for name, fmt in missing:
+                images[name, fmt] = self._cached(name, plots[name], fmt, self.DPI)
+
+        os.makedirs(output_dir, exist_ok=True)
+        written = []
+        for name, fmt in jobs:
+            path = os.path.join(output_dir, f"{self.PLOTS[name]}.{fmt}")
+            with open(path, 'wb') as file:
+                file.write(images[name, fmt])
+            written.append(path)
+        if pdf_report:
+            path = os.path.join(output_dir, 'report.pdf')
+            with open(path, 'wb') as file:
+                file.write(self.render_report(report, names))
+            written.append(path)
+        return written
+
+    def comparison_data(self, name, collection):
+        """Данные сводного графика name по ReportCollection"""
+        if name not in self.COMPARISON_PLOTS:
+            raise ValueError(f"Неизвестный сводный график: {name}")
+        return getattr(self, f'_data_{name}')(collection)
+
+    def save_comparison(self, collection, output_dir, names=None, formats=('png',)):
+        """Сохраняет сводные графики по образцам в output_dir, возвращает список файлов"""
+        names = list(names) if names is not None else list(self.COMPARISON_PLOTS)
+        for fmt in formats:
+            if fmt not in self.FORMATS:
+                raise ValueError(f"Неизвестный формат графика: {fmt}")
+        os.makedirs(output_dir, exist_ok=True)
+        written = []
+        for name in names:
+            data = self.comparison_data(name, collection)
+            for fmt in formats:
+                path = os.path.join(output_dir, f"{self.COMPARISON_PLOTS[name]}.{fmt}")
+                with open(path, 'wb') as file:
+                    file.write(self._cached(name, data, fmt, self.DPI))
+                written.append(path)
+        return written
+
+    def render_report(self, report, names=None):
+        """Все графики отчета одним многостраничным PDF (bytes)"""
+        from matplotlib.backends.backend_pdf import PdfPages
+        import matplotlib
+
+        names = list(names) if names is not None else self.available(report)
+        pages = [(name, self.plot_data(name, report)) for name in names]
+        key = self._key('report', pages, 'pdf', self.DPI)
+        document = self._lookup(key)
+        if document is None:
+            buffer = io.BytesIO()
+            with _stage('render', 'report'), matplotlib.rc_context(self.STYLE), PdfPages(buffer) as pdf:
+                for name, data in pages:
+                    pdf.savefig(self._draw(name, data), facecolor='#FFFFFF', edgecolor='none')
+            document = buffer.getvalue()
+            self._remember(key, document)
+        return document
+
+    def clear(self):
+        """Очищает кэш изображений в памяти"""
+        self._images.clear()
+        self._image_bytes = 0
+
+    # --- Кэш ---
+
+    def _key(self, name, data, fmt, dpi):
+        parts = [self.VERSION, name, fmt, round(dpi, 3), data]
+        return 'plot-' + hashlib.sha1(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _lookup(self, key, disk=True):
+        image = self._images.get(key)
+        if image is not None:
+            self._images.move_to_end(key)
+            return image
+        if disk and self.cache is not None:
+            entry = self.cache.load(key)
+            if entry is not None:
+                image = base64.b64decode(entry['image'])
+                self._remember(key, image, store=False)
+        return image
+
+    def _remember(self, key, image, store=True):
+        if key not in self._images:
+            self._images[key] = image
+            self._image_bytes += len(image)
+        while self._image_bytes > self.memory_bytes and len(self._images) > 1:
+            _, old = self._images.popitem(last=False)
+            self._image_bytes -= len(old)
+        if store and self.cache is not None:
+            self.cache.store(key, {'image': base64.b64encode(image).decode('ascii')})
+
+    def _cached(self, name, data, fmt, dpi):
+        # Пиксели для окна на диск не пишем: они дешевле PNG и нужны только в этом процессе
+        key = self._key(name, data, fmt, dpi)
+        image = self._lookup(key, disk=fmt != 'rgba')
+        if image is None:
+            with _stage('render', name):
+                image = self._render(name, data, fmt, dpi)
+            self._remember(key, image, store=fmt != 'rgba')
+        return image
+
+    # --- Отрисовка ---
+
+    def _template(self):
+        # Одна фигура на все графики: холст Agg создается один раз, pyplot не нужен
+        if self._figure is None:
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            from matplotlib.figure import Figure
+
+            # Раскладка 'tight' выполняется внутри того же прохода, что и сохранение
+            self._figure = Figure(facecolor='#FFFFFF', layout='tight')
+            FigureCanvasAgg(self._figure)
+        return self._figure
+
+    def _render(self, name, data, fmt, dpi):
+        import matplotlib
+
+        with matplotlib.rc_context(self.STYLE):
+            figure = self._draw(name, data)
+            if fmt == 'rgba':
+                figure.set_dpi(dpi)
+                figure.canvas.draw()
+                # Перед пикселями - ширина и высота, чтобы хранить картинку одним bytes
+                return struct.pack('<II', *figure.canvas.get_width_height()) + bytes(figure.canvas.buffer_rgba())
+            buffer = io.BytesIO()
+            figure.savefig(buffer, format=fmt, dpi=dpi, facecolor='#FFFFFF', edgecolor='none')
+            return buffer.getvalue()
+
+    def _draw(self, name, data):
+        """Рисует график на фигуре-шаблоне (вызывается внутри rc_context(STYLE))"""
+        figure = self._template()
+        figure.clear()
+        figure.set_size_inches(data.get('figsize', self.FIGSIZE))
+        ax = figure.add_subplot()
+        getattr(self, f'_draw_{name}')(figure, ax, data)
+        ax.set_title(data['title'], fontfamily='Georgia', color='#212121', fontsize=14, pad=20, style='italic')
+        if 'xlabel' in data:
+            ax.set_xlabel(data['xlabel'], fontfamily='Georgia', color='#424242', fontsize=11)
+            ax.set_ylabel(data['ylabel'], fontfamily='Georgia', color='#424242', fontsize=11)
+        return figure
+
+    @staticmethod
+    def _legend(ax):
+        # Легенда с монохромными цветами
+        legend = ax.legend(prop={'family': 'Georgia', 'size': 10})
+        for text in legend.get_texts():
+            text.set_color('#424242')
+
+    @staticmethod
+    def _data_quality(report):
+        quality = report['quality']
+        return {
+            'title': _plot_title('Качество последовательностей по позициям', report),
+            'xlabel': 'Позиция в риде (bp)', 'ylabel': 'Phred Quality Score',
+            'means': quality.average_qualities(),
+            'percentiles': quality.percentiles(),
+            'intervals': quality.confidence_intervals() if report.estimate is not None else None,
+        }
+
+    def _draw_quality(self, figure, ax, data):
+        from matplotlib.collections import LineCollection, PolyCollection
+
+        # Ящики - квартили, усы - 10-й и 90-й процентили, линия - среднее качество
+        means = data['means']
+        positions = range(1, len(means) + 1)
+
+        # Зоны плохого (< 20) и сомнительного (20-28) качества
+        ax.axhspan(0, 20, color='#E0E0E0', alpha=0.6, linewidth=0)
+        ax.axhspan(20, 28, color='#E0E0E0', alpha=0.25, linewidth=0)
+
+        # Все ящики, усы и медианы - тремя коллекциями, а не отдельными линиями на каждую позицию
+        filled = [(position, row) for position, row in zip(positions, data['percentiles']) if row[2] is not None]
+        half = 0.35
+        ax.add_collection(PolyCollection(
+            [[(x - half, q1), (x + half, q1), (x + half, q3), (x - half, q3)] for x, (_, q1, _, q3, _) in filled],
+            facecolors='#BDBDBD', edgecolors='#616161', linewidths=0.8))
+        whiskers = []
+        for x, (p10, q1, _, q3, p90) in filled:
+            whiskers += [[(x, p10), (x, q1)], [(x, q3), (x, p90)],
+                         [(x - half / 2, p10), (x + half / 2, p10)], [(x - half / 2, p90), (x + half / 2, p90)]]
+        ax.add_collection(LineCollection(whiskers, colors='#616161', linewidths=0.8))
+        ax.add_collection(LineCollection([[(x - half, median), (x + half, median)] for x, (_, _, median, _, _) in filled],
+                                         colors='#212121', linewidths=1.2))
+
+        # Для оценки по выборке - 95% интервал среднего
+        if data['intervals'] is not None:
+            ax.fill_between(positions, [mean - ci for mean, ci in zip(means, data['intervals'])],
+                            [mean + ci for mean, ci in zip(means, data['intervals'])],
+                            color='#9E9E9E', alpha=0.6, linewidth=0)
+        ax.plot(positions, means, linewidth=2, color='#424242')
+        ax.set_ylim(0, max([row[4] for _, row in filled] + [40]) + 2)
+
+    @staticmethod
+    def _data_tile(report, by='tile'):
+        labels, deviations = report['tile'].deviations(by)
+        title = 'Качество по плиткам проточной ячейки' if by == 'tile' else 'Качество по дорожкам'
+        return {
+            'title': _plot_title(title, report),
+            'xlabel': 'Позиция в риде (bp)', 'ylabel': 'Плитка (дорожка:плитка)' if by == 'tile' else 'Дорожка',
+            'labels': labels, 'deviations': deviations,
+        }
+
+    def _draw_tile(self, figure, ax, data):
+        # Цвет - насколько среднее качество плитки ниже среднего по всем ридам на той же позиции
+        from matplotlib import colormaps
+        from matplotlib.ticker import MaxNLocator
+
+        labels = data['labels']
+        ax.grid(False)
+        if not labels:
+            ax.text(0.5, 0.5, 'В заголовках нет номеров дорожек и плиток Illumina', transform=ax.transAxes,
+                    ha='center', va='center', fontfamily='Georgia', color='#616161', fontsize=12)
+            ax.set_xticks([])
+            ax.set_yticks([])
+            return
+
+        # Позиции без оценок остаются фоном; выше среднего - белый, как и ровно среднее
+        values = [[-min(value, 0) if value is not None else float('nan') for value in row]
+                  for row in data['deviations']]
+        limit = max([value for row in values for value in row if value == value] + [2])
+        cmap = colormaps['Greys'].copy()
+        cmap.set_bad('#FAFAFA')
+        image = ax.imshow(values, aspect='auto', cmap=cmap, vmin=0, vmax=limit, interpolation='nearest',
+                          extent=(0.5, len(values[0]) + 0.5, len(labels) - 0.5, -0.5))
+        step = max(1, math.ceil(len(labels) / 40))
+        ax.set_yticks(range(0, len(labels), step), labels[::step], fontsize=8 if step == 1 else 7)
+        ax.xaxis.set_major_locator(MaxNLocator(integer=True))
+        colorbar = figure.colorbar(image, ax=ax, pad=0.02)
+        colorbar.set_label('Ниже среднего качества (Phred)', fontfamily='Georgia', color='#424242', fontsize=10)
+        colorbar.outline.set_edgecolor('#BDBDBD')
+
+    @staticmethod
+    def _data_read_quality(report):
+        read_quality = report['read_quality']
+        scores, counts = read_quality.distribution()
+        return {
+            'title': _plot_title(f'Среднее качество ридов (чаще всего Q{read_quality.mode()})', report),
+            'xlabel': 'Среднее качество рида (Phred)', 'ylabel': 'Количество ридов',
+            'scores': scores, 'counts': counts,
+        }
+
+    def _draw_read_quality(self, figure, ax, data):
+        scores = data['scores']
+        ax.axvspan(min(scores + [0]) - 1, 20, color='#E0E0E0', alpha=0.6, linewidth=0)
+        ax.axvspan(20, 28, color='#E0E0E0', alpha=0.25, linewidth=0)
+        ax.plot(scores, data['counts'], linewidth=2.5, color='#424242', marker='o',
+                markersize=4, markerfacecolor='#212121', markeredgecolor='#212121')
+        if scores:
+            ax.set_xlim(min(scores[0], 20) - 1, max(scores[-1], 28) + 1)
+
+    @staticmethod
+    def _data_content(report):
+        content = report['content']
+        return {
+            'title': _plot_title('Содержание нуклеотидов по позициям', report),
+            'xlabel': 'Позиция в риде (bp)', 'ylabel': 'Процент (%)',
+            'bases': {base: content.percentages(base) for base in content.bases},
+            'intervals': ({base: content.confidence_intervals(base) for base in content.bases}
+                          if report.estimate is not None else None),
+        }
+
+    def _draw_content(self, figure, ax, data):
+        # Монохромная палитра для нуклеотидов
+        colors = ['#212121', '#424242', '#616161', '#757575', '#9E9E9E', '#BDBDBD']
+
+        # Строим линии для каждого нуклеотида
+        for (base, percentages), color in zip(data['bases'].items(), colors):
+            positions = range(1, len(percentages) + 1)
+            if data['intervals'] is not None:
+                intervals = data['intervals'][base]
+                ax.fill_between(positions, [p - ci for p, ci in zip(percentages, intervals)],
+                                [p + ci for p, ci in zip(percentages, intervals)],
+                                color=color, alpha=0.15, linewidth=0)
+            ax.plot(positions, percentages, label=base, linewidth=2.5, color=color)
+        self._legend(ax)
+
+    @staticmethod
+    def _data_length(report):
+        lengths, counts = report['length'].bins()
+        return {
+            'title': _plot_title('Распределение длин последовательностей', report),
+            'xlabel': 'Длина последовательности (bp)', 'ylabel': 'Частота',
+            'lengths': lengths, 'counts': counts,
+        }
+
+    def _draw_length(self, figure, ax, data):
+        # Гистограмма строится по готовым счетчикам: длины с весами-количествами
+        ax.hist(data['lengths'], bins=20, weights=data['counts'], edgecolor='#424242', alpha=0.8, color='#757575')
+
+    @staticmethod
+    def _data_gc(report):
+        gc = report['gc']
+        return {
+            'title': _plot_title(f'GC-состав ридов (среднее {gc.mean():.1f}%)', report),
+            'xlabel': 'GC-состав (%)', 'ylabel': 'Количество ридов',
+            'counts': _as_list(gc.histogram), 'normal': gc.normal_fit(),
+        }
+
+    def _draw_gc(self, figure, ax, data):
+        # Наблюдаемое распределение и нормальное с теми же средним и дисперсией
+        percents = range(len(data['counts']))
+        ax.plot(percents, data['counts'], label='GC-состав ридов', linewidth=2.5, color='#212121')
+        ax.plot(percents, data['normal'], label='Теоретическое распределение', linewidth=2,
+                color='#9E9E9E', linestyle='--')
+        self._legend(ax)
+
+    @staticmethod
+    def _data_n_content(report):
+        return {
+            'title': _plot_title('Содержание N по позициям', report),
+            'xlabel': 'Позиция в риде (bp)', 'ylabel': 'Процент N (%)',
+            'percentages': report['content'].n_percentages(),
+        }
+
+    def _draw_n_content(self, figure, ax, data):
+        percentages = data['percentages']
+        ax.plot(range(1, len(percentages) + 1), percentages, linewidth=2.5, color='#424242')
+        ax.set_ylim(0, max(5, max(percentages, default=0) * 1.1))
+
+    @staticmethod
+    def _data_duplication(report):
+        duplication = report['duplication']
+        labels, reads, distinct = duplication.duplication_levels()
+        title = (f"Уровни дублирования: после дедупликации останется "
+                 f"{duplication.deduplicated_percent():.1f}% ридов")
+        return {
+            'title': _plot_title(title, report),
+            'xlabel': 'Сколько раз встречается последовательность', 'ylabel': 'Процент (%)',
+            'labels': labels, 'reads': reads, 'distinct': distinct,
+        }
+
+    def _draw_duplication(self, figure, ax, data):
+        positions = range(len(data['labels']))
+        ax.plot(positions, data['reads'], label='% от всех ридов', linewidth=2.5, color='#212121',
+                marker='o', markersize=5)
+        ax.plot(positions, data['distinct'], label='% от различных последовательностей', linewidth=2.5,
+                color='#9E9E9E', linestyle='--', marker='o', markersize=5)
+        ax.set_xticks(positions, data['labels'])
+        ax.set_ylim(0, 100)
+        self._legend(ax)
+
+    @staticmethod
+    def _data_overrepresented(report, rows=15):
+        table_rows = report['duplication'].overrepresented()[:rows]
+        return {
+            'title': _plot_title('Перепредставленные последовательности', report),
+            'figsize': (12, 0.8 + 0.35 * (len(table_rows) + 1)),
+            'rows': [[row['sequence'], f"{row['count']:,}", f"{row['percent']:.2f}", row['source']]
+                     for row in table_rows],
+        }
+
+    def _draw_overrepresented(self, figure, ax, data):
+        ax.axis('off')
+        if not data['rows']:
+            ax.text(0.5, 0.5, 'Перепредставленных последовательностей нет', ha='center', va='center',
+                    fontfamily='Georgia', color='#616161', fontsize=12, style='italic')
+            return
+        table = ax.table(cellText=data['rows'], colLabels=['Последовательность', 'Ридов', '%', 'Возможный источник'],
+                         colWidths=[0.55, 0.12, 0.08, 0.25], bbox=[0, 0, 1, 1], cellLoc='left')
+        table.auto_set_font_size(False)
+        table.set_fontsize(9)
+        # Монохромная таблица: серая шапка, светлые строки, моноширинные последовательности
+        for (row, column), cell in table.get_celld().items():
+            cell.set_edgecolor('#E0E0E0')
+            if row == 0:
+                cell.set_facecolor('#EEEEEE')
+                cell.set_text_props(color='#212121', fontfamily='Georgia', weight='bold')
+            else:
+                cell.set_facecolor('#FFFFFF' if row % 2 else '#FAFAFA')
+                cell.set_text_props(color='#424242', fontfamily='monospace' if column == 0 else 'Georgia')
+
+    @staticmethod
+    def _sample_ticks(ax, labels, axis='y'):
+        # Не больше 40 подписей образцов, иначе они сливаются
+        step = max(1, math.ceil(len(labels) / 40))
+        set_ticks = ax.set_yticks if axis == 'y' else ax.set_xticks
+        set_ticks(range(0, len(labels), step), labels[::step], fontsize=8 if step == 1 else 7,
+                  **({'rotation': 90} if axis == 'x' else {}))
+
+    @staticmethod
+    def _data_samples_quality(collection):
+        means = collection.mean_qualities()
+        return {
+            'title': f'Среднее качество по позициям (образцов: {len(collection)})',
+            'xlabel': 'Позиция в риде (bp)', 'ylabel': 'Образец',
+            'labels': collection.names,
+            'means': [[round(value, 2) if value == value else None for value in row] for row in means.tolist()],
+        }
+
+    def _draw_samples_quality(self, figure, ax, data):
+        # Образцы - строки, позиции - столбцы; чем темнее, тем ниже качество
+        from matplotlib import colormaps
+        from matplotlib.colors import ListedColormap
+        from matplotlib.ticker import MaxNLocator
+
+        ax.grid(False)
+        values = [[value if value is not None else float('nan') for value in row] for row in data['means']]
+        if not values or not values[0]:
+            return
+        known = [value for row in values for value in row if value == value]
+        # Самое высокое качество - светло-серое, чтобы отличаться от позиций без ридов
+        cmap = ListedColormap(colormaps['Greys_r'](np.linspace(0, 0.85, 256)))
+        cmap.set_bad('#FFFFFF')
+        image = ax.imshow(values, aspect='auto', cmap=cmap, vmin=min(known + [20]), vmax=max(known + [40]),
+                          interpolation='nearest', extent=(0.5, len(values[0]) + 0.5, len(values) - 0.5, -0.5))
+        self._sample_ticks(ax, data['labels'])
+        ax.xaxis.set_major_locator(MaxNLocator(integer=True))
+        colorbar = figure.colorbar(image, ax=ax, pad=0.02)
+        colorbar.set_label('Среднее качество (Phred)', fontfamily='Georgia', color='#424242', fontsize=10)
+        colorbar.outline.set_edgecolor('#BDBDBD')
+
+    @staticmethod
+    def _data_samples_gc(collection):
+        percentages = collection.gc_percentages()
+        return {
+            'title': f'GC-состав ридов (образцов: {len(collection)})',
+            'xlabel': 'GC-состав (%)', 'ylabel': 'Процент ридов (%)',
+            'percentages': [[round(value, 4) for value in row] for row in percentages.tolist()],
+            'median': [round(value, 4) for value in np.median(percentages, axis=0).tolist()] if len(collection) else [],
+        }
+
+    def _draw_samples_gc(self, figure, ax, data):
+        # Сотни кривых - одной коллекцией линий, медиана по образцам поверх
+        from matplotlib.collections import LineCollection
+
+        percents = range(101)
+        ax.add_collection(LineCollection([list(zip(percents, row)) for row in data['percentages']],
+                                         colors='#9E9E9E', linewidths=0.8, alpha=0.5, label='Образцы'))
+        if data['median']:
+            ax.plot(percents, data['median'], linewidth=2.5, color='#212121', label='Медиана по образцам')
+        ax.autoscale_view()
+        ax.set_xlim(0, 100)
+        self._legend(ax)
+
+    @staticmethod
+    def _data_samples_reads(collection):
+        return {
+            'title': f'Число ридов (образцов: {len(collection)})',
+            'xlabel': 'Образец', 'ylabel': 'Количество ридов',
+            'labels': collection.names, 'counts': collection.sequence_counts(),
+        }
+
+    def _draw_samples_reads(self, figure, ax, data):
+        positions = range(len(data['counts']))
+        ax.bar(positions, data['counts'], color='#757575', edgecolor='#424242', linewidth=0.5, width=0.8)
+        self._sample_ticks(ax, data['labels'], axis='x')
+        ax.set_xlim(-0.6, len(data['counts']) - 0.4)
+
+
+@lru_cache(maxsize=None)
+def _default_renderer():
+    # Общий на процесс: кэш изображений переживает пересоздание FastqReader
+    return PlotRenderer()
+
+
+class FastqReader:
+    """
+    Класс для чтения и анализа FASTQ файлов с оптимизацией памяти
+    Использует генераторы для работы с большими файлами
+    Все метрики считаются за один проход по файлу и хранятся в FastqReport
+    """
+
+    PARALLEL_MIN_BYTES = 16 * 1024 * 1024  # Меньше этого на процесс делить файл невыгодно
+    PREVIEW_READS = 50000  # Размер выборки предпросмотра по умолчанию
+    PREVIEW_WINDOWS = 64  # На сколько участков делится выборка по файлу
+    PREVIEW_BLOCK_SIZE = 64 * 1024  # Маленькие блоки, чтобы не читать лишнего сверх квоты
+    SNAPSHOT_INTERVAL = 2.0  # Секунд между снимками промежуточного отчета
+
+    def __init__(self, filename, metrics=DEFAULT_METRICS, backend='auto', workers=1, cache=None,
+                 index=False, index_dir=None, phred_offset=33, memory_limit=None):
+        """
+        filename - путь к файлу, '-' (stdin) или двоичный поток с read(): поток читается
+        один раз по мере поступления данных, без seek и временных файлов; кэш, индекс,
+        preview и параллельный разбор файла для него недоступны
+        workers - число процессов для параллельного анализа несжатого файла
+        или потоков распаковки BGZF (None - все ядра)
+        cache - ReportCache для хранения отчетов между запусками
+        index - использовать индекс FastqIndex (.fqi), а если его нет - построить при анализе;
+        index_dir - куда класть индекс, если рядом с файлом писать нельзя
+        phred_offset - кодировка качества: 33, 64 или 'auto' (определить по данным)
+        memory_limit - байт памяти метрики дублирования (None - SequenceDuplication.MEMORY_LIMIT)
+        """
+        if backend not in ('auto', 'numpy', 'python'):
+            raise ValueError(f"Неизвестный режим вычислений: {backend}")
+        if phred_offset not in PHRED_OFFSETS + ('auto',):
+            raise ValueError(f"Неизвестная кодировка качества: {phred_offset}")
+        if backend == 'numpy' and np is None:
+            raise ImportError("Для режима 'numpy' требуется установленный NumPy")
+        self.filename = filename
+        self.stream = filename == '-' or hasattr(filename, 'read')
+        self.metrics = list(metrics)
+        self.vectorized = np is not None and backend != 'python'
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        # Сжатие потока определяется по первым байтам при чтении
+        self.compression = detect_compression(filename) if not self.stream else None
+        self.cache = cache if not self.stream else None
+        # Смещения имеют смысл только без сжатия
+        self.index = index and not self.compression and not self.stream
+        self.index_dir = index_dir
+        self.phred_offset = phred_offset
+        self.memory_limit = memory_limit
+        self.renderer = None  # PlotRenderer для графиков; None - общий на процесс
+        self._index = None
+        self._report = None
+        self._stream_read = False
+
+    def register_metric(self, metric_class):
+        """Добавляет метрику в общий проход (сбрасывает посчитанный отчет)"""
+        if metric_class not in self.metrics:
+            self.metrics.append(metric_class)
+            self._report = None
+
+    def _open(self):
+        if not self.stream:
+            return open_fastq(self.filename, self.workers)
+        if self._stream_read:
+            raise ValueError("Поток уже прочитан: данные из stdin или pipe анализируются один раз")
+        self._stream_read = True
+        return open_stream(sys.stdin.buffer if self.filename == '-' else self.filename)
+
+    def _size(self):
+        # Размер потока заранее неизвестен
+        return os.path.getsize(self.filename) if not self.stream else None
+
+    def _scan_batches(self, track_offsets=False):
+        """ГЕНЕРАТОР: пачки ридов вместе с позицией в исходном файле после каждой"""
+        with self._open() as file:
+            try:
+                for batch in FastqParser(file, self.vectorized, track_offsets=track_offsets).batches():
+                    yield batch, _raw_position(file)
+            except EOFError:
+                raise FastqFormatError("Сжатый файл обрезан: нет конца gzip потока") from None
+
+    def _read_batches(self):
+        """ГЕНЕРАТОР: читает FASTQ файл двоичными блоками и выдает пачки ридов"""
+        for batch, _ in self._scan_batches():
+            yield batch
+
+    def _read_fastq_chunks(self):
+        """ГЕНЕРАТОР: читает FASTQ файл по одному риду за раз (4 строки текста)"""
+        for batch in self._read_batches():
+            for header, sequence, quality in batch.records():
+                yield [header.decode('ascii'), sequence.decode('ascii'), '+', quality.decode('ascii')]
+
+    def _new_report(self):
+        return FastqReport(_new_metrics(self.metrics, self.vectorized, self.memory_limit))
+
+    def get_index(self):
+        """Актуальный индекс файла (если индекс включен и уже построен) или None"""
+        if self.index and self._index is None:
+            self._index = FastqIndex.load(self.filename, self.index_dir)
+        return self._index
+
+    def split_ranges(self, parts):
+        """Делит файл на parts диапазонов байт, каждый начинается с границы записи"""
+        index = self.get_index()
+        if index is not None and index.count:
+            return index.record_ranges(parts)  # Точные границы без поиска по содержимому
+        size = os.path.getsize(self.filename)
+        with open(self.filename, 'rb') as file:
+            bounds = {find_record_start(file, size * i // parts) for i in range(parts)}
+        bounds = sorted(bounds | {size})
+        return [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+    def _parallel_parts(self):
+        # Сжатый файл и поток нельзя начать читать с произвольного байта
+        if self.workers <= 1 or self.compression or self.stream:
+            return 1
+        size = os.path.getsize(self.filename)
+        # Несколько диапазонов на процесс выравнивают нагрузку между ядрами
+        return max(1, min(self.workers * 4, size // self.PARALLEL_MIN_BYTES))
+
+    def _analyze_parallel(self, parts, progress, cancel, index, snapshots):
+        report = self._new_report()
+        ranges = self.split_ranges(parts)
+        total = os.path.getsize(self.filename)
+        interval = index.interval if index is not None else None
+        done = reads = 0
+        checkpoints = {}  # Начало диапазона -> (ридов, номера, смещения)
+        # Отчеты диапазонов объединяются строго в порядке файла (порядок плиток, кандидаты
+        # в частые последовательности), поэтому результат не зависит от того, какой процесс
+        # закончил первым; пришедшие раньше своей очереди ждут в ready
+        ready = {}
+        merged = 0  # Сколько первых диапазонов уже в report
+        with _stage('workers', 'analyze'), ProcessPoolExecutor(max_workers=min(self.workers, len(ranges))) as pool:
+            futures = {pool.submit(_analyze_range, self.filename, start, end,
+                                   self.metrics, self.vectorized, interval, self.memory_limit): (start, end)
+                       for start, end in ranges}
+            for future in as_completed(futures):
+                start, end = futures[future]
+                partial, records, offsets = future.result()
+                ready[start] = partial
+                while merged < len(ranges) and ranges[merged][0] in ready:
+                    report.merge(ready.pop(ranges[merged][0]))
+                    merged += 1
+                checkpoints[start] = (partial.sequence_count, records, offsets)
+                done += end - start
+                reads += partial.sequence_count
+                if progress is not None:
+                    progress(done, total, reads)
+                # Снимок - по непрерывному началу файла
+                snapshots(report, ranges[merged - 1][1] if merged else 0, total)
+                if cancel is not None and cancel.is_set():
+                    # Уже запущенные диапазоны дочитываются, остальные снимаются
+                    for pending in futures:
+                        pending.cancel()
+                    raise AnalysisCancelled()
+        if index is not None:
+            # Номера ридов диапазонов сдвигаются на число ридов во всех предыдущих
+            shift = 0
+            for start in sorted(checkpoints):
+                count, records, offsets = checkpoints[start]
+                index.extend(records, offsets, shift)
+                shift += count
+        return report
+
+    def analyze(self, progress=None, cancel=None, snapshot=None, snapshot_interval=SNAPSHOT_INTERVAL):
+        """
+        Считает все метрики за один проход по файлу (память O(1) по ридам)
+        progress(прочитано_байт, размер_файла, ридов) вызывается после каждого блока
+        (для потока размер неизвестен - None),
+        cancel - threading.Event: если он установлен, анализ прерывается AnalysisCancelled,
+        snapshot(отчет) не чаще раза в snapshot_interval секунд получает копию уже
+        накопленных метрик (см. snapshot_report) - результаты, сходящиеся по мере чтения
+        """
+        # Индекс строится попутно, если он включен, а актуального еще нет
+        index = FastqIndex() if self.index and self.get_index() is None else None
+        cache_key = None
+        if self.cache is not None and index is None:
+            cache_key = self.cache.key(self.filename, self.metrics, self.memory_limit)
+            report = self._load_cached(cache_key)
+            if report is not None:
+                if progress is not None:
+                    total = self._size()
+                    progress(total, total, report.sequence_count)
+                self._report = report.set_phred_offset(self.phred_offset)
+                return report
+
+        snapshots = self._snapshots(snapshot, snapshot_interval)
+        parts = self._parallel_parts()
+        if parts > 1:
+            report = self._analyze_parallel(parts, progress, cancel, index, snapshots)
+        else:
+            report = self._new_report()
+            total = self._size()
+            for batch, position in self._scan_batches(track_offsets=index is not None):
+                report.update_batch(batch)
+                if index is not None:
+                    index.add_batch(batch)
+                if progress is not None:
+                    progress(position, total, report.sequence_count)
+                snapshots(report, position, total)
+                if cancel is not None and cancel.is_set():
+                    raise AnalysisCancelled()
+        if cache_key is not None:
+            self.cache.store(cache_key, report.to_dict())
+        if index is not None:
+            index.finish(self.filename, report)
+            index.save(self.filename, self.index_dir)
+            self._index = index
+        self._report = report.set_phred_offset(self.phred_offset)
+        return report
+
+    def _snapshots(self, snapshot, interval):
+        """Функция (отчет, позиция, размер), передающая snapshot снимки не чаще interval секунд"""
+        last = time.perf_counter()
+
+        def take(report, position, total):
+            nonlocal last
+            if snapshot is None or time.perf_counter() - last < interval:
+                return
+            snapshot(self.snapshot_report(report, position, total))
+            last = time.perf_counter()
+        return take
+
+    def snapshot_report(self, report, position, total=None):
+        """
+        Независимая копия промежуточного отчета как оценка по прочитанной части данных:
+        estimate['method'] = 'partial', число ридов экстраполируется по доле прочитанных
+        байт (для потока неизвестного размера - уже прочитанные риды)
+        """
+        snapshot = report.copy()
+        reads = report.sequence_count
+        estimated = max(reads, round(total * reads / position)) if total and position else reads
+        snapshot.estimate = {'method': 'partial', 'sampled_reads': reads, 'estimated_reads': estimated}
+        return snapshot.set_phred_offset(self.phred_offset)
+
+    def preview(self, reads=PREVIEW_READS, fraction=None):
+        """
+        Быстрая оценка всех метрик по выборке вместо полного прохода
+        reads - примерный размер выборки, fraction - доля байт файла (вместо reads)
+        Несжатый файл читается PREVIEW_WINDOWS участками, равномерно разнесенными по файлу:
+        начало каждого участка выравнивается на границу записи через find_record_start.
+        Сжатый файл нельзя читать с произвольного байта, поэтому берется его начало.
+        В report.estimate - объем выборки и оценка числа ридов во всем файле;
+        если выборка покрыла весь файл, отчет точный (estimate is None).
+        Если полный отчет по файлу уже есть в cache, возвращается он, файл не читается
+        """
+        if self._report is not None:
+            return self._report
+        if self.stream:
+            raise ValueError("Оценка по выборке недоступна для потока: он читается один раз, "
+                             "используйте analyze(snapshot=...)")
+        if self.cache is not None:
+            report = self._load_cached(self.cache.key(self.filename, self.metrics, self.memory_limit))
+            if report is not None:
+                self._report = report.set_phred_offset(self.phred_offset)
+                return self._report
+        size = os.path.getsize(self.filename)
+        budget = size * fraction if fraction is not None else None
+        if self.compression:
+            report, exhausted, consumed = self._preview_head(reads, budget)
+            method = 'head'
+        else:
+            report, exhausted, consumed = self._preview_stride(reads, budget, size)
+            method = 'stride'
+        if not exhausted and report.sequence_count:
+            # Средний размер записи в выборке переводит размер файла в число ридов
+            estimated = max(report.sequence_count, round(size * report.sequence_count / consumed))
+            report.estimate = {'method': method, 'sampled_reads': report.sequence_count,
+                               'estimated_reads': estimated}
+        return report.set_phred_offset(self.phred_offset)
+
+    def _preview_stride(self, reads, budget, size):
+        # Квота на участок в ридах или байтах
+        windows = self.PREVIEW_WINDOWS
+        quota_reads = -(-reads // windows)
+        quota_bytes = budget / windows if budget is not None else None
+        block_size = self.PREVIEW_BLOCK_SIZE
+        if quota_bytes is not None:
+            block_size = int(min(block_size, max(4096, quota_bytes)))
+        report = self._new_report()
+        consumed = 0
+        exhausted = True
+        with open(self.filename, 'rb') as file:
+            bounds = sorted({find_record_start(file, size * i // windows) for i in range(windows)} | {size})
+            for start, end in zip(bounds, bounds[1:]):
+                file.seek(start)
+                parser = FastqParser(_RangeReader(file, end - start), self.vectorized,
+                                     block_size, offset=start)
+                window_reads = 0
+                for batch in parser.batches():
+                    report.update_batch(batch)
+                    window_reads += len(batch)
+                    if (window_reads >= quota_reads if quota_bytes is None
+                            else parser.offset - start >= quota_bytes):
+                        break
+                if parser.offset < end:
+                    exhausted = False
+                consumed += parser.offset - start
+                if quota_bytes is None and report.sequence_count:
+                    # Блок под квоту по среднему размеру записи: меньше лишних ридов сверх выборки
+                    record_size = consumed / report.sequence_count
+                    block_size = int(min(self.PREVIEW_BLOCK_SIZE, max(4096, quota_reads * record_size)))
+        return report, exhausted, consumed
+
+    def _preview_head(self, reads, budget):
+        report = self._new_report()
+        exhausted = True
+        with open_fastq(self.filename, self.workers) as file:
+            try:
+                for batch in FastqParser(file, self.vectorized, self.PREVIEW_BLOCK_SIZE).batches():
+                    report.update_batch(batch)
+                    consumed = _raw_position(file)
+                    if (report.sequence_count >= reads if budget is None else consumed >= budget):
+                        exhausted = False
+                        break
+            except EOFError:
+                raise FastqFormatError("Сжатый файл обрезан: нет конца gzip потока") from None
+            consumed = _raw_position(file)
+        return report, exhausted, consumed
+
+    def _load_cached(self, key):
+        data = self.cache.load(key)
+        if data is None:
+            return None
+        try:
+            return FastqReport.from_dict(data, self.metrics, self.vectorized)
+        except (KeyError, TypeError, ValueError):
+            return None  # Запись от другой версии метрик: пересчитываем
+
+    def get_report(self):
+        """Возвращает отчет, при необходимости выполняя проход по файлу"""
+        if self._report is None:
+            self.analyze()
+        return self._report
+
+    def calculate_statistics(self):
+        """Возвращает количество последовательностей и их суммарную длину"""
+        report = self.get_report()
+        return report.sequence_count, report.total_length
+
+    def get_sequence_count(self):
+        """Возвращает количество последовательностей в файле (из индекса - без чтения файла)"""
+        if self._report is None and self.get_index() is not None:
+            return self._index.count
+        return self.get_report().sequence_count
+
+    def get_average_length(self):
+        """Возвращает среднюю длину последовательностей"""
+        if self._report is None and self.get_index() is not None:
+            return self._index.average_length
+        return self.get_report().average_length
+
+    def get_record(self, number):
+        """
+        Возвращает рид номер number (с нуля) как (заголовок, последовательность, качество)
+        Требует индекс: чтение начинается с ближайшей контрольной точки
+        """
+        index = self.get_index()
+        if index is None:
+            raise ValueError("Для доступа к риду по номеру нужен индекс: FastqReader(..., index=True) "
+                             "и хотя бы один вызов analyze()")
+        first, offset = index.locate(number)
+        with open(self.filename, 'rb') as file:
+            file.seek(offset)
+            # Небольшие блоки: нужно прочитать не больше interval ридов
+            parser = FastqParser(file, block_size=64 * 1024)
+            skip = number - first
+            for batch in parser.batches():
+                if skip < len(batch):
+                    return batch.headers[skip], batch.sequences[skip], batch.qualities[skip]
+                skip -= len(batch)
+        raise IndexError(f"Рид №{number} не найден: индекс устарел")
+
+    def _renderer(self):
+        return self.renderer if self.renderer is not None else _default_renderer()
+
+    def _save_plot(self, name, output, report, **options):
+        report = report if report is not None else self.get_report()
+        return self._renderer().save(name, report, output, **options)
+
+    def render_plot(self, name, report=None, fmt='png', **options):
+        """
+        График name (см. PlotRenderer.PLOTS) в памяти: bytes в формате fmt (png, svg, pdf)
+        Повторный вызов с теми же данными берет готовое изображение из кэша
+        """
+        report = report if report is not None else self.get_report()
+        return self._renderer().render(name, report, fmt, **options)
+
+    def render_plot_rgba(self, name, report=None, max_size=(800, 400), **options):
+        """График для окна: (ширина, высота, пиксели RGBA), вписанный в max_size"""
+        report = report if report is not None else self.get_report()
+        return self._renderer().render_rgba(name, report, max_size, **options)
+
+    def save_plots(self, output_dir, report=None, formats=('png',), pdf_report=False, workers=1):
+        """Сохраняет все графики отчета в output_dir (и report.pdf), возвращает список файлов"""
+        report = report if report is not None else self.get_report()
+        return self._renderer().save_all(report, output_dir, formats=formats, pdf_report=pdf_report,
+                                         workers=workers)
+
+    def plot_per_base_quality(self, output="quality.png", report=None):
+        """
+        Строит график качества по позициям (Per Base Sequence Quality):
+        ящики - квартили, усы - 10-й и 90-й процентили, линия - среднее качество
+        report - готовый отчет (например, preview()); для оценки рисуется 95% интервал среднего
+        """
+        return self._save_plot('quality', output, report)
+
+    def plot_per_tile_quality(self, output="tile.png", report=None, by='tile'):
+        """
+        Строит тепловую карту качества по плиткам проточной ячейки (Per Tile Sequence Quality)
+        Цвет - насколько среднее качество плитки ниже среднего по всем ридам на той же позиции:
+        чем темнее, тем хуже. by='lane' - то же по дорожкам
+        """
+        return self._save_plot('tile', output, report, by=by)
+
+    def plot_per_sequence_quality(self, output="read_quality.png", report=None):
+        """Строит распределение ридов по среднему качеству (Per Sequence Quality Scores)"""
+        return self._save_plot('read_quality', output, report)
+
+    def plot_per_base_content(self, output="content.png", report=None):
+        """Строит график содержания нуклеотидов по позициям (Per Base Sequence Content)"""
+        return self._save_plot('content', output, report)
+
+    def plot_sequence_length_distribution(self, output="length.png", report=None):
+        """Строит гистограмму распределения длин последовательностей"""
+        return self._save_plot('length', output, report)
+
+    def plot_gc_content(self, output="gc.png", report=None):
+        """Строит распределение GC-состава ридов (Per Sequence GC Content)"""
+        return self._save_plot('gc', output, report)
+
+    def plot_n_content(self, output="n_content.png", report=None):
+        """Строит процент неопределенных нуклеотидов N по позициям (Per Base N Content)"""
+        return self._save_plot('n_content', output, report)
+
+    def plot_duplication_levels(self, output="duplication.png", report=None):
+        """Строит график уровней дублирования последовательностей (Sequence Duplication Levels)"""
+        return self._save_plot('duplication', output, report)
+
+    def plot_overrepresented_sequences(self, output="overrepresented.png", report=None, rows=15):
+        """Строит таблицу перепредставленных последовательностей (Overrepresented Sequences)"""
+        return self._save_plot('overrepresented', output, report, rows=rows)
+
+
+# <образец>_S1_L001_R1_001.fastq.gz, <образец>_R2.fq, <образец>_1.fastq и т.п.
+_MATE_PATTERN = re.compile(r'^(?P<prefix>.+?)[._-]R?(?P<mate>[12])(?P<suffix>(?:_\d+)?(?:\.[^.]+)*)$')
+
+
+def pair_files(paths):
+    """
+    Группирует файлы в пары R1/R2 по имени (Illumina: _R1_/_R2_, а также _1/_2)
+    Возвращает список кортежей (r1, r2) и (файл,) для файлов без пары в порядке путей
+    """
+    groups = {}
+    for path in paths:
+        match = _MATE_PATTERN.match(os.path.basename(path))
+        key = ((os.path.dirname(path), match['prefix'], match['suffix']) if match else (path,))
+        groups.setdefault(key, {})[int(match['mate']) if match else 0] = path
+    units = []
+    for mates in groups.values():
+        if set(mates) == {1, 2}:
+            units.append((mates[1], mates[2]))
+        else:
+            units.extend((path,) for path in mates.values())
+    order = {path: i for i, path in enumerate(paths)}
+    return sorted(units, key=lambda unit: order[unit[0]])
+
+
+def _read_ids(headers):
+    # ID рида: заголовок без '@', комментария после пробела и суффикса /1, /2
+    ids = []
+    for header in headers:
+        name = header[1:].split(None, 1)[0] if len(header) > 1 else b''
+        if name[-2:] in (b'/1', b'/2'):
+            name = name[:-2]
+        ids.append(name)
+    return ids
+
+
+def _analyze_pair(first, second, metrics, vectorized, check_ids=True, progress=None, cancel=None,
+                  memory_limit=None):
+    """
+    Считает метрики пары R1/R2 одним согласованным проходом по обоим файлам
+    (выполняется в процессе пула); сверяет ID ридов и их число
+    Памяти нужно на одну пачку ридов каждого файла, а не на весь файл
+    progress(прочитано_байт_обоих_файлов, None, ридов) и проверка cancel - после каждой пачки
+    """
+    reports = [FastqReport(_new_metrics(metrics, vectorized, memory_limit)) for _ in range(2)]
+    pending = [deque(), deque()]  # ID, прочитанные из файла, но еще не сверенные с парой
+    matched = 0
+    with open_fastq(first) as file1, open_fastq(second) as file2:
+        streams = [FastqParser(file1, vectorized).batches(), FastqParser(file2, vectorized).batches()]
+        finished = [False, False]
+        try:
+            while not all(finished):
+                # Дочитываем файл, который отстает: очередь несверенных ID не растет
+                side = 0 if finished[1] or (not finished[0] and len(pending[0]) <= len(pending[1])) else 1
+                batch = next(streams[side], None)
+                if batch is None:
+                    finished[side] = True
+                    continue
+                reports[side].update_batch(batch)
+                if progress is not None:
+                    progress(_raw_position(file1) + _raw_position(file2), None,
+                             reports[0].sequence_count + reports[1].sequence_count)
+                if cancel is not None and cancel.is_set():
+                    raise AnalysisCancelled()
+                if check_ids:
+                    pending[side].extend(_read_ids(batch.headers))
+                    while pending[0] and pending[1]:
+                        left, right = pending[0].popleft(), pending[1].popleft()
+                        if left != right:
+                            raise PairedReadsError(
+                                f"Рид №{matched + 1}: ID в {os.path.basename(first)} ({left.decode('ascii', 'replace')}) "
+                                f"не совпадает с ID в {os.path.basename(second)} ({right.decode('ascii', 'replace')})")
+                        matched += 1
+        except EOFError:
+            raise FastqFormatError("Сжатый файл обрезан: нет конца gzip потока") from None
+    if reports[0].sequence_count != reports[1].sequence_count:
+        raise PairedReadsError(
+            f"Разное число ридов в паре: {os.path.basename(first)} - {reports[0].sequence_count}, "
+            f"{os.path.basename(second)} - {reports[1].sequence_count}")
+    return reports
+
+
+def _analyze_unit(unit, metrics, vectorized, check_ids, cancel=None, updates=None, memory_limit=None):
+    """
+    Отчеты по одному файлу или паре R1/R2 (выполняется в процессе пула)
+    cancel - Event менеджера процессов, проверяется после каждой пачки;
+    в очередь updates после каждой пачки отправляется (unit, прочитано_байт, ридов)
+    """
+    progress = None
+    if updates is not None:
+        def progress(done, total, reads):
+            updates.put((unit, done, reads))
+    if len(unit) == 2:
+        return _analyze_pair(unit[0], unit[1], metrics, vectorized, check_ids, progress, cancel, memory_limit)
+    reader = FastqReader(unit[0], metrics, 'numpy' if vectorized else 'python', memory_limit=memory_limit)
+    return [reader.analyze(progress, cancel)]
+
+
+class FastqSample:
+    """
+    Образец из нескольких FASTQ файлов: дорожки (lanes) и пары R1/R2
+    Файлы и пары анализируются одновременно в процессах пула, файлы пары - одним
+    согласованным проходом со сверкой ID ридов. Файлы не склеиваются на диске:
+    общий отчет получается объединением (merge) отчетов по файлам
+    """
+
+    POLL_INTERVAL = 0.1  # Секунд между проверками прогресса и отмены в analyze
+
+    def __init__(self, filenames, metrics=DEFAULT_METRICS, backend='auto', workers=None, cache=None,
+                 check_pairs=True, phred_offset=33, memory_limit=None):
+        """
+        workers - сколько файлов или пар читать одновременно (None - все ядра)
+        check_pairs - сверять ID ридов в парах (иначе только число ридов)
+        phred_offset - кодировка качества: 33, 64 или 'auto' (определить по данным)
+        memory_limit - байт памяти метрики дублирования на каждый файл (None - по умолчанию)
+        """
+        if not filenames:
+            raise ValueError("Нужен хотя бы один FASTQ файл")
+        if any(filename == '-' or hasattr(filename, 'read') for filename in filenames):
+            raise ValueError("Поток (stdin, pipe) анализируется отдельно: FastqReader('-')")
+        self.filenames = list(filenames)
+        self.metrics = list(metrics)
+        self.backend = backend
+        self.readers = {filename: FastqReader(filename, self.metrics, backend, cache=cache,
+                                              phred_offset=phred_offset, memory_limit=memory_limit)
+                        for filename in self.filenames}
+        self.phred_offset = phred_offset
+        self.memory_limit = memory_limit
+        self.vectorized = self.readers[self.filenames[0]].vectorized
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.cache = cache
+        self.check_pairs = check_pairs
+        self.units = pair_files(self.filenames)
+        self.reports = {}  # Файл -> отчет по нему
+        self._report = None
+
+    @property
+    def pairs(self):
+        """Найденные пары (r1, r2)"""
+        return [unit for unit in self.units if len(unit) == 2]
+
+    def _new_report(self, estimate=None):
+        return FastqReport(_new_metrics(self.metrics, self.vectorized, self.memory_limit), estimate)
+
+    def _merge(self, reports, estimate=None):
+        merged = self._new_report(estimate)
+        for report in reports:
+            merged.merge(report)
+        return merged.set_phred_offset(self.phred_offset)
+
+    def _unit_key(self, unit):
+        keys = [self.cache.key(filename, self.metrics, self.memory_limit) for filename in unit]
+        if len(unit) == 1:
+            return keys[0]
+        # Пара кэшируется целиком: запись есть, только если сверка ID прошла
+        return hashlib.sha1(json.dumps([keys, self.check_pairs]).encode('utf-8')).hexdigest()
+
+    def _load_unit(self, unit):
+        if self.cache is None:
+            return None
+        data = self.cache.load(self._unit_key(unit))
+        if data is None:
+            return None
+        try:
+            if len(unit) == 1:
+                return [FastqReport.from_dict(data, self.metrics, self.vectorized)]
+            return [FastqReport.from_dict(part, self.metrics, self.vectorized) for part in data['mates']]
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def _store_unit(self, unit, reports):
+        if self.cache is None:
+            return
+        data = reports[0].to_dict() if len(unit) == 1 else {'mates': [report.to_dict() for report in reports]}
+        self.cache.store(self._unit_key(unit), data)
+
+    def analyze(self, progress=None, cancel=None, snapshot=None,
+                snapshot_interval=FastqReader.SNAPSHOT_INTERVAL):
+        """
+        Считает отчеты по всем файлам и общий отчет образца
+        progress(прочитано_байт, всего_байт, ридов) вызывается по мере чтения файлов и пар
+        (процессы пула сообщают о каждой пачке),
+        cancel - threading.Event: процессы пула прерываются после текущей пачки, оставшиеся
+        файлы снимаются, выбрасывается AnalysisCancelled,
+        snapshot(отчет) не чаще раза в snapshot_interval секунд получает объединение уже
+        готовых файлов как оценку (estimate['method'] = 'partial')
+        """
+        sizes = {unit: sum(os.path.getsize(filename) for filename in unit) for unit in self.units}
+        total = sum(sizes.values())
+        done = reads = 0
+        reports = {}
+        pending = []
+        for unit in self.units:
+            cached = self._load_unit(unit)
+            if cached is None:
+                pending.append(unit)
+                continue
+            reports[unit] = cached
+            done += sizes[unit]
+            reads += sum(report.sequence_count for report in cached)
+        if progress is not None:
+            progress(done, total, reads)
+
+        last = time.perf_counter()
+        if pending:
+            # Отмена и прогресс передаются в процессы пула через менеджер: Event и очередь
+            with multiprocessing.Manager() as manager, _stage('workers', 'analyze'), \
+                    ProcessPoolExecutor(max_workers=max(1, min(self.workers, len(pending)))) as pool:
+                stop, updates = manager.Event(), manager.Queue()
+                futures = {pool.submit(_analyze_unit, unit, self.metrics, self.vectorized,
+                                       self.check_pairs, stop, updates, self.memory_limit): unit
+                           for unit in pending}
+                running = {}  # Файл или пара в работе -> (прочитано байт, ридов)
+                remaining = set(futures)
+                while remaining:
+                    finished, remaining = wait(remaining, timeout=self.POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                    while True:
+                        try:
+                            unit, position, count = updates.get_nowait()
+                        except queue.Empty:
+                            break
+                        if unit not in reports:
+                            running[unit] = (position, count)
+                    for future in finished:
+                        unit = futures[future]
+                        reports[unit] = future.result()
+                        self._store_unit(unit, reports[unit])
+                        running.pop(unit, None)
+                        done += sizes[unit]
+                        reads += sum(report.sequence_count for report in reports[unit])
+                    if progress is not None:
+                        progress(done + sum(position for position, _ in running.values()), total,
+                                 reads + sum(count for _, count in running.values()))
+                    if finished and snapshot is not None and time.perf_counter() - last >= snapshot_interval:
+                        estimate = {'method': 'partial', 'sampled_reads': reads,
+                                    'estimated_reads': max(reads, round(total * reads / done)) if done else reads}
+                        snapshot(self._merge((report for parts in reports.values() for report in parts), estimate))
+                        last = time.perf_counter()
+                    if cancel is not None and cancel.is_set():
+                        # Запущенные части прервутся после текущей пачки, остальные снимаются
+                        stop.set()
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        raise AnalysisCancelled()
+
+        self.reports = {filename: report for unit in self.units
+                        for filename, report in zip(unit, reports[unit])}
+        for filename, report in self.reports.items():
+            self.readers[filename]._report = report.set_phred_offset(self.phred_offset)
+        self._report = self._merge(self.reports[filename] for filename in self.filenames)
+        return self._report
+
+    def preview(self, reads=FastqReader.PREVIEW_READS, fraction=None):
+        """Оценка общего отчета по выборкам из каждого файла (reads делится между файлами)"""
+        if self._report is not None:
+            return self._report
+        share = max(1, reads // len(self.filenames))
+        previews = [self.readers[filename].preview(share, fraction) for filename in self.filenames]
+        if all(report.estimate is None for report in previews):
+            return self.analyze()  # Файлы маленькие: сразу точный отчет со сверкой пар
+        estimate = {
+            'method': 'head' if any(report.estimate and report.estimate['method'] == 'head'
+                                    for report in previews) else 'stride',
+            'sampled_reads': sum(report.sequence_count for report in previews),
+            'estimated_reads': sum(report.estimated_count for report in previews),
+        }
+        return self._merge(previews, estimate)
+
+    def get_report(self):
+        """Общий отчет образца, при необходимости выполняя анализ"""
+        if self._report is None:
+            self.analyze()
+        return self._report
+
+    def mate_report(self, mate):
+        """Объединенный отчет по всем R1 (mate=1) или всем R2 (mate=2) файлам образца"""
+        if self._report is None:
+            self.analyze()
+        return self._merge(self.reports[unit[mate - 1]] for unit in self.pairs)
+
+    def get_sequence_count(self):
+        return self.get_report().sequence_count
+
+    def get_average_length(self):
+        return self.get_report().average_length
+
+    def _plot(self, method, output, report, **options):
+        # Графики строятся общим кодом FastqReader по отчету образца
+        report = report if report is not None else self.get_report()
+        return getattr(self.readers[self.filenames[0]], method)(output, report, **options)
+
+    def plot_per_base_quality(self, output="quality.png", report=None):
+        return self._plot('plot_per_base_quality', output, report)
+
+    def plot_per_tile_quality(self, output="tile.png", report=None, by='tile'):
+        return self._plot('plot_per_tile_quality', output, report, by=by)
+
+    def plot_per_sequence_quality(self, output="read_quality.png", report=None):
+        return self._plot('plot_per_sequence_quality', output, report)
+
+    def plot_per_base_content(self, output="content.png", report=None):
+        return self._plot('plot_per_base_content', output, report)
+
+    def plot_sequence_length_distribution(self, output="length.png", report=None):
+        return self._plot('plot_sequence_length_distribution', output, report)
+
+    def plot_gc_content(self, output="gc.png", report=None):
+        return self._plot('plot_gc_content', output, report)
+
+    def plot_n_content(self, output="n_content.png", report=None):
+        return self._plot('plot_n_content', output, report)
+
+    def plot_duplication_levels(self, output="duplication.png", report=None):
+        return self._plot('plot_duplication_levels', output, report)
+
+    def plot_overrepresented_sequences(self, output="overrepresented.png", report=None):
+        return self._plot('plot_overrepresented_sequences', output, report)
+
+    def render_plot(self, name, report=None, fmt='png', **options):
+        report = report if report is not None else self.get_report()
+        return self.readers[self.filenames[0]].render_plot(name, report, fmt, **options)
+
+    def render_plot_rgba(self, name, report=None, max_size=(800, 400), **options):
+        report = report if report is not None else self.get_report()
+        return self.readers[self.filenames[0]].render_plot_rgba(name, report, max_size, **options)
+
+    def save_plots(self, output_dir, report=None, formats=('png',), pdf_report=False, workers=1):
+        report = report if report is not None else self.get_report()
+        return self.readers[self.filenames[0]].save_plots(output_dir, report, formats, pdf_report, workers)
+
+
+def create_test_fastq():
+    """Создает тестовый FASTQ файл для демонстрации"""
+    print("СОЗДАЕМ ТЕСТОВЫЙ ФАЙЛ...")
+    test_data = ""
+    for i in range(100):
+        test_data += f"@read{i}\n"
+        test_data += "ATCGATCGATCGATCGATCG\n"  # 20 bp
+        test_data += "+\n"
+        test_data += "IIIIIIIIIIIIIIIIIIII\n"  # Качество 40
+    return test_data
+
+
+def sample_name(path):
+    """Имя образца по имени файла без расширений .gz/.fastq/.fq ('-' - stdin)"""
+    if path == '-':
+        return 'stdin'
+    name = os.path.basename(path)
+    for suffix in ('.gz', '.bgz', '.fastq', '.fq'):
+        if name.lower().endswith(suffix):
+            name = name[:-len(suffix)]
+    return name or 'sample'
+
+
+def _snapshot_logger(name):
+    """snapshot для analyze: печатает сходящиеся показатели образца в stderr"""
+    def log(report):
+        print(f"{name}: {report.sequence_count:,} ридов, средняя длина {report.average_length:.2f} bp, "
+              f"GC {report['gc'].mean():.1f}%, чаще всего Q{report['read_quality'].mode()}, "
+              f"после дедупликации {report['duplication'].deduplicated_percent():.1f}%", file=sys.stderr)
+    return log
+
+
+def analyze_sample(path, output_dir, backend='auto', workers=1, cache=None, index=False, preview=None,
+                   phred_offset=33, formats=('png',), pdf_report=False, live=None, timings=False, npz=False,
+                   memory_limit=None):
+    """
+    Анализирует один файл без GUI: графики и stats.json в output_dir
+    path - путь к файлу или '-' (stdin: данные анализируются по мере поступления)
+    preview - вместо полного прохода оценить метрики по выборке из стольких ридов
+    phred_offset - кодировка качества: 33, 64 или 'auto'
+    formats - форматы графиков (png, svg, pdf); pdf_report - все графики еще и в report.pdf
+    live - раз в столько секунд печатать промежуточные показатели в stderr
+    timings - замерить стадии (StageTimings): timings.json в output_dir и 'timings' в сводке
+    npz - кроме stats.json сохранить состояние метрик в report.npz (для compare_reports)
+    memory_limit - байт памяти метрики дублирования (None - по умолчанию)
+    Возвращает краткую сводку по образцу
+    """
+    start = time.perf_counter()
+    recorder = StageTimings() if timings else contextlib.nullcontext()
+    with recorder:
+        reader = FastqReader(path, backend=backend, workers=workers, cache=cache, index=index,
+                             phred_offset=phred_offset, memory_limit=memory_limit)
+        # Графики рисуются на холсте Agg без pyplot, дисплей не нужен; с cache готовые
+        # изображения при повторном запуске берутся из кэша
+        reader.renderer = PlotRenderer(cache)
+        if preview:
+            report = reader.preview(preview)
+        elif live:
+            report = reader.analyze(snapshot=_snapshot_logger(os.path.basename(output_dir)), snapshot_interval=live)
+        else:
+            report = reader.analyze()
+        reader.save_plots(output_dir, report, formats, pdf_report)
+        overrepresented = report['duplication'].overrepresented()
+        with open(os.path.join(output_dir, 'overrepresented.tsv'), 'w', encoding='utf-8') as file:
+            file.write("sequence\tcount\tpercent\tsource\n")
+            for row in overrepresented:
+                file.write(f"{row['sequence']}\t{row['count']}\t{row['percent']:.4f}\t{row['source']}\n")
+
+    summary = {
+        'file': os.path.abspath(path) if not reader.stream else 'stdin',
+        'sample': os.path.basename(output_dir),
+        'file_size': reader._size(),
+        'sequence_count': report.estimated_count,
+        'total_length': report.total_length,
+        'average_length': report.average_length,
+        'phred_offset': report.phred_offset,
+        'mean_read_quality_mode': report['read_quality'].mode(),
+        'gc_percent': report['gc'].mean(),
+        'deduplicated_percent': report['duplication'].deduplicated_percent(),
+        'overrepresented_sequences': len(overrepresented),
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+    if report.estimate is not None:
+        summary['estimate'] = report.estimate  # total_length относится только к выборке
+    if timings:
+        summary['timings'] = recorder.to_dict()['stages']
+        with open(os.path.join(output_dir, 'timings.json'), 'w', encoding='utf-8') as file:
+            json.dump(recorder.to_dict(), file, indent=2)
+    report.save(os.path.join(output_dir, 'stats.json'), summary)
+    if npz:
+        report.save(os.path.join(output_dir, 'report.npz'), summary)
+    return summary
+
+
+def _expand_inputs(patterns):
+    """Раскрывает шаблоны (glob) в список файлов без повторов"""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+def run_batch(paths, output_dir, jobs=1, backend='auto', workers=1, cache=None, index=False, preview=None,
+              phred_offset=33, formats=('png',), pdf_report=False, live=None, timings=False, npz=False,
+              memory_limit=None):
+    """Обрабатывает много файлов параллельно (jobs процессов), возвращает число ошибок"""
+    # Одинаковые имена образцов из разных папок получают суффикс
+    targets, used = [], Counter()
+    for path in paths:
+        name = sample_name(path)
+        used[name] += 1
+        if used[name] > 1:
+            name = f"{name}_{used[name]}"
+        targets.append((path, os.path.join(output_dir, name)))
+
+    summaries, failures = [], 0
+    options = (backend, workers, cache, index, preview, phred_offset, formats, pdf_report, live, timings, npz,
+               memory_limit)
+
+    def collect(path, result):
+        nonlocal failures
+        done = len(summaries) + failures + 1
+        try:
+            summary = result()
+        except Exception as e:
+            failures += 1
+            print(f"[{done}/{len(targets)}] ОШИБКА {path}: {e}", file=sys.stderr)
+            return
+        summaries.append(summary)
+        approx = '~' if 'estimate' in summary else ''
+        print(f"[{done}/{len(targets)}] {summary['sample']}: {approx}{summary['sequence_count']:,} ридов, "
+              f"средняя длина {summary['average_length']:.2f} bp, {summary['seconds']:.1f} s")
+
+    with ProcessPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = {pool.submit(analyze_sample, path, target, *options): path
+                   for path, target in targets if path != '-'}
+        # stdin есть только у этого процесса: поток читается здесь, пока пул занят файлами
+        for path, target in targets:
+            if path == '-':
+                collect(path, lambda: analyze_sample(path, target, *options))
+        for future in as_completed(futures):
+            collect(futures[future], future.result)
+
+    os.makedirs(output_dir, exist_ok=True)
+    summaries.sort(key=lambda summary: summary['sample'])
+    with open(os.path.join(output_dir, 'summary.json'), 'w', encoding='utf-8') as file:
+        json.dump(summaries, file, indent=2, ensure_ascii=False)
+    return failures
+
+
+def compare_reports(paths, output_dir, formats=('png',), cache=None):
+    """
+    Сводка по сохраненным отчетам образцов (report.npz или stats.json) без чтения FASTQ:
+    графики PlotRenderer.COMPARISON_PLOTS и таблица samples.tsv в output_dir
+    Возвращает ReportCollection
+    """
+    collection = ReportCollection(paths)
+    PlotRenderer(cache).save_comparison(collection, output_dir, formats=formats)
+    with open(os.path.join(output_dir, 'samples.tsv'), 'w', encoding='utf-8') as file:
+        file.write("sample\tsequence_count\taverage_length\tmean_quality\tgc_percent\tdeduplicated_percent\n")
+        for row in collection.table():
+            file.write(f"{row['sample']}\t{row['sequence_count']}\t{row['average_length']:.2f}\t"
+                       f"{row['mean_quality']:.2f}\t{row['gc_percent']:.2f}\t{row['deduplicated_percent']:.2f}\n")
+    return collection
+
+
+def __getattr__(name):
+    # GUI загружается только по требованию: импорт библиотеки не тянет tkinter и PIL
+    if name in ('FastQCAnalyzerGUI', 'RoundedButton'):
+        import fastq_gui
+        return getattr(fastq_gui, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="FastQC Analyzer. Без аргументов запускается GUI, "
+                    "с файлами - пакетный анализ без дисплея.")
+    parser.add_argument('inputs', nargs='*',
+                        help="FASTQ файлы или шаблоны, например 'runs/*.fastq.gz'; "
+                             "'-' - читать из stdin (zcat x.fq.gz | python fastq.py -)")
+    parser.add_argument('-o', '--output', default='fastqc_results',
+                        help="папка для графиков и stats.json (по умолчанию fastqc_results)")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help="сколько файлов обрабатывать одновременно")
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help="процессов (или потоков распаковки BGZF) на один файл")
+    parser.add_argument('--backend', choices=('auto', 'numpy', 'python'), default='auto',
+                        help="режим вычислений метрик")
+    parser.add_argument('--cache', metavar='DIR',
+                        help="папка постоянного кэша отчетов (по умолчанию кэш не используется)")
+    parser.add_argument('--cache-size', type=int, default=256, metavar='MB',
+                        help="предельный размер кэша, MB")
+    parser.add_argument('--index', action='store_true',
+                        help="строить индекс .fqi рядом с несжатыми файлами (или в папке кэша)")
+    parser.add_argument('--preview', type=int, nargs='?', const=FastqReader.PREVIEW_READS, metavar='READS',
+                        help="быстрая оценка по выборке ридов вместо полного прохода "
+                             f"(по умолчанию {FastqReader.PREVIEW_READS})")
+    parser.add_argument('--phred', choices=('33', '64', 'auto'), default='33',
+                        help="кодировка качества: Phred+33 (Sanger, Illumina 1.8+), Phred+64 "
+                             "(Illumina 1.3-1.7) или auto - определить по самому низкому символу")
+    parser.add_argument('--dup-memory', type=int, metavar='MB',
+                        help="память метрики дублирования на файл, MB: sketch и выборка хэшей "
+                             f"(по умолчанию {SequenceDuplication.MEMORY_LIMIT // (1024 * 1024)})")
+    parser.add_argument('--format', nargs='+', choices=PlotRenderer.FORMATS, default=['png'], dest='formats',
+                        help="форматы графиков (по умолчанию png)")
+    parser.add_argument('--pdf-report', action='store_true',
+                        help="дополнительно собрать все графики образца в многостраничный report.pdf")
+    parser.add_argument('--live', type=float, nargs='?', const=FastqReader.SNAPSHOT_INTERVAL, metavar='SECONDS',
+                        help="во время анализа печатать промежуточные показатели в stderr "
+                             f"(по умолчанию раз в {FastqReader.SNAPSHOT_INTERVAL:g} s)")
+    parser.add_argument('--timings', action='store_true',
+                        help="замерить время стадий (чтение, разбор, метрики, графики): "
+                             "timings.json в папке образца и 'timings' в summary.json")
+    parser.add_argument('--npz', action='store_true',
+                        help="сохранить состояние метрик еще и в report.npz (массивы NumPy для --compare)")
+    parser.add_argument('--compare', action='store_true',
+                        help="inputs - сохраненные отчеты (report.npz или stats.json): без чтения FASTQ "
+                             "построить сводные графики по образцам и samples.tsv в папке --output")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        paths = _expand_inputs(args.inputs)
+        if not paths:
+            parser.error("для --compare нужны файлы отчетов")
+        cache = ReportCache(args.cache, args.cache_size * 1024 * 1024) if args.cache else None
+        collection = compare_reports(paths, args.output, tuple(args.formats), cache)
+        print(f"Сводка по {len(collection)} образцам: {args.output}")
+        return 0
+
+    if not args.inputs:
+        from fastq_gui import run_gui
+        run_gui()
+        return 0
+
+    paths = _expand_inputs(args.inputs)
+    if not paths:
+        parser.error("по заданным шаблонам не найдено ни одного файла")
+    if '-' in paths and args.preview:
+        parser.error("--preview недоступен для stdin: поток читается один раз")
+    cache = ReportCache(args.cache, args.cache_size * 1024 * 1024) if args.cache else None
+    phred_offset = 'auto' if args.phred == 'auto' else int(args.phred)
+    if args.dup_memory is not None and args.dup_memory <= 0:
+        parser.error("--dup-memory должен быть положительным")
+    memory_limit = args.dup_memory * 1024 * 1024 if args.dup_memory else None
+    failures = run_batch(paths, args.output, args.jobs, args.backend, args.workers, cache, args.index,
+                         args.preview, phred_offset, tuple(args.formats), args.pdf_report, args.live,
+                         args.timings, args.npz, memory_limit)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
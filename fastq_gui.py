@@ -0,0 +1,649 @@
+# -*- coding: utf-8 -*-
+"""
+Графический интерфейс FastQC Analyzer на Tkinter
+Загружается только при запуске GUI, чтобы библиотечный импорт fastq оставался быстрым
+"""
+import os
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+
+from PIL import Image, ImageTk
+
+from fastq import AnalysisCancelled, FastqReader, FastqSample, ReportCache, create_test_fastq
+
+
+class RoundedButton(tk.Canvas):
+    """Кастомная скругленная кнопка на основе Canvas"""
+
+    def __init__(self, parent, text, command, width=150, height=45,
+                 corner_radius=20, bg_color='#E0E0E0', hover_color='#BDBDBD',
+                 text_color='#212121', font=('Georgia', 10, 'bold')):
+        super().__init__(parent, width=width, height=height,
+                         highlightthickness=0, bg=parent.cget('bg'))
+
+        self.command = command
+        self.bg_color = bg_color
+        self.hover_color = hover_color
+        self.text_color = text_color
+        self.font = font
+        self.corner_radius = corner_radius
+        self.width = width
+        self.height = height
+        self.text = text
+        self.enabled = True
+
+        self.bind("<Button-1>", self._on_click)
+        self.bind("<Enter>", self._on_enter)
+        self.bind("<Leave>", self._on_leave)
+
+        self.draw_button(bg_color)
+
+    def draw_button(self, color):
+        """Рисует скругленную кнопку"""
+        self.delete("all")
+
+        # Рисуем скругленный прямоугольник с увеличенным радиусом
+        self.create_rounded_rect(2, 2, self.width - 2, self.height - 2,
+                                 self.corner_radius, fill=color, outline='#BDBDBD', width=1)
+
+        # Добавляем текст
+        self.create_text(self.width // 2, self.height // 2,
+                         text=self.text, fill=self.text_color, font=self.font)
+
+    def create_rounded_rect(self, x1, y1, x2, y2, radius, **kwargs):
+        """Создает скругленный прямоугольник"""
+        points = [x1 + radius, y1,
+                  x2 - radius, y1,
+                  x2, y1,
+                  x2, y1 + radius,
+                  x2, y2 - radius,
+                  x2, y2,
+                  x2 - radius, y2,
+                  x1 + radius, y2,
+                  x1, y2,
+                  x1, y2 - radius,
+                  x1, y1 + radius,
+                  x1, y1]
+
+        return self.create_polygon(points, smooth=True, **kwargs)
+
+    def _on_click(self, event):
+        if self.enabled:
+            self.command()
+
+    def _on_enter(self, event):
+        self.draw_button(self.hover_color)
+
+    def _on_leave(self, event):
+        self.draw_button(self.bg_color)
+
+
+class FastQCAnalyzerGUI:
+    POLL_INTERVAL = 100  # мс между обновлениями прогресса анализа
+
+    def __init__(self, root):
+        self.root = root
+        self.root.title("FastQC Analyzer")
+        self.root.geometry("900x650")
+        self.root.configure(bg='#FFFFFF')
+
+        # Установка шрифта Georgia с курсивом для заголовков
+        self.style = ttk.Style()
+        self.style.configure('TLabel', font=('Georgia', 11), background='#FFFFFF', foreground='#212121')
+        self.style.configure('TButton', font=('Georgia', 10), borderwidth=0, focuscolor='none')
+        self.style.configure('Title.TLabel', font=('Georgia', 16, 'bold', 'italic'))
+        self.style.configure('Italic.TLabel', font=('Georgia', 11, 'italic'))
+
+        self.filenames = []  # Выбранные файлы: один файл или дорожки и пары R1/R2 образца
+        self.analyzer = None
+        self.report = None  # Показанный отчет: сначала оценка по выборке, затем полный
+        self.last_plot = None  # Последний построенный график, перестраивается при уточнении
+        self._analysis = None  # Состояние текущего фонового анализа
+        self.cache = ReportCache()  # Повторное открытие файла берет отчет с диска
+
+        self.setup_ui()
+
+    # Варианты кодировки качества: явные Phred+33/+64 или определение по данным
+    PHRED_CHOICES = {'Phred+33': 33, 'Phred+64': 64, 'Авто': 'auto'}
+
+    def setup_ui(self):
+        # Главный фрейм
+        main_frame = tk.Frame(self.root, bg='#FFFFFF')
+        main_frame.pack(fill='both', expand=True, padx=25, pady=25)
+
+        # Заголовок
+        title_label = ttk.Label(main_frame, text="FastQC Analyzer", style='Title.TLabel')
+        title_label.pack(pady=(0, 25))
+
+        # Фрейм для выбора файла
+        file_frame = tk.Frame(main_frame, bg='#FAFAFA', bd=1, relief='solid',
+                              highlightbackground='#E0E0E0', highlightthickness=1)
+        file_frame.pack(fill='x', pady=12, padx=10, ipady=12)
+
+        ttk.Label(file_frame, text="Выберите FASTQ файлы:", style='Italic.TLabel').pack(side='left', padx=15)
+
+        # Скругленная кнопка выбора файла с увеличенным радиусом
+        self.select_btn = RoundedButton(
+            file_frame, "Выбрать файл", self.select_file,
+            width=150, height=45, corner_radius=20,
+            bg_color='#F5F5F5', hover_color='#E0E0E0', text_color='#212121'
+        )
+        self.select_btn.pack(side='left', padx=15)
+
+        # Кодировка качества: по умолчанию Phred+33 (Sanger, Illumina 1.8+)
+        self.phred_choice = ttk.Combobox(file_frame, values=list(self.PHRED_CHOICES), state='readonly',
+                                         width=10, font=('Georgia', 10))
+        self.phred_choice.set('Phred+33')
+        self.phred_choice.bind('<<ComboboxSelected>>', self.change_phred_offset)
+        self.phred_choice.pack(side='right', padx=15)
+        ttk.Label(file_frame, text="Кодировка качества:", style='Italic.TLabel').pack(side='right')
+
+        # Метка с именем файла
+        self.file_label = ttk.Label(file_frame, text="Файл не выбран", foreground='#616161', style='Italic.TLabel')
+        self.file_label.pack(side='left', padx=15, fill='x', expand=True)
+
+        # Фрейм статистики
+        stats_frame = tk.Frame(main_frame, bg='#FAFAFA', bd=1, relief='solid',
+                               highlightbackground='#E0E0E0', highlightthickness=1)
+        stats_frame.pack(fill='x', pady=12, padx=10, ipady=12)
+
+        ttk.Label(stats_frame, text="Статистика файла:", style='Title.TLabel').pack(anchor='w', padx=15, pady=8)
+
+        self.stats_text = tk.Text(stats_frame, height=6, width=80, font=('Georgia', 10),
+                                  bg='#FFFFFF', fg='#212121', relief='flat', wrap='word',
+                                  borderwidth=1, highlightthickness=1, highlightcolor='#E0E0E0',
+                                  selectbackground='#E0E0E0')
+        self.stats_text.pack(padx=15, pady=10, fill='x')
+        self.stats_text.insert('1.0', "Статистика будет отображена здесь после выбора файла...")
+        self.stats_text.config(state='disabled')
+
+        # Прогресс фонового анализа
+        progress_frame = tk.Frame(stats_frame, bg='#FAFAFA')
+        progress_frame.pack(padx=15, fill='x')
+
+        self.progress_bar = ttk.Progressbar(progress_frame, mode='determinate', maximum=100)
+        self.progress_bar.pack(side='left', fill='x', expand=True)
+
+        self.cancel_btn = RoundedButton(
+            progress_frame, "Отменить", self.cancel_analysis,
+            width=120, height=35, corner_radius=15,
+            bg_color='#F5F5F5', hover_color='#E0E0E0', text_color='#212121'
+        )
+        self.cancel_btn.pack(side='left', padx=(15, 0))
+        self.set_cancel_state('disabled')
+
+        self.progress_label = ttk.Label(stats_frame, text="", foreground='#616161',
+                                        background='#FAFAFA', style='Italic.TLabel')
+        self.progress_label.pack(anchor='w', padx=15, pady=(4, 0))
+
+        # Фрейм для кнопок графиков
+        plots_frame = tk.Frame(main_frame, bg='#FAFAFA', bd=1, relief='solid',
+                               highlightbackground='#E0E0E0', highlightthickness=1)
+        plots_frame.pack(fill='x', pady=12, padx=10, ipady=12)
+
+        ttk.Label(plots_frame, text="Генерация графиков:", style='Title.TLabel').pack(anchor='w', padx=15, pady=8)
+
+        buttons_frame = tk.Frame(plots_frame, bg='#FAFAFA')
+        buttons_frame.pack(padx=15, pady=12, fill='x')
+
+        # Монохромная палитра для кнопок
+        button_colors = [
+            ('#F5F5F5', '#E0E0E0'),  # Светло-серый -> Серый
+            ('#EEEEEE', '#E0E0E0'),  # Очень светло-серый -> Серый
+            ('#FAFAFA', '#E0E0E0'),  # Бежево-белый -> Серый
+            ('#E0E0E0', '#BDBDBD')  # Серый -> Темно-серый
+        ]
+
+        # Скругленные кнопки для генерации графиков с увеличенным радиусом
+        self.quality_btn = RoundedButton(
+            buttons_frame, "Качество", self.plot_quality,
+            width=150, height=45, corner_radius=20,
+            bg_color=button_colors[0][0], hover_color=button_colors[0][1], text_color='#212121'
+        )
+        self.quality_btn.pack(side='left', padx=8, pady=6)
+
+        self.content_btn = RoundedButton(
+            buttons_frame, "Нуклеотиды", self.plot_content,
+            width=150, height=45, corner_radius=20,
+            bg_color=button_colors[1][0], hover_color=button_colors[1][1], text_color='#212121'
+        )
+        self.content_btn.pack(side='left', padx=8, pady=6)
+
+        self.length_btn = RoundedButton(
+            buttons_frame, "Длины", self.plot_length,
+            width=150, height=45, corner_radius=20,
+            bg_color=button_colors[2][0], hover_color=button_colors[2][1], text_color='#212121'
+        )
+        self.length_btn.pack(side='left', padx=8, pady=6)
+
+        self.read_quality_btn = RoundedButton(
+            buttons_frame, "Качество ридов", self.plot_read_quality,
+            width=150, height=45, corner_radius=20,
+            bg_color=button_colors[0][0], hover_color=button_colors[0][1], text_color='#212121'
+        )
+        self.read_quality_btn.pack(side='left', padx=8, pady=6)
+
+        self.all_plots_btn = RoundedButton(
+            buttons_frame, "Все графики", self.plot_all,
+            width=150, height=45, corner_radius=20,
+            bg_color=button_colors[3][0], hover_color=button_colors[3][1], text_color='#212121'
+        )
+        self.all_plots_btn.pack(side='left', padx=8, pady=6)
+
+        # Второй ряд: дополнительные метрики
+        extra_buttons_frame = tk.Frame(plots_frame, bg='#FAFAFA')
+        extra_buttons_frame.pack(padx=15, pady=(0, 12), fill='x')
+
+        self.duplication_btn = RoundedButton(
+            extra_buttons_frame, "Дубликаты", self.plot_duplication,
+            width=150, height=45, corner_radius=20,
+            bg_color=button_colors[1][0], hover_color=button_colors[1][1], text_color='#212121'
+        )
+        self.duplication_btn.pack(side='left', padx=8, pady=6)
+
+        self.overrepresented_btn = RoundedButton(
+            extra_buttons_frame, "Частые", self.plot_overrepresented,
+            width=150, height=45, corner_radius=20,
+            bg_color=button_colors[2][0], hover_color=button_colors[2][1], text_color='#212121'
+        )
+        self.overrepresented_btn.pack(side='left', padx=8, pady=6)
+
+        self.gc_btn = RoundedButton(
+            extra_buttons_frame, "GC-состав", self.plot_gc,
+            width=150, height=45, corner_radius=20,
+            bg_color=button_colors[0][0], hover_color=button_colors[0][1], text_color='#212121'
+        )
+        self.gc_btn.pack(side='left', padx=8, pady=6)
+
+        self.n_content_btn = RoundedButton(
+            extra_buttons_frame, "N по позициям", self.plot_n_content,
+            width=150, height=45, corner_radius=20,
+            bg_color=button_colors[1][0], hover_color=button_colors[1][1], text_color='#212121'
+        )
+        self.n_content_btn.pack(side='left', padx=8, pady=6)
+
+        self.tile_btn = RoundedButton(
+            extra_buttons_frame, "Плитки", self.plot_tile,
+            width=150, height=45, corner_radius=20,
+            bg_color=button_colors[2][0], hover_color=button_colors[2][1], text_color='#212121'
+        )
+        self.tile_btn.pack(side='left', padx=8, pady=6)
+
+        self.export_btn = RoundedButton(
+            extra_buttons_frame, "Экспорт отчета", self.export_report,
+            width=150, height=45, corner_radius=20,
+            bg_color=button_colors[3][0], hover_color=button_colors[3][1], text_color='#212121'
+        )
+        self.export_btn.pack(side='left', padx=8, pady=6)
+
+        # Исходные цвета кнопок графиков для возврата из отключенного состояния
+        self.button_palette = {btn: (btn.bg_color, btn.hover_color) for btn in self.plot_buttons()}
+
+        # Область для вывода изображений
+        self.image_frame = tk.Frame(main_frame, bg='#FFFFFF')
+        self.image_frame.pack(fill='both', expand=True, pady=15)
+
+        self.image_label = ttk.Label(self.image_frame, text="Графики будут отображены здесь",
+                                     background='#FFFFFF', foreground='#757575', style='Italic.TLabel')
+        self.image_label.pack(expand=True)
+
+        # Блокировка кнопок до выбора файла
+        self.set_buttons_state('disabled')
+
+    def plot_buttons(self):
+        return [self.quality_btn, self.content_btn, self.length_btn, self.read_quality_btn, self.all_plots_btn,
+                self.duplication_btn, self.overrepresented_btn, self.gc_btn, self.n_content_btn,
+                self.tile_btn, self.export_btn]
+
+    def set_buttons_state(self, state):
+        """Устанавливает состояние кнопок"""
+        for btn in self.plot_buttons():
+            btn.enabled = state != 'disabled'
+            if state == 'disabled':
+                # Визуально делаем кнопки светлыми когда отключены
+                btn.bg_color = '#FAFAFA'
+                btn.hover_color = '#FAFAFA'
+                btn.draw_button('#FAFAFA')
+            else:
+                # Возвращаем оригинальные цвета
+                btn.bg_color, btn.hover_color = self.button_palette[btn]
+                btn.draw_button(btn.bg_color)
+
+    def select_file(self):
+        """Выбор одного файла или нескольких файлов образца (пары R1/R2, дорожки)"""
+        filenames = filedialog.askopenfilenames(
+            title="Выберите FASTQ файлы",
+            filetypes=[("FASTQ files", "*.fastq *.fq *.fastq.gz *.fq.gz *.gz"), ("All files", "*.*")]
+        )
+
+        if filenames:
+            self.filenames = list(filenames)
+            if len(self.filenames) == 1:
+                self.file_label.config(text=os.path.basename(self.filenames[0]))
+            else:
+                self.file_label.config(text=f"{len(self.filenames)} файлов, общий отчет")
+            self.analyze_file()
+
+    def set_cancel_state(self, state):
+        """Включает кнопку отмены только на время анализа"""
+        self.cancel_btn.enabled = state != 'disabled'
+        self.cancel_btn.bg_color = '#F5F5F5' if self.cancel_btn.enabled else '#FAFAFA'
+        self.cancel_btn.hover_color = '#E0E0E0' if self.cancel_btn.enabled else '#FAFAFA'
+        self.cancel_btn.draw_button(self.cancel_btn.bg_color)
+
+    def analyze_file(self):
+        """Запускает анализ выбранного файла в фоновом потоке"""
+        self.cancel_analysis()
+        self.analyzer = None
+        self.report = None
+        self.last_plot = None
+        self.set_buttons_state('disabled')
+        self.set_cancel_state('normal')
+
+        # Поток пишет только в свой словарь, интерфейс читает его из root.after
+        phred_offset = self.PHRED_CHOICES[self.phred_choice.get()]
+        analysis = {
+            'reader': (FastqReader(self.filenames[0], cache=self.cache, phred_offset=phred_offset)
+                       if len(self.filenames) == 1
+                       else FastqSample(self.filenames, cache=self.cache, phred_offset=phred_offset)),
+            'cancel': threading.Event(),
+            'progress': (0, sum(map(os.path.getsize, self.filenames)), 0),
+            'started': time.perf_counter(),
+            'preview': None,
+            'snapshot': None,  # Последний промежуточный отчет полного прохода
+            'report': None,
+            'error': None,
+        }
+        analysis['thread'] = threading.Thread(target=self._run_analysis, args=(analysis,), daemon=True)
+        self._analysis = analysis
+        self.progress_bar['value'] = 0
+        self.progress_label.config(text="Оценка по выборке...")
+        analysis['thread'].start()
+        self.root.after(self.POLL_INTERVAL, self._poll_analysis, analysis)
+
+    @staticmethod
+    def _run_analysis(analysis):
+        """Выполняется в фоновом потоке: быстрая оценка по выборке, затем полный проход"""
+        def progress(done, total, reads):
+            analysis['progress'] = (done, total, reads)
+
+        def snapshot(report):
+            analysis['snapshot'] = report
+
+        reader = analysis['reader']
+        try:
+            analysis['preview'] = reader.preview()
+            if analysis['preview'].estimate is None:
+                analysis['report'] = analysis['preview']  # Выборка покрыла весь файл
+            else:
+                analysis['report'] = reader.analyze(progress=progress, cancel=analysis['cancel'],
+                                                    snapshot=snapshot)
+        except Exception as e:
+            analysis['error'] = e
+
+    def cancel_analysis(self):
+        """Прерывает текущий фоновый анализ, если он идет"""
+        if self._analysis is not None and self._analysis['thread'].is_alive():
+            self._analysis['cancel'].set()
+            self.progress_label.config(text="Отмена...")
+
+    def _poll_analysis(self, analysis):
+        """Обновляет прогресс и по завершении показывает результаты (главный поток)"""
+        if analysis is not self._analysis:
+            return  # Анализ уже заменен анализом другого файла
+        if analysis['preview'] is not None and self.report is None:
+            # Оценка готова раньше полного прохода: сразу показываем ее
+            self.analyzer = analysis['reader']
+            self.show_report(analysis['preview'])
+            self.set_buttons_state('normal')
+        snapshot = analysis['snapshot']
+        if (snapshot is not None and self.report is not None and self.report.estimate is not None
+                and snapshot.sequence_count > self.report.estimate['sampled_reads']):
+            # Промежуточный отчет по уже прочитанной части точнее выборки: результаты сходятся
+            self.show_report(snapshot)
+            if self.last_plot is not None:
+                self.last_plot()
+        if analysis['thread'].is_alive():
+            if analysis['preview'] is not None:
+                self.show_progress(analysis)
+            self.root.after(self.POLL_INTERVAL, self._poll_analysis, analysis)
+            return
+
+        self.set_cancel_state('disabled')
+        error = analysis['error']
+        if isinstance(error, AnalysisCancelled):
+            self.progress_label.config(text="Анализ отменен, показана оценка по выборке")
+        elif error is not None:
+            self.progress_label.config(text="Ошибка анализа")
+            messagebox.showerror("Ошибка", f"Ошибка при анализе файла: {str(error)}")
+        else:
+            self.show_progress(analysis)
+            if analysis['report'] is not self.report:
+                self.show_report(analysis['report'])
+                if self.last_plot is not None:
+                    self.last_plot()  # Заменяем оценочный график точным
+
+    def change_phred_offset(self, event=None):
+        """Новая кодировка качества: пересчет показанных результатов без повторного анализа"""
+        phred_offset = self.PHRED_CHOICES[self.phred_choice.get()]
+        # Отчеты, которые анализ выдаст дальше, получат ту же кодировку
+        if self._analysis is not None:
+            self._analysis['reader'].phred_offset = phred_offset
+        if self.report is not None:
+            self.report.set_phred_offset(phred_offset)
+            self.show_statistics()
+            if self.last_plot is not None:
+                self.last_plot()
+
+    def show_progress(self, analysis):
+        """Прочитанные байты, скорость в ридах/с и оставшееся время"""
+        done, total, reads = analysis['progress']
+        elapsed = time.perf_counter() - analysis['started']
+        percent = done / total * 100 if total else 100
+        self.progress_bar['value'] = percent
+
+        text = f"{done / 1024 / 1024:,.1f} из {total / 1024 / 1024:,.1f} MB ({percent:.0f}%)"
+        if elapsed > 0:
+            text += f" · {reads / elapsed:,.0f} ридов/с"
+        if 0 < done < total:
+            remaining = elapsed * (total - done) / done
+            text += f" · осталось ~{int(remaining // 60)}:{int(remaining % 60):02d}"
+        elif done >= total:
+            text += f" · готово за {elapsed:.1f} s"
+        self.progress_label.config(text=text)
+
+    def show_report(self, report):
+        """Делает report текущим отчетом и выводит его статистику"""
+        self.report = report
+        self.show_statistics()
+
+    def show_statistics(self):
+        """Выводит статистику текущего отчета (оценка помечается знаком ~)"""
+        count = self.report.estimated_count
+        avg_len = self.report.average_length
+        total_bp = count * avg_len
+        approx = '~' if self.report.estimate is not None else ''
+
+        stats_text = f"""Количество последовательностей: {approx}{count:,}
+Средняя длина: {avg_len:.2f} bp
+Общий объем данных: {approx}{total_bp:,.0f} bp
+Размер файла: {sum(map(os.path.getsize, self.filenames)) / 1024 / 1024:.2f} MB
+Кодировка качества: Phred+{self.report.phred_offset}, чаще всего среднее качество рида Q{self.report['read_quality'].mode()}
+Средний GC-состав: {self.report['gc'].mean():.1f}%
+После дедупликации: {self.report['duplication'].deduplicated_percent():.1f}% ридов, \
+перепредставленных последовательностей: {len(self.report['duplication'].overrepresented())}"""
+        if self.report.estimate is not None:
+            stats_text += (f"\nОценка по выборке из {self.report.estimate['sampled_reads']:,} ридов, "
+                           "идет полный анализ...")
+        elif isinstance(self.analyzer, FastqSample):
+            # Общий отчет образца: добавляем разбивку по файлам
+            if self.analyzer.pairs:
+                stats_text += f"\nПары R1/R2: {len(self.analyzer.pairs)}, ID ридов совпадают"
+            for filename, report in self.analyzer.reports.items():
+                stats_text += (f"\n  {os.path.basename(filename)}: {report.sequence_count:,} ридов, "
+                               f"{report.average_length:.2f} bp")
+
+        self.stats_text.config(state='normal')
+        self.stats_text.delete('1.0', 'end')
+        self.stats_text.insert('1.0', stats_text)
+        self.stats_text.config(state='disabled')
+
+    def plot_quality(self):
+        """Генерация графика качества"""
+        if self.analyzer:
+            self.last_plot = self.plot_quality
+            try:
+                self.show_plot('quality')
+            except Exception as e:
+                messagebox.showerror("Ошибка", f"Ошибка при создании графика: {str(e)}")
+
+    def plot_read_quality(self):
+        """Генерация распределения ридов по среднему качеству"""
+        if self.analyzer:
+            self.last_plot = self.plot_read_quality
+            try:
+                self.show_plot('read_quality')
+            except Exception as e:
+                messagebox.showerror("Ошибка", f"Ошибка при создании графика: {str(e)}")
+
+    def plot_tile(self):
+        """Генерация тепловой карты качества по плиткам проточной ячейки"""
+        if self.analyzer:
+            self.last_plot = self.plot_tile
+            try:
+                self.show_plot('tile')
+            except Exception as e:
+                messagebox.showerror("Ошибка", f"Ошибка при создании графика: {str(e)}")
+
+    def plot_content(self):
+        """Генерация графика содержания нуклеотидов"""
+        if self.analyzer:
+            self.last_plot = self.plot_content
+            try:
+                self.show_plot('content')
+            except Exception as e:
+                messagebox.showerror("Ошибка", f"Ошибка при создании графика: {str(e)}")
+
+    def plot_length(self):
+        """Генерация графика распределения длин"""
+        if self.analyzer:
+            self.last_plot = self.plot_length
+            try:
+                self.show_plot('length')
+            except Exception as e:
+                messagebox.showerror("Ошибка", f"Ошибка при создании графика: {str(e)}")
+
+    def plot_duplication(self):
+        """Генерация графика уровней дублирования"""
+        if self.analyzer:
+            self.last_plot = self.plot_duplication
+            try:
+                self.show_plot('duplication')
+            except Exception as e:
+                messagebox.showerror("Ошибка", f"Ошибка при создании графика: {str(e)}")
+
+    def plot_overrepresented(self):
+        """Генерация таблицы перепредставленных последовательностей"""
+        if self.analyzer:
+            self.last_plot = self.plot_overrepresented
+            try:
+                self.show_plot('overrepresented')
+            except Exception as e:
+                messagebox.showerror("Ошибка", f"Ошибка при создании графика: {str(e)}")
+
+    def plot_gc(self):
+        """Генерация распределения GC-состава ридов"""
+        if self.analyzer:
+            self.last_plot = self.plot_gc
+            try:
+                self.show_plot('gc')
+            except Exception as e:
+                messagebox.showerror("Ошибка", f"Ошибка при создании графика: {str(e)}")
+
+    def plot_n_content(self):
+        """Генерация графика содержания N по позициям"""
+        if self.analyzer:
+            self.last_plot = self.plot_n_content
+            try:
+                self.show_plot('n_content')
+            except Exception as e:
+                messagebox.showerror("Ошибка", f"Ошибка при создании графика: {str(e)}")
+
+    def plot_all(self):
+        """Генерация всех графиков"""
+        if self.analyzer:
+            try:
+                # Файлы всех графиков - в текущую папку, как и раньше
+                self.analyzer.save_plots(os.getcwd(), self.report)
+
+                # Показываем последний созданный график
+                self.show_plot('length')
+                messagebox.showinfo("Успех", "Все графики созданы успешно!")
+
+            except Exception as e:
+                messagebox.showerror("Ошибка", f"Ошибка при создании графиков: {str(e)}")
+
+    def export_report(self):
+        """Сохраняет полное состояние метрик (компактный JSON или .npz) для сравнения образцов"""
+        if self.report is None:
+            return
+        filename = filedialog.asksaveasfilename(
+            title="Сохранить отчет", defaultextension='.json',
+            filetypes=[("JSON", "*.json"), ("NumPy", "*.npz")]
+        )
+        if not filename:
+            return
+        try:
+            self.report.save(filename)
+            messagebox.showinfo("Успех", f"Отчет сохранен: {filename}")
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Не удалось сохранить отчет: {str(e)}")
+
+    def show_plot(self, name):
+        """Рисует график сразу в размере области просмотра и показывает без записи на диск"""
+        width, height, pixels = self.analyzer.render_plot_rgba(name, self.report, (800, 400))
+        self.display_image(Image.frombuffer('RGBA', (width, height), pixels, 'raw', 'RGBA', 0, 1))
+
+    def display_image(self, image):
+        """Отображение изображения в интерфейсе: PIL.Image или путь к файлу"""
+        try:
+            if not isinstance(image, Image.Image):
+                image = Image.open(image)
+            # Масштабируем изображение под размер окна
+            width, height = image.size
+            max_width = 800
+            max_height = 400
+
+            if width > max_width or height > max_height:
+                ratio = min(max_width / width, max_height / height)
+                new_size = (int(width * ratio), int(height * ratio))
+                image = image.resize(new_size, Image.Resampling.LANCZOS)
+
+            photo = ImageTk.PhotoImage(image)
+
+            # Очищаем предыдущее изображение
+            for widget in self.image_frame.winfo_children():
+                widget.destroy()
+
+            # Создаем новую метку с изображением
+            img_label = tk.Label(self.image_frame, image=photo, bg='#FFFFFF')
+            img_label.image = photo  # Сохраняем ссылку
+            img_label.pack(expand=True)
+
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Не удалось загрузить изображение: {str(e)}")
+
+
+def run_gui():
+    # Создаем тестовый файл если его еще нет
+    if not os.path.exists("test.fastq"):
+        with open("test.fastq", "w", encoding='utf-8') as f:
+            f.write(create_test_fastq())
+
+    # Запускаем GUI
+    print("ЗАПУСКАЕМ FASTQ АНАЛИЗАТОР...")
+    root = tk.Tk()
+    app = FastQCAnalyzerGUI(root)
+    root.mainloop()
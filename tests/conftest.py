@@ -0,0 +1,39 @@
+import os
+import struct
+import sys
+import zlib
+
+import pytest
+
+# Модули лежат в корне репозитория, пакета нет
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmarks  # noqa: E402
+
+
+@pytest.fixture
+def synthetic(tmp_path):
+    """5000 ридов длиной 80-100 bp с заголовками Illumina"""
+    return benchmarks.write_synthetic_fastq(str(tmp_path / 'reads.fastq'), 5000, 100, jitter=20)
+
+
+def write_bgzf(source, target, block_size=16 * 1024):
+    """Сжимает файл блоками BGZF, как bgzip: каждый блок - отдельный gzip член с полем 'BC'"""
+    with open(source, 'rb') as file:
+        data = file.read()
+    with open(target, 'wb') as out:
+        for start in range(0, len(data), block_size):
+            chunk = data[start:start + block_size]
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+            deflated = compressor.compress(chunk) + compressor.flush()
+            out.write(b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00'
+                      + struct.pack('<H', len(deflated) + 25) + deflated
+                      + struct.pack('<II', zlib.crc32(chunk), len(chunk)))
+        out.write(bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000'))  # Блок EOF
+    return target
+
+
+@pytest.fixture
+def bgzf(synthetic, tmp_path):
+    """Тот же synthetic, сжатый блоками BGZF"""
+    return write_bgzf(synthetic, str(tmp_path / 'reads.fastq.gz'))
@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+import fastq
+
+
+def test_bgzf_matches_plain(synthetic, bgzf):
+    assert fastq.detect_compression(bgzf) == 'bgzf'
+    plain = fastq.FastqReader(synthetic).analyze().to_dict()
+    for workers in (1, 3):
+        assert fastq.FastqReader(bgzf, workers=workers).analyze().to_dict() == plain
+
+
+def test_truncated_bgzf_is_reported(bgzf):
+    with open(bgzf, 'rb') as file:
+        data = file.read()
+    with open(bgzf, 'wb') as file:
+        file.write(data[:len(data) // 2])
+    with pytest.raises(fastq.FastqFormatError):
+        fastq.FastqReader(bgzf).analyze()
+
+
+def test_bgzf_tell_follows_consumed_blocks(bgzf):
+    size = os.path.getsize(bgzf)
+    with fastq.BgzfReader(bgzf, threads=2, read_ahead=8) as reader:
+        positions = []
+        while reader.read(10000):
+            positions.append(reader.tell())
+    assert positions == sorted(positions)
+    assert positions[0] < size // 2  # Блоки, поставленные в очередь распаковки, не учитываются
+    assert positions[-1] <= size
@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+import fastq
+
+
+def test_report_cache_stays_within_limit(tmp_path):
+    cache = fastq.ReportCache(str(tmp_path), max_bytes=64 * 1024)
+    for i in range(200):
+        cache.store(f'k{i}', {'data': os.urandom(1000).hex()})
+    entries = [name for name in os.listdir(tmp_path) if name.endswith('.fqrc')]
+    assert sum(os.path.getsize(tmp_path / name) for name in entries) <= 64 * 1024
+    assert cache.load('k199') is not None and cache.load('k0') is None
+
+
+def test_key_follows_file_state(tmp_path):
+    path = tmp_path / 'reads.fastq'
+    path.write_bytes(b'@r1\nACGT\n+\nIIII\n')
+    cache = fastq.ReportCache(str(tmp_path / 'cache'))
+    key = cache.key(str(path), fastq.DEFAULT_METRICS)
+    assert cache.key(str(path), fastq.DEFAULT_METRICS) == key
+    assert cache.key(str(path), fastq.DEFAULT_METRICS[:-1]) != key
+    path.write_bytes(b'@r1\nACGT\n+\nIIII\n@r2\nACGT\n+\nIIII\n')
+    assert cache.key(str(path), fastq.DEFAULT_METRICS) != key
+
+
+def test_reader_reuses_cached_report(synthetic, tmp_path):
+    cache = fastq.ReportCache(str(tmp_path / 'cache'))
+    first = fastq.FastqReader(synthetic, cache=cache).analyze()
+    reader = fastq.FastqReader(synthetic, cache=cache)
+    reader._scan_batches = None  # Повторный разбор файла упал бы
+    assert reader.analyze().to_dict() == first.to_dict()
+
+
+def test_store_does_not_rescan_on_every_write(tmp_path, monkeypatch):
+    cache = fastq.ReportCache(str(tmp_path), max_bytes=64 * 1024)
+    scans = []
+    listdir = os.listdir
+    monkeypatch.setattr(fastq.os, 'listdir', lambda path: scans.append(path) or listdir(path))
+    for i in range(500):
+        cache.store(f'k{i}', {'data': os.urandom(1000).hex()})
+    assert len(scans) < 100  # Обход - только при переполнении оценки (с запасом EVICT_TO) и раз в RESCAN_WRITES
+    entries = [name for name in listdir(tmp_path) if name.endswith('.fqrc')]
+    assert sum(os.path.getsize(tmp_path / name) for name in entries) <= 64 * 1024
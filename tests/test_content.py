@@ -0,0 +1,56 @@
+import io
+
+import pytest
+
+import fastq
+
+BACKENDS = ['python', pytest.param('numpy', marks=pytest.mark.skipif(fastq.np is None, reason="NumPy не установлен"))]
+
+# Рид -> ожидаемый GC-процент (None - нет ни одного A/C/G/T)
+READS = {
+    'GGGGCCCCAA': 80,
+    'AAAATTTTGC': 20,
+    'ACGTACGTNN': 50,  # N не входят в знаменатель
+    'NNNNNNNNNN': None,
+    'GCA': 67,  # 66.7% округляется до ближайшего целого
+    'GAAAAAAA': 13,  # 12.5% - половина округляется вверх
+    'gcgcatat': 50,  # Строчные буквы - те же нуклеотиды
+    'ACNTNACGTACG': 50,
+}
+
+
+def _report(backend):
+    vectorized = backend == 'numpy'
+    report = fastq.FastqReport(metric(vectorized) for metric in (fastq.PerSequenceGC, fastq.PerBaseContent))
+    data = ''.join(f'@r{i}\n{read}\n+\n{"I" * len(read)}\n' for i, read in enumerate(READS)).encode('ascii')
+    for batch in fastq.FastqParser(io.BytesIO(data), vectorized).batches():
+        report.update_batch(batch)
+    return report
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_gc_histogram_bins(backend):
+    gc = _report(backend)['gc']
+    histogram = fastq._as_list(gc.histogram)
+    assert len(histogram) == 101
+    expected = [0] * 101
+    for percent in READS.values():
+        if percent is not None:
+            expected[percent] += 1
+    assert histogram == expected
+    assert gc.mean() == pytest.approx(sum(p for p in READS.values() if p is not None) / 7)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_n_percentages_by_position(backend):
+    content = _report(backend)['content']
+    length = max(map(len, READS))
+    covering = [sum(len(read) > i for read in READS) for i in range(length)]
+    n_reads = [sum(read[i:i + 1] == 'N' for read in READS) for i in range(length)]
+    assert content.n_percentages() == pytest.approx([n / total * 100 for n, total in zip(n_reads, covering)])
+    # Позиция 0: N только в 'NNNNNNNNNN' из 8 ридов; позиции 8-9: N в двух ридах из пяти
+    assert content.n_percentages()[0] == pytest.approx(12.5)
+    assert content.n_percentages()[8] == pytest.approx(40)
+    # N не входят в проценты A/C/G/T
+    assert fastq._as_list(content.total_counts)[0] == 7
+    assert content.percentages('G')[0] == pytest.approx(400 / 7)  # G, G, G и g
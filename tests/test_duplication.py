@@ -0,0 +1,110 @@
+import io
+import random
+
+import pytest
+
+import fastq
+
+BACKENDS = ['python', pytest.param('numpy', marks=pytest.mark.skipif(fastq.np is None, reason="NumPy не установлен"))]
+
+ADAPTER = 'AGATCGGAAGAGCACACGTCTGAACTCCAGTCACATCACGATCTCGTATGCCGTCTTC'
+
+
+def _sequences():
+    """100 уникальных, 50 по 2 раза, 10 по 10 раз и адаптер 300 раз: 600 ридов, 161 различная"""
+    rng = random.Random(7)
+    distinct = [''.join(rng.choices('ACGT', k=60)) for _ in range(160)]
+    reads = distinct[:100] + distinct[100:150] * 2 + distinct[150:] * 10 + [ADAPTER] * 300
+    rng.shuffle(reads)
+    return reads, distinct[150:]
+
+
+def _duplication(reads, backend, memory_limit=None):
+    vectorized = backend == 'numpy'
+    metric = fastq._new_metrics([fastq.SequenceDuplication], vectorized, memory_limit)[0]
+    data = ''.join(f'@r{i}\n{read}\n+\n{"I" * len(read)}\n' for i, read in enumerate(reads)).encode('ascii')
+    for batch in fastq.FastqParser(io.BytesIO(data), vectorized).batches():
+        metric.update_batch(batch)
+    return metric
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_duplication_levels(backend):
+    reads, _ = _sequences()
+    metric = _duplication(reads, backend)
+    assert metric.count == 600
+    assert metric.estimated_distinct() == 161  # Выборка вмещает все хэши: подсчет точный
+    assert metric.deduplicated_percent() == pytest.approx(161 / 600 * 100)
+    labels, read_percents, distinct_percents = metric.duplication_levels()
+    levels = dict(zip(labels, read_percents))
+    assert levels['1'] == pytest.approx(100 / 6)
+    assert levels['2'] == pytest.approx(100 / 6)
+    assert levels['>10'] == pytest.approx(100 / 6)
+    assert levels['>100'] == pytest.approx(50)
+    assert sum(read_percents) == pytest.approx(100)
+    assert dict(zip(labels, distinct_percents))['1'] == pytest.approx(100 / 161 * 100)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_overrepresented_sequences(backend):
+    reads, frequent = _sequences()
+    rows = _duplication(reads, backend).overrepresented(share=0.01)
+    assert rows[0]['sequence'] == ADAPTER[:fastq.SequenceDuplication.PREFIX_LENGTH]
+    assert rows[0]['count'] >= 300 and rows[0]['source'] == 'Illumina Universal Adapter'
+    # Выше 1% - адаптер и 10 последовательностей по 10 ридов; оценка count-min не занижает
+    assert {row['sequence'] for row in rows[1:]} == {sequence[:50] for sequence in frequent}
+    assert all(row['count'] >= 10 for row in rows)
+    assert len(_duplication(reads, backend).overrepresented(share=0.1)) == 1
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_memory_limit_caps_sketch(backend):
+    small = _duplication(['ACGT' * 15], backend, memory_limit=1024 * 1024)
+    large = _duplication(['ACGT' * 15], backend, memory_limit=8 * 1024 * 1024)
+    for metric, limit in ((small, 1024 * 1024), (large, 8 * 1024 * 1024)):
+        cells = sum(len(row) for row in metric.sketch)
+        assert cells == metric.SKETCH_DEPTH << metric.width_bits
+        assert cells * 8 <= limit // 2  # Половина лимита на sketch из 64-битных счетчиков
+        assert metric.sample_size * metric.SAMPLE_ENTRY_BYTES <= limit // 2
+    assert small.width_bits < large.width_bits
+
+
+def test_reader_passes_memory_limit(tmp_path):
+    path = tmp_path / 'reads.fastq'
+    path.write_bytes(b'@r1\nACGTACGT\n+\nIIIIIIII\n')
+    report = fastq.FastqReader(str(path), memory_limit=1024 * 1024).analyze()
+    default = fastq.FastqReader(str(path)).analyze()
+    assert report['duplication'].width_bits < default['duplication'].width_bits
+
+
+def _comparable(metric):
+    data = metric.to_dict()
+    # Кандидаты зависят от границ пачек; выборка совпадает с точностью до порядка
+    del data['candidate_hashes'], data['candidate_sequences']
+    data['sample'] = dict(zip(data.pop('sample_hashes'), data.pop('sample_counts')))
+    return data
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_merge_matches_single_pass(backend):
+    reads, _ = _sequences()
+    whole = _duplication(reads, backend)
+    merged = _duplication(reads[:250], backend)
+    merged.merge(_duplication(reads[250:], backend))
+    assert _comparable(merged) == _comparable(whole)
+    # Равные по числу ридов строки идут в порядке кандидатов
+    assert (sorted(merged.overrepresented(share=0.01), key=lambda row: row['sequence'])
+            == sorted(whole.overrepresented(share=0.01), key=lambda row: row['sequence']))
+
+
+def test_merge_applies_sample_level():
+    # Выборка переполнена в одной части: после merge в ней только хэши ниже общего порога
+    rng = random.Random(3)
+    reads = [''.join(rng.choices('ACGT', k=50)) for _ in range(3000)]
+    crowded = _duplication(reads, 'python', memory_limit=256 * 1024)
+    assert crowded.sample_level > 0
+    merged = _duplication(reads[:10], 'python', memory_limit=256 * 1024)
+    merged.merge(crowded)
+    assert merged.sample_level == crowded.sample_level
+    assert all(value <= fastq._MASK64 >> merged.sample_level for value in merged.sample)
+    assert len(merged.sample) <= merged.sample_size
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+import benchmarks
+import fastq
+
+BACKENDS = ['python', pytest.param('numpy', marks=pytest.mark.skipif(fastq.np is None, reason="NumPy не установлен"))]
+needs_numpy = pytest.mark.skipif(fastq.np is None, reason="NumPy не установлен")
+
+
+@pytest.fixture
+def second(tmp_path):
+    """Другой образец: другие риды, длины и профиль качества"""
+    return benchmarks.write_synthetic_fastq(str(tmp_path / 'second.fastq'), 3000, 120, seed=5,
+                                            lengths='trimmed', quality='illumina')
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_json_round_trip(synthetic, tmp_path, backend):
+    report = fastq.FastqReader(synthetic, backend=backend).analyze()
+    path = report.save(str(tmp_path / 'stats.json'), {'sample': 'first'})
+    loaded = fastq.FastqReport.load(path, vectorized=backend == 'numpy')
+    assert loaded.to_dict() == report.to_dict()
+    assert loaded.phred_offset == report.phred_offset and loaded.estimate is None
+    with open(path, encoding='utf-8') as file:
+        document = json.load(file)
+    # Sketch дубликатов хранится сжатым, а не списком в миллион чисел
+    assert document['metrics']['duplication']['sketch']['encoding'] == 'zlib+base64'
+    assert document['summary'] == {'sample': 'first'}
+
+
+def test_json_keeps_estimate_and_offset(synthetic, tmp_path):
+    report = fastq.FastqReader(synthetic).preview(500).set_phred_offset(64)
+    loaded = fastq.FastqReport.load(report.save(str(tmp_path / 'preview.json')))
+    assert loaded.estimate == report.estimate and loaded.estimate is not None
+    assert loaded.phred_offset == 64
+
+
+def test_json_with_plain_sketch_still_loads(synthetic, tmp_path):
+    # Файлы до упаковки sketch: счетчики обычным списком списков
+    report = fastq.FastqReader(synthetic).analyze()
+    path = tmp_path / 'old.json'
+    path.write_text(json.dumps({'version': 1, 'summary': None, 'phred_offset': 33, 'estimate': None,
+                                'metrics': report.to_dict()}), encoding='utf-8')
+    assert fastq.FastqReport.load(str(path)).to_dict() == report.to_dict()
+
+
+@needs_numpy
+@pytest.mark.parametrize('vectorized', [False, True])
+def test_npz_round_trip(synthetic, tmp_path, vectorized):
+    report = fastq.FastqReader(synthetic).analyze()
+    path = report.save(str(tmp_path / 'report.npz'), {'sample': 'first'})
+    loaded = fastq.FastqReport.load(path, vectorized=vectorized)
+    assert loaded.to_dict() == report.to_dict()
+    document, arrays = fastq.read_report_arrays(path, ('gc/histogram',))
+    assert list(arrays) == ['gc/histogram']  # Остальные массивы не читаются
+    assert arrays['gc/histogram'].tolist() == fastq._as_list(report['gc'].histogram)
+    assert document['summary'] == {'sample': 'first'}
+
+
+@needs_numpy
+def test_report_collection_compares_loaded_reports(synthetic, second, tmp_path):
+    reports = [fastq.FastqReader(path).analyze() for path in (synthetic, second)]
+    # Имя образца: из папки results/<образец>/report.npz или из сводки в stats.json
+    (tmp_path / 'first').mkdir()
+    paths = [reports[0].save(str(tmp_path / 'first' / 'report.npz')),
+             reports[1].save(str(tmp_path / 'stats.json'), {'sample': 'second'})]
+    collection = fastq.ReportCollection(paths)
+    assert collection.names == ['first', 'second']
+    assert collection.sequence_counts() == [5000, 3000]
+    for row, report in zip(collection.table(), reports):
+        assert row['sequence_count'] == report.sequence_count
+        assert row['average_length'] == pytest.approx(report.average_length)
+        assert row['gc_percent'] == pytest.approx(report['gc'].mean())
+        assert row['deduplicated_percent'] == pytest.approx(report['duplication'].deduplicated_percent())
+        quality = report['quality']
+        assert row['mean_quality'] == pytest.approx(sum(quality.quality_sums) / sum(quality.quality_counts))
+    means = collection.mean_qualities()
+    for row, report in zip(means, reports):
+        expected = report['quality'].average_qualities()
+        assert row[:len(expected)].tolist() == pytest.approx(expected)
+        assert fastq.np.isnan(row[len(expected):]).all()
+    assert collection.gc_percentages().sum(axis=1) == pytest.approx([100, 100])
+
+
+@pytest.mark.skipif(fastq.np is not None, reason="проверяется только без NumPy")
+def test_npz_requires_numpy(synthetic, tmp_path):
+    report = fastq.FastqReader(synthetic).analyze()
+    with pytest.raises(ImportError):
+        report.save(str(tmp_path / 'report.npz'))
@@ -0,0 +1,46 @@
+import io
+import pickle
+
+import pytest
+
+import benchmarks
+import fastq
+
+BACKENDS = ['python', pytest.param('numpy', marks=pytest.mark.skipif(fastq.np is None, reason="NumPy не установлен"))]
+
+
+@pytest.fixture(scope='module')
+def reads(tmp_path_factory):
+    """2000 ридов разной длины с заголовками Illumina (24 плитки)"""
+    path = benchmarks.write_synthetic_fastq(str(tmp_path_factory.mktemp('memory') / 'reads.fastq'),
+                                            2000, 100, jitter=30)
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def _metrics(data, backend, repeats):
+    """Метрики после repeats повторов одних и тех же ридов"""
+    vectorized = backend == 'numpy'
+    # Небольшой sketch дубликатов: рост остальных метрик на его фоне не теряется
+    report = fastq.FastqReport(fastq._new_metrics(fastq.DEFAULT_METRICS, vectorized, 1024 * 1024))
+    for batch in fastq.FastqParser(io.BytesIO(data * repeats), vectorized).batches():
+        report.update_batch(batch)
+    return report
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_length_histogram_does_not_grow_with_reads(reads, backend):
+    small, large = _metrics(reads, backend, 1)['length'], _metrics(reads, backend, 10)['length']
+    assert len(large.histogram) == len(small.histogram)
+    assert sum(large.histogram.values()) == 10 * sum(small.histogram.values())
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_metric_state_is_bounded(reads, backend):
+    # Те же риды в 10 раз больше: меняются только значения счетчиков, а не число состояний.
+    # Счетчики в 10 раз больше занимают в pickle до ~1.7 раза больше байт, список по ридам - в 10 раз
+    small, large = _metrics(reads, backend, 1), _metrics(reads, backend, 10)
+    assert large.sequence_count == 10 * small.sequence_count
+    for name, metric in small.metrics.items():
+        before, after = len(pickle.dumps(metric)), len(pickle.dumps(large[name]))
+        assert after <= 2 * before + 1024, f"{name}: {before} -> {after} байт"
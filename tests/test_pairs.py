@@ -0,0 +1,27 @@
+import pytest
+
+import fastq
+
+
+def test_pair_files_groups_mates():
+    paths = ['run/S1_L001_R1_001.fastq.gz', 'single.fq', 'run/S1_L001_R2_001.fastq.gz', 'x_1.fq', 'x_2.fq']
+    assert fastq.pair_files(paths) == [('run/S1_L001_R1_001.fastq.gz', 'run/S1_L001_R2_001.fastq.gz'),
+                                       ('single.fq',), ('x_1.fq', 'x_2.fq')]
+
+
+def _write_mate(path, ids):
+    with open(path, 'w') as file:
+        for name in ids:
+            file.write(f'@{name} 1:N:0:1\nACGTACGTAC\n+\nIIIIIIIIII\n')
+    return str(path)
+
+
+def test_paired_sample_checks_ids(tmp_path):
+    first = _write_mate(tmp_path / 'p_R1.fq', [f'r{i}' for i in range(50)])
+    second = _write_mate(tmp_path / 'p_R2.fq', [f'r{i}' for i in range(50)])
+    report = fastq.FastqSample([first, second], workers=1).analyze()
+    assert report.sequence_count == 100
+
+    _write_mate(tmp_path / 'p_R2.fq', [f'r{i}' for i in range(49)] + ['other'])
+    with pytest.raises(fastq.PairedReadsError, match='№50'):
+        fastq.FastqSample([first, second], workers=1).analyze()
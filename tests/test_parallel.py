@@ -0,0 +1,33 @@
+import io
+
+import fastq
+
+
+def test_resync_skips_quality_starting_with_at():
+    # Строки качества начинаются с '@': граница записи определяется по '+' и длинам
+    records = [b'@r%d\nACGTACGT\n+\n@IIIIIII\n' % i for i in range(4)]
+    data = b''.join(records)
+    file = io.BytesIO(data)
+    second = len(records[0])
+    assert fastq.find_record_start(file, 1) == second
+    assert fastq.find_record_start(file, second) == second
+    quality = data.index(b'@IIIIIII', second)
+    assert fastq.find_record_start(file, quality) == second + len(records[1])
+    assert fastq.find_record_start(file, len(data) - 2) == len(data)
+
+
+def test_parallel_ranges_match_serial(synthetic):
+    serial = fastq.FastqReader(synthetic).analyze()
+    reader = fastq.FastqReader(synthetic, workers=3)
+    reader.PARALLEL_MIN_BYTES = 64 * 1024  # Несколько диапазонов и на маленьком файле
+    assert len(reader.split_ranges(reader._parallel_parts())) > 1
+    parallel = reader.analyze()
+    expected, actual = serial.to_dict(), parallel.to_dict()
+    # Кандидаты в частые последовательности зависят от границ пачек, выборка хэшей
+    # совпадает с точностью до порядка, остальное - точно
+    for data in (expected, actual):
+        duplication = data['duplication']
+        for field in ('candidate_hashes', 'candidate_sequences'):
+            del duplication[field]
+        duplication['sample'] = dict(zip(duplication.pop('sample_hashes'), duplication.pop('sample_counts')))
+    assert actual == expected
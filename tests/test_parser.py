@@ -0,0 +1,31 @@
+import os
+
+import pytest
+
+import fastq
+
+TEST_FASTQ = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test.fastq')
+
+
+@pytest.mark.parametrize('backend', ['python', 'numpy'])
+def test_parser_counts_records(backend):
+    if backend == 'numpy' and fastq.np is None:
+        pytest.skip("NumPy не установлен")
+    report = fastq.FastqReader(TEST_FASTQ, backend=backend).analyze()
+    assert report.sequence_count == 100
+    assert report.total_length == 2000
+
+
+def test_backends_agree(synthetic):
+    if fastq.np is None:
+        pytest.skip("NumPy не установлен")
+    python = fastq.FastqReader(synthetic, backend='python').analyze().to_dict()
+    numpy = fastq.FastqReader(synthetic, backend='numpy').analyze().to_dict()
+    assert python == numpy
+
+
+def test_truncated_record_is_reported(tmp_path):
+    path = tmp_path / 'broken.fastq'
+    path.write_bytes(b'@r1\nACGT\n+\nIIII\n@r2\nACGT\n')
+    with pytest.raises(fastq.FastqFormatError, match='обрезан'):
+        fastq.FastqReader(str(path)).analyze()
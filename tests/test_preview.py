@@ -0,0 +1,30 @@
+import pytest
+
+import fastq
+
+
+def test_preview_estimates_read_count(synthetic):
+    report = fastq.FastqReader(synthetic).preview(500)
+    assert report.estimate['method'] == 'stride'
+    assert 500 <= report.estimate['sampled_reads'] < 5000
+    assert report.estimate['estimated_reads'] == pytest.approx(5000, rel=0.1)
+
+
+def test_preview_of_small_file_is_exact(synthetic):
+    report = fastq.FastqReader(synthetic).preview(100000)
+    assert report.estimate is None
+    expected, actual = fastq.FastqReader(synthetic).analyze().to_dict(), report.to_dict()
+    # Участки читаются по отдельности: кандидаты дубликатов и порядок выборки хэшей другие
+    assert actual.pop('duplication')['count'] == expected.pop('duplication')['count']
+    assert actual == expected
+
+
+def test_preview_uses_cached_full_report(synthetic, tmp_path):
+    cache = fastq.ReportCache(str(tmp_path / 'cache'))
+    full = fastq.FastqReader(synthetic, cache=cache).analyze()
+    reader = fastq.FastqReader(synthetic, cache=cache)
+    reader._preview_stride = None  # Выборка из файла упала бы
+    report = reader.preview(500)
+    assert report.estimate is None
+    assert report.to_dict() == full.to_dict()
+    assert reader.get_report() is report
@@ -0,0 +1,74 @@
+import io
+
+import pytest
+
+import fastq
+
+BACKENDS = ['python', pytest.param('numpy', marks=pytest.mark.skipif(fastq.np is None, reason="NumPy не установлен"))]
+
+
+def _report(qualities, backend, offset=33):
+    """Отчет по ридам с заданными оценками Phred (список списков) в кодировке offset"""
+    vectorized = backend == 'numpy'
+    report = fastq.FastqReport(metric(vectorized) for metric in (fastq.PerBaseQuality, fastq.PerSequenceQuality))
+    data = b''.join(b'@r\n' + b'A' * len(scores) + b'\n+\n' + bytes(offset + score for score in scores) + b'\n'
+                    for scores in qualities)
+    for batch in fastq.FastqParser(io.BytesIO(data), vectorized).batches():
+        report.update_batch(batch)
+    return report.set_phred_offset(offset)
+
+
+# Позиция 0: Q0..Q9 по одному разу; позиция 1: везде Q30; позиция 2: только у 4 ридов
+BOX_QUALITIES = [[q, 30, 10 * (q + 1)] if q < 4 else [q, 30] for q in range(10)]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_box_plot_percentiles(backend):
+    quality = _report(BOX_QUALITIES, backend)['quality']
+    # Квантиль - наименьшая оценка, на которой набирается доля оценок (как в FastQC)
+    assert quality.percentiles() == [[0, 2, 4, 7, 8], [30] * 5, [10, 10, 20, 30, 40]]
+    assert quality.average_qualities() == pytest.approx([4.5, 30, 25])
+    assert quality.quality_counts == [10, 10, 4]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_percentiles_do_not_depend_on_encoding(backend):
+    phred33 = _report(BOX_QUALITIES, backend, 33)['quality']
+    phred64 = _report(BOX_QUALITIES, backend, 64)['quality']
+    assert phred64.percentiles() == phred33.percentiles()
+    assert phred64.average_qualities() == pytest.approx(phred33.average_qualities())
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_read_quality_distribution(backend):
+    # Средние 15, 10.5 (округляется вверх до 11), 30, 30 и 2
+    reads = [[10, 20], [10, 11], [30, 30, 30], [28, 32], [2]]
+    read_quality = _report(reads, backend)['read_quality']
+    scores, counts = read_quality.distribution()
+    assert scores == list(range(2, 31))
+    assert dict((score, count) for score, count in zip(scores, counts) if count) == {2: 1, 11: 1, 15: 1, 30: 2}
+    assert read_quality.mode() == 30
+
+
+def _detect(characters, backend='python'):
+    """Кодировка, определенная по ридам из заданных символов качества"""
+    reads = [[ord(character) - 33 for character in characters[i:i + 10]] for i in range(0, len(characters), 10)]
+    return _report(reads, backend)['quality'].detect_phred_offset()
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_detect_phred_offset(backend):
+    assert _detect('#+5?FFFJJJ' * 3, backend) == 33  # Phred+33 (Illumina 1.8+)
+    assert _detect('IIIIIIIIII', backend) == 33  # Качественный Phred+33 без символов ниже '@'
+    assert _detect('BBDDFHHhhh' * 3, backend) == 64  # Phred+64: нет ниже ';', есть выше 'K'
+    assert _detect(';<=>?@ABCDEFGHIJK', backend) == 33  # Подходит под обе: по умолчанию 33
+    assert _detect('!hhhhhhhhh', backend) == 33  # Символ ниже ';' исключает Phred+64
+
+
+def test_auto_offset_in_reader(tmp_path):
+    path = tmp_path / 'illumina13.fastq'
+    path.write_bytes(b''.join(b'@r%d\nACGTACGTAC\n+\nBBDDFHHhhh\n' % i for i in range(20)))
+    report = fastq.FastqReader(str(path), phred_offset='auto').analyze()
+    assert report.phred_offset == 64
+    assert report['quality'].average_qualities()[-1] == 40  # 'h' в Phred+64
+    assert fastq.FastqReader(str(path)).analyze().phred_offset == 33  # Без 'auto' - Phred+33
@@ -0,0 +1,81 @@
+import gzip
+import io
+import os
+import threading
+
+import pytest
+
+import fastq
+
+
+@pytest.fixture
+def data(synthetic):
+    with open(synthetic, 'rb') as file:
+        return file.read()
+
+
+def _stream_report(stream, **options):
+    return fastq.FastqReader(stream).analyze(**options)
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_stream_matches_file(synthetic, data, compress):
+    expected = fastq.FastqReader(synthetic).analyze().to_dict()
+    payload = gzip.compress(data, 1) if compress else data
+    assert _stream_report(io.BytesIO(payload)).to_dict() == expected
+
+
+def test_pipe_with_short_reads_matches_file(synthetic, data):
+    expected = fastq.FastqReader(synthetic).analyze().to_dict()
+    read_end, write_end = os.pipe()
+
+    def feed():
+        # Мелкие записи: чтение из pipe возвращает неполные блоки
+        with open(write_end, 'wb', buffering=0) as pipe:
+            for start in range(0, len(data), 1000):
+                pipe.write(data[start:start + 1000])
+    writer = threading.Thread(target=feed)
+    writer.start()
+    with open(read_end, 'rb', buffering=0) as pipe:
+        report = _stream_report(pipe)
+    writer.join()
+    assert report.to_dict() == expected
+
+
+def test_stdin(synthetic, data, monkeypatch):
+    class Stdin:
+        buffer = io.BytesIO(gzip.compress(data, 1))
+    monkeypatch.setattr(fastq.sys, 'stdin', Stdin)
+    reader = fastq.FastqReader('-')
+    assert reader.analyze().to_dict() == fastq.FastqReader(synthetic).analyze().to_dict()
+    with pytest.raises(ValueError):
+        reader._open()  # Поток читается один раз
+
+
+def test_open_stream_peeks_without_losing_bytes(data):
+    for payload in (data, gzip.compress(data, 1), b'', b'@'):
+        with fastq.open_stream(io.BytesIO(payload)) as stream:
+            assert stream.read() == (data if payload.startswith(fastq.GZIP_MAGIC) else payload)
+    stream = fastq._PrefixedStream(io.BytesIO(b'CDEF'), b'AB')
+    assert stream.read(3) == b'ABC' and stream.tell() == 3
+    assert stream.read() == b'DEF' and stream.tell() == 6
+
+
+def test_stream_snapshots(data):
+    snapshots = []
+    report = _stream_report(io.BytesIO(data), snapshot=snapshots.append, snapshot_interval=0)
+    assert snapshots
+    for snapshot in snapshots:
+        assert snapshot.estimate['method'] == 'partial'
+        assert snapshot.estimate['estimated_reads'] == snapshot.sequence_count  # Размер потока неизвестен
+        assert snapshot is not report
+    assert [snapshot.sequence_count for snapshot in snapshots] == sorted(s.sequence_count for s in snapshots)
+    assert snapshots[-1].sequence_count == report.sequence_count
+    assert report.estimate is None
+
+
+def test_stream_rejects_file_only_features(data):
+    reader = fastq.FastqReader(io.BytesIO(data), cache=fastq.ReportCache(os.devnull), index=True)
+    assert reader.cache is None and not reader.index
+    with pytest.raises(ValueError):
+        reader.preview()
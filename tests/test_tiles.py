@@ -0,0 +1,73 @@
+import io
+
+import pytest
+
+import fastq
+
+BACKENDS = ['python', pytest.param('numpy', marks=pytest.mark.skipif(fastq.np is None, reason="NumPy не установлен"))]
+
+HEADERS = [
+    (b'@A00123:8:HXXXXDSXX:2:1101:1000:2000 1:N:0:ACGT', 2 * fastq._TILE_KEY_BASE + 1101),  # Casava 1.8+
+    (b'@A00123:8:HXXXXDSXX:4:2278:15:7', 4 * fastq._TILE_KEY_BASE + 2278),  # Casava 1.8+ без комментария
+    (b'@HWUSI-EAS100R:6:73:941:1973#0/1', 6 * fastq._TILE_KEY_BASE + 73),  # Старый формат
+    (b'@SRR001666.1 071112_SLXA-EAS1_s_7:5:1:817:345', 5 * fastq._TILE_KEY_BASE + 1),  # Старый формат в SRA
+    (b'@read1', -1),
+    (b'@A:1:FC:x:1101:1:1', -1),  # Дорожка не число
+    (b'@A:1:FC:1:1234567:1:1', -1),  # Слишком длинный номер плитки
+]
+
+
+def _fastq(headers, length=10):
+    return b''.join(header + b'\n' + b'A' * length + b'\n+\n' + b'I' * length + b'\n' for header in headers)
+
+
+def _tile_metric(data, backend):
+    metric = fastq.PerTileQuality(backend == 'numpy')
+    for batch in fastq.FastqParser(io.BytesIO(data), backend == 'numpy').batches():
+        metric.update_batch(batch)
+    return metric
+
+
+@pytest.mark.parametrize('header, key', HEADERS)
+def test_tile_key(header, key):
+    assert fastq._tile_key(header) == key
+
+
+@pytest.mark.skipif(fastq.np is None, reason="NumPy не установлен")
+def test_vectorized_tile_keys_match_scalar():
+    # Перемешанные форматы: и сравнение по началу заголовка, и разбор всех ':' в _scan_tile_keys
+    headers = [header for header, _ in HEADERS] * 3 + [b'@A:1:FC:3:%d:5:6' % tile for tile in range(1101, 1130)]
+    batch = next(fastq.FastqParser(io.BytesIO(_fastq(headers)), True).batches())
+    assert fastq._tile_keys(batch).tolist() == [fastq._tile_key(header) for header in headers]
+    codes, starts, ends = batch.header_bounds
+    assert fastq._scan_tile_keys(codes, starts, ends).tolist() == [fastq._tile_key(header) for header in headers]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_tiles_skipped_and_heatmap_shape(backend):
+    headers = [header for header, _ in HEADERS]
+    metric = _tile_metric(_fastq(headers, 12), backend)
+    assert metric.skipped == 3
+    labels, means = metric.mean_qualities()
+    assert labels == ['2:1101', '4:2278', '5:1', '6:73']
+    assert [len(row) for row in means] == [12] * 4
+    assert means[0][0] == 40  # 'I' в Phred+33
+    labels, means = metric.mean_qualities(by='lane')
+    assert labels == ['2', '4', '5', '6']
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_many_tiles_do_not_regrow_rows_per_read(backend, monkeypatch):
+    # 2000 плиток (дорожка NovaSeq): строки матриц растут только при удлинении ридов,
+    # а не проходом по всем плиткам на каждый рид
+    headers = [b'@A:1:FC:%d:%d:%d:1' % (1 + i % 4, 1101 + i // 4 % 500, i) for i in range(6000)]
+    calls = []
+    grow = fastq._grow
+    monkeypatch.setattr(fastq, '_grow', lambda values, length: calls.append(length) or grow(values, length))
+    metric = _tile_metric(_fastq(headers, 20) + _fastq(headers[:10], 30), backend)
+    assert len(metric.tiles) == 2000
+    assert len(calls) <= 2 * len(metric.tiles) + 2  # Одно расширение до 30 позиций на строку каждой матрицы
+    labels, means = metric.mean_qualities()
+    assert len(labels) == 2000 and {len(row) for row in means} == {30}
+    # Плитка 1:1101 - риды 0, 2000, 4000 длиной 20 и рид 0 еще раз длиной 30
+    assert fastq._as_list(metric.quality_counts[0])[19:21] == [4, 1]